@@ -0,0 +1,516 @@
+"""Latency, throughput and query counts of every endpoint of the survey API, measured in process.
+
+A throwaway test database is created with the backend of the configured settings (an in-memory SQLite
+database, or ``test_<name>`` on Postgres) and seeded with one survey per ``--sizes`` entry: a number, a radio,
+a dropdown and a plain text field followed by text fields, ``--rule-density`` of which carry a rule on an
+earlier field, and ``--responses`` responses. Every endpoint of ``surveys/urls.py`` is then requested
+``--iterations`` times per survey, sequentially, through Django's test clients (the full middleware and URL
+stack without sockets; the async views through ``AsyncClient``):
+
+    python benchmarks/api_endpoints.py --sizes 10,100,500 --responses 2000 --output results.json
+    python benchmarks/api_endpoints.py --baseline results.json
+
+Results are JSON: p50/p95/p99 and mean latency, requests per second of the single client, database queries
+per request and response status codes, with the commit and database they were measured on. Given a
+``--baseline`` from an earlier run, scenarios whose p95 grew by more than ``--max-regression`` or that run
+more queries than before are reported and the script exits with status 1.
+
+Run it from the project root. ``DJANGO_SETTINGS_MODULE`` defaults to ``survey_platform.settings``; use a
+local cache, since scenarios write through it. Concurrency is the subject of ``asgi_vs_wsgi.py``.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+from uuid import uuid4
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Dataset = namedtuple(
+    "Dataset", ["size", "survey_id", "number", "radio", "dropdown", "text", "response_id", "answer_id"]
+)
+
+# ``request(iteration)`` does the untimed setup of one request and returns its ``(path, data)``
+Scenario = namedtuple("Scenario", ["name", "method", "request", "client", "auth"])
+
+RESPONDENT = "respondent0@example.com"
+
+
+class QueryCounter:
+    """Count the queries of every connection, including those opened by the worker threads of async views."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        for connection in connections.all():
+            self._wrap(connection)
+        connection_created.connect(lambda sender, connection, **kwargs: self._wrap(connection), weak=False)
+
+    def _wrap(self, connection):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def field_definitions(size, rule_density, rng):
+    """Fields of a benchmark survey. The standard answers of ``answers`` make every rule pass."""
+    fields = [
+        {"id": 1, "label": "Score", "field_type": "number", "order": 1},
+        {"id": 2, "label": "Plan", "field_type": "radio", "order": 2, "choices": ["a", "b", "c"]},
+        {"id": 3, "label": "Region", "field_type": "dropdown", "order": 3, "choices": ["x", "y"]},
+        {"id": 4, "label": "Comment", "field_type": "text", "order": 4},
+    ]
+    for index in range(5, size + 1):
+        field = {"id": index, "label": f"Question {index}", "field_type": "text", "order": index}
+        if rng.random() < rule_density:
+            target = rng.randrange(1, index)
+            if target == 1:
+                field["conditional_logic"] = {"depends_on_field": target, "operator": ">=", "value": 5}
+            elif target == 2:
+                field["dependencies"] = {"depends_on_field": target, "operator": "in", "values": ["a", "b"]}
+            else:
+                field["conditional_logic"] = {"depends_on_field": target, "operator": "!=", "value": "skip"}
+        fields.append(field)
+    return fields
+
+
+def survey_payload(size, rule_density, rng):
+    fields = field_definitions(size, rule_density, rng)
+    sections = [
+        {"title": f"Section {index // 10}", "order": index // 10, "fields": fields[index : index + 10]}
+        for index in range(0, len(fields), 10)
+    ]
+    return {"title": f"Benchmark survey ({size} fields)", "description": "Seeded for benchmarks.", "sections": sections}
+
+
+def answers(dataset, text=True):
+    data = [
+        {"field": dataset.number, "value": "7"},
+        {"field": dataset.radio, "value": "a"},
+        {"field": dataset.dropdown, "value": "x"},
+    ]
+    if text:
+        data.append({"field": dataset.text, "value": "Fine."})
+    return data
+
+
+def write_response(dataset, email="writer@example.com", text=True):
+    """Write a completed response through the ingestion path, which keeps the aggregates, and return its id."""
+    from surveys import ingestion
+    from surveys.models import Response
+
+    submission_id = str(uuid4())
+    message = {
+        "submission_id": submission_id,
+        "survey": dataset.survey_id,
+        "email": email,
+        "completed": True,
+        "response_data": answers(dataset, text),
+    }
+    ingestion.write_batch([message])
+    return Response.objects.get(submission_id=submission_id).id
+
+
+def seed(size, rule_density, responses, rng):
+    """Create a survey of ``size`` fields and ``responses`` responses to it."""
+    from surveys import ingestion
+    from surveys.models import Field, ResponseData
+    from surveys.serializers import SurveySerializer
+
+    serializer = SurveySerializer(data=survey_payload(size, rule_density, rng))
+    serializer.is_valid(raise_exception=True)
+    survey = serializer.save()
+    number, radio, dropdown, text = Field.objects.filter(section__survey=survey).order_by("order")[:4]
+
+    messages = []
+    for index in range(responses):
+        score = 7 if index == 0 else rng.randint(0, 10)
+        response_data = [
+            {"field": number.id, "value": str(score)},
+            {"field": radio.id, "value": rng.choice(["a", "b", "c"])},
+            {"field": dropdown.id, "value": rng.choice(["x", "y"])},
+        ]
+        if rng.random() < 0.5:
+            response_data.append({"field": text.id, "value": f"Comment {index}"})
+        messages.append(
+            {
+                "submission_id": str(uuid4()),
+                "survey": survey.id,
+                "email": f"respondent{index}@example.com",
+                "completed": rng.random() < 0.8,
+                "response_data": response_data,
+            }
+        )
+    for start in range(0, len(messages), 500):
+        ingestion.write_batch(messages[start : start + 500])
+
+    answer = ResponseData.objects.filter(response__survey=survey, response__email=RESPONDENT, field=number).first()
+    return Dataset(size, survey.id, number.id, radio.id, dropdown.id, text.id, answer.response_id, answer.id)
+
+
+def scenarios(dataset, payload):
+    """The scenarios of every endpoint for one dataset. Reads come first, then the writes."""
+    from django.urls import reverse
+    from surveys import document_cache
+    from surveys.models import ResponseData, Survey
+
+    d = dataset
+    survey = {"pk": d.survey_id}
+
+    def fixed(name, query="", data=None, **kwargs):
+        path = reverse(name, kwargs=kwargs) + query
+        return lambda iteration: (path, data)
+
+    def cold_detail(iteration):
+        # Drops the stored document and the cached versions; the document is rebuilt right away, untimed
+        document_cache.survey_changed(d.survey_id)
+        return reverse("survey-detail", kwargs=survey), None
+
+    def delete_survey(iteration):
+        return reverse("survey-detail", kwargs={"pk": Survey.objects.create(title="Disposable").id}), None
+
+    def delete_response(iteration):
+        return reverse("response-detail", kwargs={"pk": write_response(d)}), None
+
+    def create_answer(iteration):
+        data = {"response": write_response(d, text=False), "field": d.text, "value": "Fine."}
+        return reverse("response-data-list-create"), data
+
+    def delete_answer(iteration):
+        answer = ResponseData.objects.create(response_id=write_response(d, text=False), field_id=d.text, value="x")
+        return reverse("response-data-detail", kwargs={"pk": answer.id}), None
+
+    def alternate(name, make_data, **kwargs):
+        path = reverse(name, kwargs=kwargs)
+        return lambda iteration: (path, make_data(iteration))
+
+    submission = {"survey": d.survey_id, "email": "writer@example.com", "completed": True}
+    return [
+        Scenario("survey-list", "get", fixed("survey-list-create"), "sync", False),
+        Scenario(
+            "survey-list-shallow",
+            "get",
+            fixed("survey-list-create", "?fields=id,title,section_count,field_count"),
+            "sync",
+            False,
+        ),
+        Scenario("survey-detail", "get", fixed("survey-detail", **survey), "sync", False),
+        Scenario("survey-detail-cold", "get", cold_detail, "sync", False),
+        Scenario("survey-detail-respondent", "get", fixed("survey-detail", **survey), "sync", True),
+        Scenario("survey-detail-async", "get", fixed("survey-detail-async", **survey), "async", False),
+        Scenario("survey-export", "get", fixed("survey-export", "?export_format=csv", **survey), "sync", True),
+        Scenario("survey-analytics", "get", fixed("survey-analytics", **survey), "sync", True),
+        Scenario(
+            "survey-crosstab",
+            "get",
+            fixed("survey-crosstab", f"?row_field={d.radio}&column_field={d.dropdown}", **survey),
+            "sync",
+            True,
+        ),
+        Scenario(
+            "survey-field-statistics",
+            "get",
+            fixed("survey-field-statistics", pk=d.survey_id, field_id=d.number),
+            "sync",
+            True,
+        ),
+        Scenario("response-list", "get", fixed("response-list-create", f"?survey={d.survey_id}"), "sync", True),
+        Scenario("response-detail", "get", fixed("response-detail", pk=d.response_id), "sync", True),
+        Scenario(
+            "response-data-list", "get", fixed("response-data-list-create", f"?survey={d.survey_id}"), "sync", True
+        ),
+        Scenario("response-data-detail", "get", fixed("response-data-detail", pk=d.answer_id), "sync", True),
+        Scenario("survey-create", "post", fixed("survey-list-create", data=payload), "sync", True),
+        Scenario(
+            "survey-update",
+            "patch",
+            alternate("survey-detail", lambda iteration: {"title": f"Benchmark survey {iteration}"}, **survey),
+            "sync",
+            True,
+        ),
+        Scenario("survey-delete", "delete", delete_survey, "sync", True),
+        Scenario(
+            "response-create",
+            "post",
+            fixed("response-list-create", data={**submission, "response_data": answers(d)}),
+            "sync",
+            True,
+        ),
+        Scenario(
+            "response-submit",
+            "post",
+            fixed("response-submit", data={**submission, "response_data": answers(d)}),
+            "sync",
+            True,
+        ),
+        Scenario(
+            "response-submit-async",
+            "post",
+            fixed("response-submit-async", data={**submission, "response_data": answers(d)}),
+            "async",
+            True,
+        ),
+        Scenario(
+            "response-update",
+            "patch",
+            alternate("response-detail", lambda iteration: {"completed": iteration % 2 == 0}, pk=d.response_id),
+            "sync",
+            True,
+        ),
+        Scenario(
+            "response-answer",
+            "put",
+            alternate(
+                "response-answer",
+                lambda iteration: {"value": str(7 + iteration % 2)},
+                pk=d.response_id,
+                field_id=d.number,
+            ),
+            "sync",
+            True,
+        ),
+        Scenario("response-delete", "delete", delete_response, "sync", True),
+        Scenario("response-data-create", "post", create_answer, "sync", True),
+        Scenario(
+            "response-data-update",
+            "put",
+            alternate(
+                "response-data-detail",
+                lambda iteration: {"response": d.response_id, "field": d.number, "value": str(7 + iteration % 2)},
+                pk=d.answer_id,
+            ),
+            "sync",
+            True,
+        ),
+        Scenario("response-data-delete", "delete", delete_answer, "sync", True),
+    ]
+
+
+def summarize(latencies, queries, statuses):
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "status": {str(code): count for code, count in sorted(statuses.items())},
+        "requests_per_second": round(len(latencies) / sum(latencies), 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "queries_median": statistics.median(queries),
+        "queries_max": max(queries),
+    }
+
+
+def send(client, scenario, path, data, headers):
+    method = getattr(client, scenario.method)
+    if data is not None:
+        response = method(path, data, content_type="application/json", headers=headers)
+    else:
+        response = method(path, headers=headers)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response.status_code
+
+
+async def asend(client, scenario, path, data, headers):
+    method = getattr(client, scenario.method)
+    if data is not None:
+        response = await method(path, data, content_type="application/json", headers=headers)
+    else:
+        response = await method(path, headers=headers)
+    return response.status_code
+
+
+def measure(scenario, client, headers, counter, iterations, warmup):
+    latencies, queries, statuses = [], [], Counter()
+    headers = headers if scenario.auth else None
+    for iteration in range(warmup + iterations):
+        path, data = scenario.request(iteration)
+        before = counter.count
+        started = time.perf_counter()
+        status = send(client, scenario, path, data, headers)
+        elapsed = time.perf_counter() - started
+        if iteration >= warmup:
+            latencies.append(elapsed)
+            queries.append(counter.count - before)
+            statuses[status] += 1
+    return summarize(latencies, queries, statuses)
+
+
+async def ameasure(scenario, client, headers, counter, iterations, warmup):
+    from asgiref.sync import sync_to_async
+
+    latencies, queries, statuses = [], [], Counter()
+    headers = headers if scenario.auth else None
+    for iteration in range(warmup + iterations):
+        path, data = await sync_to_async(scenario.request)(iteration)
+        before = counter.count
+        started = time.perf_counter()
+        status = await asend(client, scenario, path, data, headers)
+        elapsed = time.perf_counter() - started
+        if iteration >= warmup:
+            latencies.append(elapsed)
+            queries.append(counter.count - before)
+            statuses[status] += 1
+    return summarize(latencies, queries, statuses)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain"], cwd=ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit.stdout.strip(), bool(dirty.stdout.strip())
+
+
+def compare(results, baseline, max_regression, min_delta_ms):
+    """Describe the scenarios that got slower or run more queries than in ``baseline``."""
+    previous = {(result["scenario"], result["fields"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["fields"]))
+        if before is None:
+            continue
+        name = f"{result['scenario']} ({result['fields']} fields)"
+        p95, previous_p95 = result["p95_ms"], before["p95_ms"]
+        if p95 > previous_p95 * (1 + max_regression) and p95 - previous_p95 > min_delta_ms:
+            regressions.append(f"{name}: p95 {previous_p95} ms -> {p95} ms")
+        if result["queries_max"] > before["queries_max"]:
+            regressions.append(f"{name}: queries {before['queries_max']} -> {result['queries_max']}")
+    return regressions
+
+
+def run(args):
+    import django
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import AsyncClient, Client
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    rng = random.Random(args.seed)
+    counter = QueryCounter()
+    counter.install()
+
+    user = User.objects.create_user(username="benchmark", email=RESPONDENT, password="benchmark")
+    headers = {"authorization": f"Bearer {RefreshToken.for_user(user).access_token}"}
+    client, async_client = Client(raise_request_exception=False), AsyncClient(raise_request_exception=False)
+    selected = set(args.scenarios.split(",")) if args.scenarios else None
+
+    results = []
+    for size in args.sizes:
+        started = time.perf_counter()
+        dataset = seed(size, args.rule_density, args.responses, rng)
+        elapsed = time.perf_counter() - started
+        print(f"Seeded {size} fields and {args.responses} responses in {elapsed:.1f}s", file=sys.stderr)
+        payload = survey_payload(size, args.rule_density, rng)
+        for scenario in scenarios(dataset, payload):
+            if selected is not None and scenario.name not in selected:
+                continue
+            if scenario.client == "async":
+                summary = asyncio.run(
+                    ameasure(scenario, async_client, headers, counter, args.iterations, args.warmup)
+                )
+            else:
+                summary = measure(scenario, client, headers, counter, args.iterations, args.warmup)
+            results.append({"scenario": scenario.name, "fields": size, **summary})
+            print(
+                f"{scenario.name:<26} {size:>5} fields  p50 {summary['p50_ms']:>9.3f} ms  "
+                f"p95 {summary['p95_ms']:>9.3f} ms  {summary['queries_max']:>4} queries  {summary['status']}",
+                file=sys.stderr,
+            )
+
+    commit, dirty = git_commit()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "measured_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "settings": settings.SETTINGS_MODULE,
+        "parameters": {
+            "sizes": args.sizes,
+            "rule_density": args.rule_density,
+            "responses": args.responses,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10,100,500", help="Comma-separated field counts of the seeded surveys")
+    parser.add_argument("--rule-density", type=float, default=0.3, help="Share of fields with a rule")
+    parser.add_argument("--responses", type=int, default=1000, help="Responses seeded per survey")
+    parser.add_argument("--iterations", type=int, default=50, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each scenario")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the datasets")
+    parser.add_argument("--scenarios", help="Comma-separated scenarios to run (all by default)")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Tolerated p95 growth, as a ratio")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore p95 growth below this many ms")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    if min(args.sizes) < 4 or args.iterations < 2:
+        parser.error("Surveys need at least 4 fields and scenarios at least 2 iterations.")
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "survey_platform.settings")
+    import django
+
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment(debug=False)
+    database_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        report = run(args)
+    finally:
+        connection.creation.destroy_test_db(database_name, verbosity=0)
+        teardown_test_environment()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report["results"], json.load(file), args.max_regression, args.min_delta_ms)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
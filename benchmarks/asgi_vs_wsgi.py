@@ -0,0 +1,189 @@
+"""Compare sync WSGI and async ASGI throughput of the respondent endpoints at high concurrency.
+
+Each server runs as a single worker process: gunicorn with threaded workers for the WSGI application and
+uvicorn for the ASGI application. Both are driven by the same number of concurrent keep-alive clients; the
+WSGI server is measured on the DRF views and the ASGI server on the async views:
+
+    python benchmarks/asgi_vs_wsgi.py --concurrency 200 --duration 20
+
+Run it from the project root against a migrated database; the settings in ``DJANGO_SETTINGS_MODULE`` are used
+by both servers, whose ``ALLOWED_HOSTS`` must accept ``127.0.0.1``. A survey with ``--fields`` fields is
+created unless ``--survey`` is given. Results are printed as JSON.
+
+The ASGI handler costs more CPU per request than WSGI, so on a local SQLite file, where queries return in
+microseconds, the threaded WSGI server comes out ahead. The async views pay off once requests wait on the
+network (a remote database, Redis) and concurrency exceeds the gunicorn threads: run it against the
+production database and pass ``--token`` to include the respondent's answer lookup.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    "wsgi": "/api/surveys/{survey}/",
+    "asgi": "/api/async/surveys/{survey}/",
+}
+
+
+def server_command(server, port, threads):
+    if server == "wsgi":
+        return [
+            "gunicorn",
+            "survey_platform.wsgi:application",
+            "--workers=1",
+            "--worker-class=gthread",
+            f"--threads={threads}",
+            f"--bind=127.0.0.1:{port}",
+        ]
+    return ["uvicorn", "survey_platform.asgi:application", "--workers=1", f"--port={port}", "--no-access-log"]
+
+
+def create_survey(fields):
+    """Create a survey with ``fields`` text fields spread over sections of ten and return its id."""
+    import django
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "survey_platform.settings")
+    django.setup()
+    from surveys.models import Field, Section, Survey
+
+    survey = Survey.objects.create(title="Benchmark survey")
+    sections = Section.objects.bulk_create(
+        [Section(survey=survey, title=f"Section {index}", order=index) for index in range((fields + 9) // 10)]
+    )
+    Field.objects.bulk_create(
+        [
+            Field(section=sections[index // 10], label=f"Question {index}", field_type="text", order=index)
+            for index in range(fields)
+        ]
+    )
+    return survey.id
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response and return ``(status, keep_alive)``."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close"
+
+
+async def client(port, request, deadline, latencies, errors):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        started = time.perf_counter()
+        try:
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append("connection")
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            errors.append(status)
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, path, concurrency, duration, token):
+    headers = [f"GET {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: keep-alive"]
+    if token:
+        headers.append(f"Authorization: Bearer {token}")
+    request = ("\r\n".join(headers) + "\r\n\r\n").encode()
+
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client(port, request, deadline, latencies, errors) for _ in range(concurrency)))
+    return latencies, errors
+
+
+def summarize(latencies, errors, duration):
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return {
+        "requests": len(latencies),
+        "errors": {str(error): count for error, count in Counter(errors).items()},
+        "requests_per_second": round(len(latencies) / duration, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+def run(server, args):
+    process = subprocess.Popen(server_command(server, args.port, args.threads), cwd=ROOT)
+    try:
+        wait_for_port(args.port)
+        path = ENDPOINTS[server].format(survey=args.survey)
+        # Warm the document cache and the servers' imports before measuring
+        asyncio.run(load(args.port, path, 1, 1, args.token))
+        latencies, errors = asyncio.run(load(args.port, path, args.concurrency, args.duration, args.token))
+        return summarize(latencies, errors, args.duration)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--survey", type=int, help="Survey to fetch (a new one is created when omitted)")
+    parser.add_argument("--fields", type=int, default=50, help="Fields of the created survey")
+    parser.add_argument("--concurrency", type=int, default=200, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load per server")
+    parser.add_argument("--threads", type=int, default=8, help="Threads of the gunicorn worker")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", help="JWT access token, to measure authenticated respondents")
+    parser.add_argument("--servers", default="wsgi,asgi", help="Comma-separated servers to measure")
+    args = parser.parse_args()
+
+    if args.survey is None:
+        args.survey = create_survey(args.fields)
+
+    results = {"survey": args.survey, "concurrency": args.concurrency, "threads": args.threads}
+    for server in args.servers.split(","):
+        results[server] = run(server, args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Query plans and latency of the ``ResponseData`` access paths, with and without the indexes of migration 0009.
+
+A throwaway test database is created with the backend of the configured settings (an in-memory SQLite
+database, or ``test_<name>`` on Postgres) and seeded with one survey: a radio, a dropdown, a number and a text
+field, ``--responses`` responses from ``--respondents`` distinct respondents, ``--completed`` of them
+completed. Every access path below is run ``--iterations`` times with the current schema, then again after
+migrating back to ``0008_survey_document``, which restores the single-column foreign key indexes and drops
+the unique constraint, the composite and covering indexes and the partial index on completed responses:
+
+    python benchmarks/response_data_indexes.py --responses 50000 --output plans.json
+
+Results are JSON: for each path and schema, p50 and mean latency and the EXPLAIN plan of every query the path
+runs, after ``ANALYZE`` refreshed the planner statistics. A summary is printed to standard error. Run it
+from the project root; plans only mean something on the production database engine.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Dataset = namedtuple("Dataset", ["survey_id", "plan", "region", "score", "comment", "email"])
+
+# ``run(dataset)`` runs the path's queries and consumes their results
+Path = namedtuple("Path", ["name", "run"])
+
+BATCH_SIZE = 2000
+
+
+def seed(responses, respondents, completed, rng):
+    """Create the benchmark survey and its responses, with one answer to every field per response."""
+    from surveys.models import Field, Response, ResponseData, Section, Survey
+
+    survey = Survey.objects.create(title="Index benchmark survey")
+    section = Section.objects.create(survey=survey, title="Section", order=1)
+    plan = Field.objects.create(section=section, label="Plan", field_type="radio", order=1, choices=["a", "b", "c"])
+    region = Field.objects.create(
+        section=section, label="Region", field_type="dropdown", order=2, choices=["eu", "us", "apac"]
+    )
+    score = Field.objects.create(section=section, label="Score", field_type="number", order=3)
+    comment = Field.objects.create(section=section, label="Comment", field_type="text", order=4)
+
+    for start in range(0, responses, BATCH_SIZE):
+        batch = Response.objects.bulk_create(
+            Response(
+                survey=survey,
+                email=f"respondent{rng.randrange(respondents)}@example.com",
+                completed=rng.random() < completed,
+            )
+            for _ in range(min(BATCH_SIZE, responses - start))
+        )
+        answers = []
+        for response in batch:
+            for field, value in (
+                (plan, rng.choice(plan.choices)),
+                (region, rng.choice(region.choices)),
+                (score, str(rng.randint(0, 10))),
+                (comment, f"Comment {rng.random()}"),
+            ):
+                answer = ResponseData(response=response, survey=survey, field=field, value=value)
+                answer.populate_typed_values(field.field_type)
+                answers.append(answer)
+        ResponseData.objects.bulk_create(answers)
+
+    return Dataset(survey.id, plan, region, score, comment, "respondent0@example.com")
+
+
+def paths():
+    """The access paths of the API that read ``ResponseData`` by field, by respondent or by completion."""
+    from django.db.models import Count
+    from surveys import respondents
+    from surveys.analytics import crosstab
+    from surveys.models import Response, ResponseData
+
+    return [
+        Path("crosstab", lambda dataset: crosstab.crosstab(dataset.plan, dataset.region)),
+        Path(
+            "crosstab of completed responses",
+            lambda dataset: crosstab.crosstab(dataset.plan, dataset.region, completed=True),
+        ),
+        Path(
+            "answers to a field grouped by value",
+            lambda dataset: list(
+                ResponseData.objects.filter(field=dataset.plan).values("value").annotate(n=Count("id")).order_by()
+            ),
+        ),
+        Path(
+            "respondent's answers to a survey",
+            lambda dataset: list(respondents._recorded_answers(dataset.survey_id, dataset.email)),
+        ),
+        Path(
+            "page of completed responses",
+            lambda dataset: list(
+                Response.objects.filter(survey_id=dataset.survey_id, completed=True).order_by("created_at", "id")[:50]
+            ),
+        ),
+    ]
+
+
+def explain(queries):
+    from django.db import connection
+
+    plans = []
+    for query in queries:
+        if not query["sql"].lstrip().upper().startswith("SELECT"):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}")
+            plans.append({"sql": query["sql"], "plan": [" ".join(str(column) for column in row) for row in cursor]})
+    return plans
+
+
+def measure(path, dataset, iterations):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        path.run(dataset)
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        path.run(dataset)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "plans": explain(queries.captured_queries),
+    }
+
+
+def analyze():
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def run(args):
+    import django
+    from django.core.management import call_command
+    from django.db import connection
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    dataset = seed(args.responses, args.respondents, args.completed, rng)
+    print(f"Seeded {args.responses} responses in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    results = []
+    for schema in ("indexed", "before"):
+        if schema == "before":
+            call_command("migrate", "surveys", "0008_survey_document", verbosity=0)
+        analyze()
+        for path in paths():
+            result = measure(path, dataset, args.iterations)
+            results.append({"path": path.name, "schema": schema, **result})
+
+    by_schema = {(result["path"], result["schema"]): result for result in results}
+    for path in paths():
+        before, indexed = by_schema[(path.name, "before")], by_schema[(path.name, "indexed")]
+        print(
+            f"{path.name:<38} before {before['p50_ms']:>9.3f} ms  indexed {indexed['p50_ms']:>9.3f} ms",
+            file=sys.stderr,
+        )
+
+    return {
+        "measured_at": datetime.now(timezone.utc).isoformat(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "parameters": {
+            "responses": args.responses,
+            "respondents": args.respondents,
+            "completed": args.completed,
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--responses", type=int, default=20000, help="Responses seeded, with 4 answers each")
+    parser.add_argument("--respondents", type=int, default=2000, help="Distinct respondent emails")
+    parser.add_argument("--completed", type=float, default=0.3, help="Share of completed responses")
+    parser.add_argument("--iterations", type=int, default=20, help="Measured runs of every path")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the dataset")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "survey_platform.settings")
+    import django
+
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment(debug=False)
+    database_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        report = run(args)
+    finally:
+        connection.creation.destroy_test_db(database_name, verbosity=0)
+        teardown_test_environment()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
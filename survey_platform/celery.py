@@ -0,0 +1,16 @@
+"""
+Celery application for survey_platform.
+
+Workers are started with ``celery -A survey_platform worker`` and the periodic drain of the submission queue
+with ``celery -A survey_platform beat``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "survey_platform.settings")
+
+app = Celery("survey_platform")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -0,0 +1,57 @@
+"""A thread-safe mapping that keeps its ``maxsize`` most recently used entries.
+
+Per-process caches keyed by survey id would otherwise grow with every survey a long-lived worker has served.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Least recently used cache; ``get`` and ``set`` count as uses, the oldest entry is evicted past ``maxsize``."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def setdefault(self, key, value):
+        """Return the entry of ``key``, storing ``value`` first when there is none."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self._set(key, value)
+            return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _set(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
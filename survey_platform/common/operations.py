@@ -0,0 +1,91 @@
+"""Migration operations that build indexes without blocking writes on PostgreSQL.
+
+``CREATE INDEX`` holds a lock that blocks every write to the table for as long as the build takes. On PostgreSQL
+these operations build with ``CONCURRENTLY`` instead, which requires a migration with ``atomic = False``; on
+other databases they behave like ``AddIndex`` and ``AddConstraint``.
+
+Partitioned tables cannot be indexed concurrently: their index is created on the parent only, then built
+concurrently on every partition and attached partition by partition.
+"""
+
+from django.contrib.postgres.operations import AddIndexConcurrently, NotInTransactionMixin
+from django.db.migrations import AddConstraint, AddIndex
+
+
+def _is_postgresql(schema_editor):
+    return schema_editor.connection.vendor == "postgresql"
+
+
+def _partitions(schema_editor, table):
+    """The partitions of ``table``, empty if it is not partitioned."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits JOIN pg_partitioned_table ON partrelid = inhparent "
+            "WHERE inhparent = to_regclass(%s) ORDER BY 1",
+            [table],
+        )
+        return [partition for partition, in cursor.fetchall()]
+
+
+class ConcurrentAddIndex(AddIndexConcurrently):
+    """``AddIndexConcurrently`` on PostgreSQL, ``AddIndex`` elsewhere."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not _is_postgresql(schema_editor):
+            return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        partitions = _partitions(schema_editor, model._meta.db_table)
+        if not partitions:
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        self._ensure_not_in_transaction(schema_editor)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+
+        table, quote_name = model._meta.db_table, schema_editor.quote_name
+        statement = self.index.create_sql(model, schema_editor)
+        statement.parts["table"] = f"ONLY {quote_name(table)}"
+        schema_editor.execute(statement)
+        for partition in partitions:
+            name = schema_editor._create_index_name(partition, [self.index.name], suffix="idx")
+            statement = self.index.create_sql(model, schema_editor, concurrently=True)
+            statement.rename_table_references(table, partition)
+            statement.parts["name"] = quote_name(name)
+            schema_editor.execute(statement)
+            schema_editor.execute(f"ALTER INDEX {quote_name(self.index.name)} ATTACH PARTITION {quote_name(name)}")
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if not _is_postgresql(schema_editor):
+            return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not _partitions(schema_editor, model._meta.db_table):
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        # Dropping the parent's index drops those of the partitions, but cannot be done concurrently
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index)
+
+
+class ConcurrentAddUniqueConstraint(NotInTransactionMixin, AddConstraint):
+    """``AddConstraint`` of a plain ``UniqueConstraint`` on fields, built concurrently on PostgreSQL.
+
+    The unique index is created with ``CREATE UNIQUE INDEX CONCURRENTLY`` and then turned into the constraint
+    with ``ADD CONSTRAINT ... USING INDEX``, which only takes a brief lock. A build that fails, on duplicates for
+    instance, leaves an invalid index behind, which is dropped when the migration is run again.
+    """
+
+    atomic = False
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not _is_postgresql(schema_editor):
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        table = schema_editor.quote_name(model._meta.db_table)
+        name = schema_editor.quote_name(self.constraint.name)
+        columns = ", ".join(
+            schema_editor.quote_name(model._meta.get_field(field).column) for field in self.constraint.fields
+        )
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        schema_editor.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {name} ON {table} ({columns})")
+        schema_editor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
@@ -0,0 +1,284 @@
+"""Per-request instrumentation: wall time, database time and queries, serialization time and cache hits.
+
+``InstrumentationMiddleware`` keeps a ``RequestMetrics`` in a context variable for the duration of each request,
+so that it follows the request into the worker threads of async views. A database execute wrapper, the
+``TimedJSONRenderer`` and the ``record_cache`` calls of the survey caches add to it; each costs a context
+variable lookup outside requests. When the response is ready the middleware:
+
+- adds a ``Server-Timing`` header, shown per request by browser developer tools;
+- logs one JSON line to the ``survey_platform.requests`` logger;
+- observes the timings in per-route histograms, served in the Prometheus text format by ``metrics``.
+
+Histograms live in the memory of each process: with several workers, scrape each of them.
+"""
+
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger("survey_platform.requests")
+
+_current = ContextVar("request_metrics", default=None)
+
+# Seconds, from 1 ms to 10 s
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    __slots__ = ("started", "db_time", "queries", "serialize_time", "cache")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.serialize_time = 0.0
+        # Cache name -> [hits, misses]
+        self.cache = {}
+
+
+def current_metrics():
+    """The ``RequestMetrics`` of the request being handled, or ``None`` outside requests."""
+    return _current.get()
+
+
+def record_cache(name, hit):
+    """Count a lookup in the cache ``name`` towards the current request, if any."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache.setdefault(name, [0, 0])[0 if hit else 1] += 1
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    # Sent again whenever a closed connection reconnects
+    if _execute_wrapper not in connection.execute_wrappers:
+        # First: ``connection.execute_wrapper()`` blocks pop the last wrapper when they exit
+        connection.execute_wrappers.insert(0, _execute_wrapper)
+
+
+connection_created.connect(_instrument_connection, dispatch_uid="survey_platform.instrumentation")
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that adds its rendering time to the current request's serialization time."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            metrics.serialize_time += time.perf_counter() - started
+
+
+def _format_labels(names, values):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class Histogram:
+    """A Prometheus histogram with cumulative buckets, keyed by label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            # One counter per bucket, then the sum and the count of the observations
+            series = self._series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for labels, series in sorted(self._series.items()):
+            label_text = _format_labels(self.labels, labels)
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}'
+            yield f"{self.name}_sum{{{label_text}}} {series[-2]}"
+            yield f"{self.name}_count{{{label_text}}} {series[-1]}"
+
+
+class Counter:
+    """A Prometheus counter keyed by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._series = {}
+
+    def inc(self, labels, amount=1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self._series.items()):
+            yield f"{self.name}{{{_format_labels(self.labels, labels)}}} {value}"
+
+
+class Registry:
+    """The metrics of this process. Updates and rendering hold one lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        route = ("route", "method")
+        self.requests = Counter("http_requests_total", "Requests by route, method and status.", route + ("status",))
+        self.duration = Histogram("http_request_duration_seconds", "Wall time of requests.", route, DURATION_BUCKETS)
+        self.db = Histogram("http_request_db_seconds", "Database time of requests.", route, DURATION_BUCKETS)
+        self.queries = Histogram("http_request_queries", "Database queries per request.", route, QUERY_BUCKETS)
+        self.serialize = Histogram(
+            "http_request_serialize_seconds", "JSON rendering time of requests.", route, DURATION_BUCKETS
+        )
+        self.cache = Counter("http_request_cache_lookups_total", "Cache lookups of requests.", ("cache", "result"))
+
+    def observe(self, route, method, status, metrics, duration):
+        with self.lock:
+            self.requests.inc((route, method, str(status)))
+            self.duration.observe((route, method), duration)
+            self.db.observe((route, method), metrics.db_time)
+            self.queries.observe((route, method), metrics.queries)
+            self.serialize.observe((route, method), metrics.serialize_time)
+            for name, (hits, misses) in metrics.cache.items():
+                self.cache.inc((name, "hit"), hits)
+                self.cache.inc((name, "miss"), misses)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in (self.requests, self.duration, self.db, self.queries, self.serialize, self.cache):
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    # The URL pattern rather than the path, so that label values stay few
+    return f"/{match.route}" if match is not None else "unmatched"
+
+
+def server_timing(metrics, duration):
+    """The ``Server-Timing`` header value of a request; durations in milliseconds."""
+    entries = [
+        f"total;dur={duration * 1000:.2f}",
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+        f"serialize;dur={metrics.serialize_time * 1000:.2f}",
+    ]
+    for name, (hits, misses) in sorted(metrics.cache.items()):
+        entries.append(f'cache-{name};desc="{hits} hits / {misses} misses"')
+    return ", ".join(entries)
+
+
+class InstrumentationMiddleware:
+    """Measure every request; see the module documentation. Put it first in ``MIDDLEWARE``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            _instrument_connection(None, connection)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _current.set(RequestMetrics())
+        try:
+            response = self.get_response(request)
+            self.finish(request, response, _current.get())
+        finally:
+            _current.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = _current.set(RequestMetrics())
+        try:
+            response = await self.get_response(request)
+            self.finish(request, response, _current.get())
+        finally:
+            _current.reset(token)
+        return response
+
+    def finish(self, request, response, metrics):
+        # Streaming responses are measured up to their first byte
+        duration = time.perf_counter() - metrics.started
+        route = _route(request)
+        registry.observe(route, request.method, response.status_code, metrics, duration)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response["Server-Timing"] = server_timing(metrics, duration)
+        if logger.isEnabledFor(logging.INFO):
+            record = {
+                "method": request.method,
+                "route": route,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 2),
+                "db_ms": round(metrics.db_time * 1000, 2),
+                "queries": metrics.queries,
+                "serialize_ms": round(metrics.serialize_time * 1000, 2),
+                "cache": {name: {"hits": hits, "misses": misses} for name, (hits, misses) in metrics.cache.items()},
+            }
+            logger.info(json.dumps(record))
+
+
+def metrics(request):
+    """Serve the metrics of this process in the Prometheus text format.
+
+    Scrapers must send ``Authorization: Bearer <METRICS_TOKEN>`` from one of ``METRICS_ALLOWED_IPS``; without a
+    ``METRICS_TOKEN`` the endpoint does not exist.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if scheme.lower() != "bearer" or not constant_time_compare(token, settings.METRICS_TOKEN):
+        raise PermissionDenied
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
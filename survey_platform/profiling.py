@@ -0,0 +1,183 @@
+"""On-demand cProfile profiles of individual requests, for slow requests that only happen in production.
+
+``ProfilingMiddleware`` profiles everything below it, from the view through the serializers' rendering and
+the visibility rules, when a request:
+
+- carries an ``X-Profile-Token`` header signed by ``issue_token`` (``manage.py profiles token``);
+- has a ``profile`` query parameter and comes from a staff user, by session or JWT;
+- is drawn by ``PROFILING_SAMPLE_RATE``, the fraction of all requests profiled (none by default).
+
+Each profile is written to ``PROFILING_DIR`` as a ``.prof`` file, readable by ``pstats`` and snakeviz, next to
+a ``.json`` file describing the request. Only the ``PROFILING_MAX_FILES`` newest are kept. The response names
+its profile in an ``X-Profile-Id`` header; ``manage.py profiles list`` and ``profiles show`` read them back.
+
+Requests handled asynchronously are not profiled: cProfile follows one thread, and async views run on the
+event loop and in worker threads.
+"""
+
+import cProfile
+import json
+import pstats
+import random
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import uuid4
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from survey_platform.instrumentation import current_metrics
+
+TOKEN_HEADER = "HTTP_X_PROFILE_TOKEN"
+TOKEN_SALT = "survey_platform.profiling"
+QUERY_PARAMETER = "profile"
+
+
+def issue_token():
+    """A token that enables profiling in ``X-Profile-Token`` headers until ``PROFILING_TOKEN_MAX_AGE`` passes."""
+    return signing.dumps("profile", salt=TOKEN_SALT)
+
+
+def _has_valid_token(request):
+    token = request.META.get(TOKEN_HEADER)
+    if not token:
+        return False
+    try:
+        signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _is_staff(request):
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        # The API authenticates in the views; only requests asking to be profiled pay for it here
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            return False
+        user = authenticated[0] if authenticated else None
+    return user is not None and user.is_staff
+
+
+def trigger(request):
+    """Why ``request`` should be profiled: ``"token"``, ``"staff"``, ``"sample"``, or ``None``."""
+    if _has_valid_token(request):
+        return "token"
+    if QUERY_PARAMETER in request.GET and _is_staff(request):
+        return "staff"
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+def _directory():
+    return Path(settings.PROFILING_DIR)
+
+
+def _route(request):
+    match = request.resolver_match
+    return f"/{match.route}" if match is not None else request.path
+
+
+def save(profiler, request, response, reason, duration):
+    """Write the profile of ``request`` and its description to the ring directory; returns the profile id."""
+    directory = _directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    created = datetime.now(timezone.utc)
+    route = _route(request)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+    # Sorting ids sorts profiles by age
+    profile_id = f"{created:%Y%m%dT%H%M%S%f}-{request.method}-{slug}-{uuid4().hex[:6]}"
+
+    profiler.dump_stats(directory / f"{profile_id}.prof")
+    user = getattr(request, "user", None)
+    metrics = current_metrics()
+    description = {
+        "id": profile_id,
+        "created": created.isoformat(),
+        "trigger": reason,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "route": route,
+        "view_kwargs": request.resolver_match.kwargs if request.resolver_match is not None else {},
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 2),
+        "queries": metrics.queries if metrics is not None else None,
+        "db_ms": round(metrics.db_time * 1000, 2) if metrics is not None else None,
+    }
+    (directory / f"{profile_id}.json").write_text(json.dumps(description, indent=2))
+    prune(settings.PROFILING_MAX_FILES)
+    return profile_id
+
+
+def prune(keep):
+    """Delete all but the ``keep`` newest profiles."""
+    profiles = sorted(_directory().glob("*.prof"))
+    for path in profiles[: max(len(profiles) - keep, 0)]:
+        # Another process may be pruning the same directory
+        path.unlink(missing_ok=True)
+        path.with_suffix(".json").unlink(missing_ok=True)
+
+
+def stored_profiles():
+    """Descriptions of the stored profiles, newest first."""
+    profiles = []
+    for path in sorted(_directory().glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+    return profiles
+
+
+def load(profile_id):
+    """The ``pstats.Stats`` of a stored profile. Raises ``FileNotFoundError`` for unknown ids."""
+    path = _directory() / f"{profile_id}.prof"
+    if path.parent != _directory() or not path.is_file():
+        raise FileNotFoundError(profile_id)
+    return pstats.Stats(str(path))
+
+
+class ProfilingMiddleware:
+    """Profile the requests selected by ``trigger``; see the module documentation. Put it after authentication."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        reason = trigger(request)
+        if reason is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this thread
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        response["X-Profile-Id"] = save(profiler, request, response, reason, time.perf_counter() - started)
+        return response
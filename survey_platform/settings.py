@@ -29,18 +29,18 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework_simplejwt",
     "drf_yasg",
-    "debug_toolbar",
     # Custom Apps
     "surveys",
 ]
 
 MIDDLEWARE = [
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "survey_platform.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "survey_platform.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -81,6 +81,61 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Redis in production; a local-memory cache stands in when REDIS_URL is not set (development and tests).
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Cache alias and timeout (in seconds) for rendered survey documents
+SURVEY_CACHE_ALIAS = "default"
+SURVEY_CACHE_TIMEOUT = int(os.getenv("SURVEY_CACHE_TIMEOUT", 60 * 60 * 24))
+# Surveys whose compiled rules and validation schema each process keeps, least recently used first out
+SURVEY_PROCESS_CACHE_SIZE = int(os.getenv("SURVEY_PROCESS_CACHE_SIZE", 1000))
+
+
+# Celery
+# https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+# Without a broker, tasks run inline in the calling process (development, tests and single-node deployments).
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "memory://")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", str("CELERY_BROKER_URL" not in os.environ)) == "True"
+CELERY_TASK_ACKS_LATE = True
+CELERY_BEAT_SCHEDULE = {
+    "drain-submissions": {"task": "surveys.tasks.drain_submissions", "schedule": 1.0},
+    "recover-submissions": {"task": "surveys.tasks.recover_submissions", "schedule": 60.0},
+}
+
+# Write-behind ingestion of survey submissions: "redis" shares the queue between web and worker processes,
+# "memory" keeps it in the web process and drains it through the (eager) Celery task after every submission.
+SURVEY_INGESTION_BACKEND = os.getenv("SURVEY_INGESTION_BACKEND", "redis" if REDIS_URL else "memory")
+SURVEY_INGESTION_QUEUE_KEY = "surveys:submissions"
+SURVEY_INGESTION_BATCH_SIZE = int(os.getenv("SURVEY_INGESTION_BATCH_SIZE", 500))
+# Seconds after which a batch popped by a worker that never acknowledged it is put back on the queue
+SURVEY_INGESTION_VISIBILITY_TIMEOUT = int(os.getenv("SURVEY_INGESTION_VISIBILITY_TIMEOUT", 300))
+# Failed writes of a submission after which it is moved to the dead letters (``<queue key>:dead`` on Redis).
+# Failures of an unavailable database are not counted.
+SURVEY_INGESTION_MAX_ATTEMPTS = int(os.getenv("SURVEY_INGESTION_MAX_ATTEMPTS", 5))
+
+# Partition the response tables by survey on PostgreSQL (migration 0011 or ``manage.py response_partitions enable``),
+# so that deleting a survey drops its partitions. See ``surveys.partitioning``.
+SURVEY_RESPONSE_PARTITIONING = os.getenv("SURVEY_RESPONSE_PARTITIONING", "False") == "True"
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -128,9 +183,68 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
+    # Timed so that the instrumentation can report serialization time
+    "DEFAULT_RENDERER_CLASSES": (
+        "survey_platform.instrumentation.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+}
+
+
+# Request instrumentation (see survey_platform/instrumentation.py)
+# Wall time, database time, query count, serialization time and cache hits of every request, reported in
+# Server-Timing headers, JSON log lines and the Prometheus-text histograms served at /metrics.
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "True") == "True"
+INSTRUMENTATION_SERVER_TIMING = os.getenv("INSTRUMENTATION_SERVER_TIMING", "True") == "True"
+# Bearer token that scrapers of /metrics must send; /metrics is disabled when it is empty
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Clients allowed to scrape /metrics. Behind a reverse proxy every client has the proxy's address.
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+# WARNING silences the JSON request log (see survey_platform/test_settings.py)
+REQUEST_LOG_LEVEL = os.getenv("REQUEST_LOG_LEVEL", "INFO")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "requests": {"class": "logging.StreamHandler", "formatter": "message"},
+    },
+    "loggers": {
+        "survey_platform.requests": {
+            "handlers": ["requests"],
+            "level": REQUEST_LOG_LEVEL,
+            "propagate": False,
+        },
+    },
 }
 
+
+# Request profiling (see survey_platform/profiling.py)
+# cProfile profiles of requests sent with a signed X-Profile-Token header (`manage.py profiles token`), of staff
+# requests with a `profile` query parameter, and of a PROFILING_SAMPLE_RATE fraction of all requests.
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "True") == "True"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+# Seconds a token from `manage.py profiles token` stays valid
+PROFILING_TOKEN_MAX_AGE = int(os.getenv("PROFILING_TOKEN_MAX_AGE", 60 * 60))
+# Ring directory of the profiles: only the PROFILING_MAX_FILES newest are kept
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 100))
+
+
 # Debug toolbar settings
+# Only with DEBUG and DEBUG_TOOLBAR set: the toolbar is a development dependency, and its SQL panel
+# instruments every query of every request.
+ENABLE_DEBUG_TOOLBAR = DEBUG and os.getenv("DEBUG_TOOLBAR", "False") == "True"
+
+if ENABLE_DEBUG_TOOLBAR:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(1, "debug_toolbar.middleware.DebugToolbarMiddleware")
+
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
@@ -0,0 +1,8 @@
+"""Settings of the test suite: ``manage.py test --settings=survey_platform.test_settings``."""
+
+from .settings import *  # noqa: F401,F403
+from .settings import LOGGING
+
+# The JSON request log would otherwise print a line per test request
+REQUEST_LOG_LEVEL = "WARNING"
+LOGGING["loggers"]["survey_platform.requests"]["level"] = REQUEST_LOG_LEVEL
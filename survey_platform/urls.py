@@ -1,8 +1,16 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from debug_toolbar.toolbar import debug_toolbar_urls
+
+from survey_platform.instrumentation import metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("surveys.urls")),
-] + debug_toolbar_urls()  # Debug toolbar URLs will only be added if DEBUG is True
+    path("metrics", metrics, name="metrics"),
+]
+
+if settings.ENABLE_DEBUG_TOOLBAR:
+    from debug_toolbar.toolbar import debug_toolbar_urls
+
+    urlpatterns += debug_toolbar_urls()
@@ -0,0 +1,244 @@
+"""Incrementally maintained answer aggregates.
+
+Writes of responses and answers are accumulated into an ``AggregateDelta`` and applied to the aggregate
+tables with a fixed number of statements, whatever the number of answers: one conditional UPDATE per table,
+preceded by an INSERT that ignores existing rows. Callers apply the delta in the same transaction as the
+write it describes, or once per batch for bulk ingestion, so reports never need to scan ``ResponseData``.
+"""
+
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, F, Max, Min, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from ..models import Field, FieldChoiceCount, FieldNumericStats, Response, ResponseData, SurveyResponseStats
+from ..validation import SurveySchema, get_schema
+
+CHOICE_FIELD_TYPES = {"dropdown", "radio", "checkbox"}
+
+
+class _NumericDelta:
+    __slots__ = ("count", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, number):
+        number = float(number)
+        self.count += 1
+        self.total += number
+        self.minimum = number if self.minimum is None else min(self.minimum, number)
+        self.maximum = number if self.maximum is None else max(self.maximum, number)
+
+
+class AggregateDelta:
+    """The effect of a set of written and deleted responses and answers on the aggregate tables."""
+
+    def __init__(self, schemas=None):
+        self.submitted = Counter()
+        self.completed = Counter()
+        self.choices = Counter()
+        self.added_numbers = defaultdict(_NumericDelta)
+        self.removed_numbers = defaultdict(_NumericDelta)
+        # The schema of each survey, resolved once per delta rather than once per answer
+        self._schemas = dict(schemas or {})
+
+    def _schema(self, survey_id):
+        schema = self._schemas.get(survey_id)
+        if schema is None:
+            schema = self._schemas[survey_id] = get_schema(survey_id)
+        return schema
+
+    def add_response(self, survey_id, completed, sign=1):
+        self.submitted[survey_id] += sign
+        if completed:
+            self.completed[survey_id] += sign
+
+    def remove_response(self, survey_id, completed):
+        self.add_response(survey_id, completed, sign=-1)
+
+    def add_answer(self, survey_id, field_id, raw, sign=1):
+        validator = self._schema(survey_id).validators.get(field_id)
+        if validator is None:
+            return
+        field_type = validator.field.field_type
+        if field_type not in CHOICE_FIELD_TYPES and field_type != "number":
+            return
+        try:
+            value = validator.clean(raw)
+        except ValueError:
+            # Answers that do not validate were never counted
+            return
+
+        if field_type == "number":
+            (self.added_numbers if sign > 0 else self.removed_numbers)[field_id].add(value)
+        else:
+            for choice in value if isinstance(value, list) else [value]:
+                self.choices[(field_id, choice)] += sign
+
+    def remove_answer(self, survey_id, field_id, raw):
+        self.add_answer(survey_id, field_id, raw, sign=-1)
+
+    def apply(self):
+        self._apply_survey_stats()
+        self._apply_choice_counts()
+        self._apply_numeric_stats()
+
+    def _apply_survey_stats(self):
+        survey_ids = {survey_id for survey_id, n in self.submitted.items() if n} | {
+            survey_id for survey_id, n in self.completed.items() if n
+        }
+        if not survey_ids:
+            return
+        SurveyResponseStats.objects.bulk_create(
+            [SurveyResponseStats(survey_id=survey_id) for survey_id in survey_ids], ignore_conflicts=True
+        )
+        SurveyResponseStats.objects.filter(survey_id__in=survey_ids).update(
+            submitted=F("submitted") + _case("survey_id", self.submitted),
+            completed=F("completed") + _case("survey_id", self.completed),
+        )
+
+    def _apply_choice_counts(self):
+        changes = {key: n for key, n in self.choices.items() if n}
+        if not changes:
+            return
+        FieldChoiceCount.objects.bulk_create(
+            [FieldChoiceCount(field_id=field_id, value=value) for field_id, value in changes], ignore_conflicts=True
+        )
+        matches = [(Q(field_id=field_id, value=value), n) for (field_id, value), n in changes.items()]
+        FieldChoiceCount.objects.filter(reduce(or_, (q for q, _ in matches))).update(
+            count=F("count") + Case(*(When(q, then=Value(n)) for q, n in matches), default=Value(0))
+        )
+
+    def _apply_numeric_stats(self):
+        field_ids = self.added_numbers.keys() | self.removed_numbers.keys()
+        if not field_ids:
+            return
+        FieldNumericStats.objects.bulk_create(
+            [FieldNumericStats(field_id=field_id) for field_id in field_ids], ignore_conflicts=True
+        )
+
+        # Removing the current minimum or maximum means recomputing it from the remaining answers
+        stale = set()
+        if self.removed_numbers:
+            for field_id, minimum, maximum in FieldNumericStats.objects.filter(
+                field_id__in=self.removed_numbers.keys()
+            ).values_list("field_id", "minimum", "maximum"):
+                removed = self.removed_numbers[field_id]
+                if minimum is None or removed.minimum <= minimum or removed.maximum >= maximum:
+                    stale.add(field_id)
+
+        count, total, minimum, maximum = [], [], [], []
+        for field_id in field_ids:
+            added = self.added_numbers.get(field_id, _NumericDelta())
+            removed = self.removed_numbers.get(field_id, _NumericDelta())
+            count.append(When(field_id=field_id, then=Value(added.count - removed.count)))
+            total.append(When(field_id=field_id, then=Value(added.total - removed.total)))
+            if added.count:
+                lowest, highest = Value(added.minimum), Value(added.maximum)
+                minimum.append(When(field_id=field_id, then=Least(Coalesce(F("minimum"), lowest), lowest)))
+                maximum.append(When(field_id=field_id, then=Greatest(Coalesce(F("maximum"), highest), highest)))
+
+        FieldNumericStats.objects.filter(field_id__in=field_ids).update(
+            count=F("count") + Case(*count, default=Value(0)),
+            total=F("total") + Case(*total, default=Value(0.0)),
+            minimum=Case(*minimum, default=F("minimum")),
+            maximum=Case(*maximum, default=F("maximum")),
+        )
+
+        for field_id in stale:
+            _recompute_extremes(field_id)
+
+
+def _case(key, deltas):
+    return Case(*(When(**{key: k}, then=Value(n)) for k, n in deltas.items()), default=Value(0))
+
+
+def _recompute_extremes(field_id):
+    extremes = ResponseData.objects.filter(field_id=field_id).aggregate(
+        minimum=Min("value_number"), maximum=Max("value_number")
+    )
+    FieldNumericStats.objects.filter(field_id=field_id).update(**extremes)
+
+
+def survey_report(survey):
+    """Build the analytics document of ``survey`` from the aggregate tables."""
+    stats = SurveyResponseStats.objects.filter(survey=survey).first()
+    fields = list(
+        Field.objects.filter(section__survey=survey)
+        .order_by("section__order", "order", "id")
+        .values("id", "label", "field_type")
+    )
+    field_ids = [field["id"] for field in fields]
+
+    choice_counts = defaultdict(dict)
+    for field_id, value, count in FieldChoiceCount.objects.filter(field_id__in=field_ids, count__gt=0).values_list(
+        "field_id", "value", "count"
+    ):
+        choice_counts[field_id][value] = count
+    numeric_stats = {numeric.field_id: numeric for numeric in FieldNumericStats.objects.filter(field_id__in=field_ids)}
+
+    report_fields = []
+    for field in fields:
+        entry = {"field": field["id"], "label": field["label"], "field_type": field["field_type"]}
+        if field["field_type"] in CHOICE_FIELD_TYPES:
+            entry["choices"] = choice_counts.get(field["id"], {})
+        elif field["field_type"] == "number":
+            numeric = numeric_stats.get(field["id"])
+            count = numeric.count if numeric else 0
+            entry["numeric"] = {
+                "count": count,
+                "sum": numeric.total if numeric else 0.0,
+                "mean": numeric.total / count if count else None,
+                "min": numeric.minimum if numeric else None,
+                "max": numeric.maximum if numeric else None,
+            }
+        report_fields.append(entry)
+
+    return {
+        "survey": survey.id,
+        "submitted": stats.submitted if stats else 0,
+        "completed": stats.completed if stats else 0,
+        "fields": report_fields,
+    }
+
+
+def rebuild(survey_id, chunk_size=2000):
+    """Recompute the aggregates of ``survey_id`` from scratch."""
+    SurveyResponseStats.objects.filter(survey_id=survey_id).delete()
+    FieldChoiceCount.objects.filter(field__section__survey_id=survey_id).delete()
+    FieldNumericStats.objects.filter(field__section__survey_id=survey_id).delete()
+
+    delta = AggregateDelta()
+    for completed in (
+        Response.objects.filter(survey_id=survey_id).values_list("completed", flat=True).iterator(chunk_size=chunk_size)
+    ):
+        delta.add_response(survey_id, completed)
+    for field_id, raw in (
+        ResponseData.objects.filter(response__survey_id=survey_id)
+        .values_list("field_id", "value")
+        .iterator(chunk_size=chunk_size)
+    ):
+        delta.add_answer(survey_id, field_id, raw)
+    delta.apply()
+
+
+def rebuild_fields(survey_id, fields, chunk_size=2000):
+    """Recompute the aggregates of ``fields`` of ``survey_id`` after their type or choices changed.
+
+    Answers are validated against ``fields`` as given rather than the cached schema, which may predate the change.
+    """
+    field_ids = [field.id for field in fields]
+    FieldChoiceCount.objects.filter(field_id__in=field_ids).delete()
+    FieldNumericStats.objects.filter(field_id__in=field_ids).delete()
+
+    delta = AggregateDelta(schemas={survey_id: SurveySchema(survey_id, fields)})
+    answers = ResponseData.objects.filter(field_id__in=field_ids).values_list("field_id", "value")
+    for field_id, raw in answers.iterator(chunk_size=chunk_size):
+        delta.add_answer(survey_id, field_id, raw)
+    delta.apply()
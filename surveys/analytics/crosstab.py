@@ -0,0 +1,74 @@
+"""Contingency tables between two choice fields of a survey.
+
+The pairs of answers are counted in a single grouped query joining ``ResponseData`` to itself through
+``Response``; checkbox answers are then expanded into one count per selected choice, and the percentages
+are derived from the count matrix with NumPy.
+"""
+
+from collections import Counter
+
+import numpy as np
+from django.db.models import Count
+
+from ..coercion import coerce_list
+from ..models import ResponseData
+
+
+def _choices(field, value):
+    if field.field_type != "checkbox":
+        return [value]
+    try:
+        return coerce_list(value)
+    except ValueError:
+        return []
+
+
+def _labels(field, counted):
+    """The field's declared choices in order, followed by any other answered value."""
+    declared = [str(choice) for choice in field.choices or []]
+    return declared + sorted(counted - set(declared))
+
+
+def _percentages(counts, totals, axis):
+    totals = np.expand_dims(totals, axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(totals > 0, counts * 100.0 / totals, 0.0)
+    return np.round(shares, 2).tolist()
+
+
+def crosstab(row_field, column_field, completed=None):
+    """Count the responses for every pair of answers to ``row_field`` and ``column_field``."""
+    answers = ResponseData.objects.filter(field=row_field, response__response_data__field=column_field)
+    if completed is not None:
+        answers = answers.filter(response__completed=completed)
+    grouped = answers.values_list("value", "response__response_data__value").annotate(n=Count("response_id"))
+
+    pairs = Counter()
+    for row_value, column_value, n in grouped.order_by():
+        for row_choice in _choices(row_field, row_value):
+            for column_choice in _choices(column_field, column_value):
+                pairs[(row_choice, column_choice)] += n
+
+    rows = _labels(row_field, {row for row, _ in pairs})
+    columns = _labels(column_field, {column for _, column in pairs})
+    row_index = {label: i for i, label in enumerate(rows)}
+    column_index = {label: i for i, label in enumerate(columns)}
+
+    counts = np.zeros((len(rows), len(columns)), dtype=np.int64)
+    for (row, column), n in pairs.items():
+        counts[row_index[row], column_index[column]] = n
+    row_totals = counts.sum(axis=1)
+    column_totals = counts.sum(axis=0)
+
+    return {
+        "row_field": row_field.id,
+        "column_field": column_field.id,
+        "rows": rows,
+        "columns": columns,
+        "counts": counts.tolist(),
+        "row_totals": row_totals.tolist(),
+        "column_totals": column_totals.tolist(),
+        "total": int(counts.sum()),
+        "row_percentages": _percentages(counts, row_totals, axis=1),
+        "column_percentages": _percentages(counts, column_totals, axis=0),
+    }
@@ -0,0 +1,68 @@
+"""Vectorized statistics over the answers to a number field.
+
+Answers are streamed from the typed ``value_number`` column with ``values_list(...).iterator()`` and packed
+chunk by chunk into a float64 NumPy array, so no model instances are built and all statistics are computed
+in vectorized passes over the array.
+"""
+
+from itertools import islice
+
+import numpy as np
+from django.db.models import Exists, OuterRef
+
+from ..models import ResponseData
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90, 95, 99)
+DEFAULT_BINS = 10
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def load_values(field_id, segment_field=None, segment_value=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Load the numeric answers of ``field_id`` into a float64 array.
+
+    With ``segment_field``, only responses whose answer to that field equals ``segment_value`` are included.
+    """
+    answers = ResponseData.objects.filter(field_id=field_id, value_number__isnull=False)
+    if segment_field is not None:
+        answers = answers.filter(
+            Exists(
+                ResponseData.objects.filter(
+                    response_id=OuterRef("response_id"), field_id=segment_field, value=segment_value
+                )
+            )
+        )
+
+    rows = answers.values_list("value_number", flat=True).iterator(chunk_size=chunk_size)
+    chunks = []
+    while True:
+        chunk = np.fromiter(islice(rows, chunk_size), dtype=np.float64)
+        if not chunk.size:
+            break
+        chunks.append(chunk)
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.float64)
+
+
+def describe(values, percentiles=DEFAULT_PERCENTILES, bins=DEFAULT_BINS, value_range=None):
+    """Summary statistics, percentiles and a histogram of ``values``."""
+    if not values.size:
+        return {
+            "count": 0,
+            "mean": None,
+            "stddev": None,
+            "min": None,
+            "max": None,
+            "percentiles": {f"{p:g}": None for p in percentiles},
+            "histogram": {"bin_edges": [], "counts": []},
+        }
+
+    counts, bin_edges = np.histogram(values, bins=bins, range=value_range)
+    return {
+        "count": int(values.size),
+        "mean": float(values.mean()),
+        # Sample standard deviation; undefined for a single answer
+        "stddev": float(values.std(ddof=1)) if values.size > 1 else None,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": dict(zip((f"{p:g}" for p in percentiles), np.percentile(values, percentiles).tolist())),
+        "histogram": {"bin_edges": bin_edges.tolist(), "counts": counts.tolist()},
+    }
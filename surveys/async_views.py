@@ -0,0 +1,141 @@
+"""Native async views for the hot respondent endpoints.
+
+DRF views are synchronous, so under ASGI every request to them occupies a worker thread for its whole
+database round trip. The views below are plain async Django views: authentication, the respondent's answers
+and the submission schema go through the async ORM, and the event loop serves other respondents while they
+wait. The document cache lookup, a cache miss on the survey document (reading the stored, encoded document)
+and handing a submission to the ingestion queue each run as a single hop to a thread.
+
+Responses are interchangeable with those of ``SurveyDetailView`` and ``SubmissionCreateView``: documents and
+ETags are shared through the same versioned cache.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, JsonResponse
+from django.utils.http import parse_etags
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from . import document_cache, documents, ingestion, respondents
+from .serializers import SubmissionSerializer
+from .validation import aget_schema
+
+
+async def authenticate(request):
+    """Async counterpart of ``JWTAuthentication.authenticate``.
+
+    The token is validated in-process and the user loaded with the async ORM. Returns ``None`` when the request
+    carries no token; raises ``AuthenticationFailed`` for invalid tokens and unknown or inactive users.
+    """
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+
+    token = authenticator.get_validated_token(raw_token)
+    try:
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+
+    user = await get_user_model().objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None or not user.is_active:
+        raise AuthenticationFailed("User not found or inactive.", code="user_not_found")
+    return user
+
+
+def error_response(exc):
+    """Render an ``APIException`` the way DRF's default exception handler does."""
+    data = exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response["WWW-Authenticate"] = JWTAuthentication().authenticate_header(None)
+    return response
+
+
+class AsyncAPIView(View):
+    """Async base view with JWT authentication and DRF-style error responses. CSRF exempt, like ``APIView``."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request) or AnonymousUser()
+        except AuthenticationFailed as exc:
+            return error_response(exc)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncSurveyDetailView(AsyncAPIView):
+    """Async ``GET`` of a survey document, filtered by the visibility rules for the respondent's answers."""
+
+    async def get(self, request, pk):
+        user_responses = {}
+        if request.user.is_authenticated:
+            user_responses = await respondents.aget_answers(pk, request.user.email)
+
+        # Django's async cache methods are thread hops of their own: look the version and document up in one
+        etag, data = await sync_to_async(self.lookup, thread_sensitive=False)(pk, user_responses)
+        if etag is None:
+            # No version yet: creating one checks that the survey exists, through the async ORM
+            version = await document_cache.aget_version(pk)
+            etag = document_cache.make_etag(pk, version, sorted(user_responses.items()))
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        if data is None:
+            data = await sync_to_async(documents.render)(pk, user_responses)
+            if data is None:
+                return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            await document_cache.aset_document(etag, data)
+        return HttpResponse(data, content_type="application/json", headers={"ETag": etag})
+
+    @staticmethod
+    def lookup(pk, user_responses):
+        version = document_cache.peek_version(pk)
+        if version is None:
+            return None, None
+        etag = document_cache.make_etag(pk, version, sorted(user_responses.items()))
+        return etag, document_cache.get_document(etag)
+
+
+class AsyncSubmissionView(AsyncAPIView):
+    """Async counterpart of ``SubmissionCreateView``: validate a submission, queue it and answer 202."""
+
+    async def post(self, request):
+        if not request.user.is_authenticated:
+            return error_response(NotAuthenticated())
+        try:
+            payload = json.loads(request.body)
+        except ValueError as exc:
+            return JsonResponse({"detail": f"JSON parse error - {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = {}
+        try:
+            context["schema"] = await aget_schema(int(payload["survey"]))
+        except (KeyError, TypeError, ValueError):
+            # Left to the serializer, which reports the invalid survey before it needs a schema
+            pass
+
+        serializer = SubmissionSerializer(data=payload, context=context)
+        if "schema" in context:
+            is_valid = serializer.is_valid()
+        else:
+            is_valid = await sync_to_async(serializer.is_valid)()
+        if not is_valid:
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        submission_id = await sync_to_async(ingestion.submit)(serializer.validated_data)
+        return JsonResponse({"submission_id": submission_id, "status": "queued"}, status=status.HTTP_202_ACCEPTED)
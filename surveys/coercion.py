@@ -0,0 +1,81 @@
+"""Coercion of raw answer text into typed values, by ``Field.field_type``.
+
+Kept free of model imports so that both the models and the validation layer can use it.
+"""
+
+import json
+import math
+from datetime import date
+
+
+def coerce_text(raw):
+    return raw
+
+
+def coerce_number(raw):
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        number = float(raw)
+    except ValueError:
+        raise ValueError(f"'{raw}' is not a valid number.")
+    if not math.isfinite(number):
+        raise ValueError(f"'{raw}' is not a valid number.")
+    return number
+
+
+def coerce_date(raw):
+    try:
+        # Dates stay ISO strings for rule evaluation; they compare correctly and match JSON rule values
+        return date.fromisoformat(raw).isoformat()
+    except ValueError:
+        raise ValueError(f"'{raw}' is not a valid date (YYYY-MM-DD).")
+
+
+def coerce_list(raw):
+    """Checkbox answers are a JSON list of the selected choices, or a single bare choice."""
+    if raw.startswith("["):
+        try:
+            values = json.loads(raw)
+        except ValueError:
+            raise ValueError(f"'{raw}' is not a valid list of choices.")
+        if not isinstance(values, list):
+            raise ValueError(f"'{raw}' is not a valid list of choices.")
+        return [str(value) for value in values]
+    return [raw]
+
+
+TYPED_FIELD_TYPES = {"number", "date", "checkbox"}
+
+COERCERS = {
+    "text": coerce_text,
+    "number": coerce_number,
+    "date": coerce_date,
+    "dropdown": coerce_text,
+    "checkbox": coerce_list,
+    "radio": coerce_text,
+}
+
+
+def typed_columns(field_type, raw):
+    """The values of the typed ``ResponseData`` columns for an answer.
+
+    Answers that cannot be coerced, and field types without a typed column, leave every column empty.
+    """
+    columns = {"value_number": None, "value_date": None, "value_json": None}
+    if field_type not in TYPED_FIELD_TYPES:
+        return columns
+    try:
+        value = COERCERS[field_type](raw)
+    except ValueError:
+        return columns
+
+    if field_type == "number":
+        columns["value_number"] = float(value)
+    elif field_type == "date":
+        columns["value_date"] = date.fromisoformat(value)
+    else:
+        columns["value_json"] = value
+    return columns
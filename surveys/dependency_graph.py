@@ -0,0 +1,136 @@
+"""Dependency graph of the visibility rules of a survey.
+
+``Field.conditional_logic`` and ``Field.dependencies`` each name the field whose answer they read through
+``depends_on_field``. ``RuleGraph`` checks those references when a survey is written: every target must be a
+field of the same survey and the rules must not form a cycle. For valid surveys it yields a topological
+evaluation order, in which every field comes after the fields it depends on, which is stored on
+``Survey.rule_graph``, and the transitive dependency closure of each field, which is computed on demand: it grows
+quadratically with chained rules and is loaded with every survey if stored.
+"""
+
+RULE_ATTRIBUTES = ("conditional_logic", "dependencies")
+
+_DONE = object()
+
+
+def rule_targets(rules):
+    """The ``depends_on_field`` targets of a field's rules, given as a mapping of rule attribute to JSON."""
+    targets = []
+    for attribute in RULE_ATTRIBUTES:
+        rule = rules.get(attribute)
+        if rule:
+            targets.append(rule.get("depends_on_field") if isinstance(rule, dict) else None)
+    return targets
+
+
+class RuleGraph:
+    """Edges from each field to the fields its rules depend on, keyed by field id in definition order."""
+
+    def __init__(self, dependencies, labels=None):
+        self.dependencies = dependencies
+        self.labels = labels or {}
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Build the graph of saved ``Field`` instances."""
+        dependencies = {
+            field.id: rule_targets({attribute: getattr(field, attribute) for attribute in RULE_ATTRIBUTES})
+            for field in fields
+        }
+        return cls(dependencies, {field.id: field.label for field in fields})
+
+    @classmethod
+    def from_sections_data(cls, sections_data):
+        """Build the graph of submitted sections. Fields submitted without an id cannot be referenced."""
+        dependencies, labels = {}, {}
+        fields_data = (field_data for section_data in sections_data for field_data in section_data.get("fields", []))
+        for index, field_data in enumerate(fields_data):
+            key = field_data.get("id", ("new", index))
+            dependencies[key] = rule_targets(field_data)
+            labels[key] = field_data.get("label")
+        return cls(dependencies, labels)
+
+    def _describe(self, key):
+        label = self.labels.get(key)
+        if not isinstance(key, int):
+            return f"Field '{label}'"
+        return f"Field {key} ('{label}')" if label else f"Field {key}"
+
+    def errors(self):
+        """Describe every dangling reference and, if there is none, the first cycle found. Empty when valid."""
+        errors = []
+        for field_id, targets in self.dependencies.items():
+            for target in targets:
+                if target is None:
+                    errors.append(f"{self._describe(field_id)} has a rule without depends_on_field.")
+                elif target not in self.dependencies:
+                    errors.append(f"{self._describe(field_id)} depends on field {target}, which is not in this survey.")
+        if errors:
+            return errors
+
+        cycle = self.find_cycle()
+        if cycle:
+            errors.append(f"Rules form a dependency cycle: {' -> '.join(str(field_id) for field_id in cycle)}.")
+        return errors
+
+    def find_cycle(self):
+        """Return one cycle as a list of field ids starting and ending with the same id, or ``None``."""
+        visiting, done = set(), set()
+        for start in self.dependencies:
+            if start in done:
+                continue
+            # Iterative depth-first search, keeping the current path to report the cycle
+            path, stack = [start], [iter(self.dependencies[start])]
+            visiting.add(start)
+            while stack:
+                target = next(stack[-1], _DONE)
+                if target is _DONE:
+                    stack.pop()
+                    node = path.pop()
+                    visiting.discard(node)
+                    done.add(node)
+                elif target in visiting:
+                    return path[path.index(target) :] + [target]
+                elif target not in done and target in self.dependencies:
+                    visiting.add(target)
+                    path.append(target)
+                    stack.append(iter(self.dependencies[target]))
+        return None
+
+    def order(self):
+        """Field ids in evaluation order: each after its dependencies, otherwise in definition order.
+
+        Dangling references are skipped; on a graph with cycles the order only holds outside of them.
+        """
+        order, placed = [], set()
+        for root in self.dependencies:
+            if root in placed:
+                continue
+            placed.add(root)
+            stack = [(root, iter(self.dependencies[root]))]
+            while stack:
+                field_id, targets = stack[-1]
+                target = next(targets, _DONE)
+                if target is _DONE:
+                    stack.pop()
+                    order.append(field_id)
+                elif target not in placed and target in self.dependencies:
+                    placed.add(target)
+                    stack.append((target, iter(self.dependencies[target])))
+        return order
+
+    def closure(self):
+        """The transitive dependencies of every field, as sorted lists of field ids. Exact on valid graphs."""
+        closure = {}
+        for field_id in self.order():
+            reachable = set()
+            for target in self.dependencies[field_id]:
+                if target in self.dependencies:
+                    reachable.add(target)
+                    reachable.update(closure.get(target, ()))
+            closure[field_id] = reachable
+        return {field_id: sorted(reachable) for field_id, reachable in closure.items()}
+
+    def as_json(self):
+        """The value stored on ``Survey.rule_graph``."""
+        return {"order": self.order()}
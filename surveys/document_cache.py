@@ -0,0 +1,107 @@
+"""Versioned cache of rendered survey documents.
+
+Every survey has an opaque version token stored in the cache. Writes to the survey, its sections or its
+fields replace the token through ``survey_changed``, so documents cached under an older version are simply
+never read again and no explicit purge is needed. A second, global token versions the survey list.
+
+The versions also make strong ETags: a conditional GET can be answered from the cache alone without
+loading anything from the database.
+"""
+
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from survey_platform.instrumentation import record_cache
+
+from . import documents, visibility
+from .models import Survey
+
+LIST_VERSION_KEY = "surveys:list:version"
+# Seconds the version of a survey id that does not exist is kept, so that arbitrary ids do not fill the cache
+MISSING_SURVEY_TIMEOUT = 60
+
+
+def _cache():
+    return caches[settings.SURVEY_CACHE_ALIAS]
+
+
+def _version_key(survey_id):
+    return f"surveys:{survey_id}:version"
+
+
+def _get_or_create_version(key, survey_id=None):
+    cache = _cache()
+    version = cache.get(key)
+    if version is None:
+        exists = survey_id is None or Survey.objects.filter(pk=survey_id).exists()
+        # ``add`` keeps whichever token won a concurrent race
+        cache.add(key, uuid4().hex, timeout=None if exists else MISSING_SURVEY_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_or_create_version(key, survey_id=None):
+    cache = _cache()
+    version = await cache.aget(key)
+    if version is None:
+        exists = survey_id is None or await Survey.objects.filter(pk=survey_id).aexists()
+        await cache.aadd(key, uuid4().hex, timeout=None if exists else MISSING_SURVEY_TIMEOUT)
+        version = await cache.aget(key)
+    return version
+
+
+def get_version(survey_id):
+    return _get_or_create_version(_version_key(survey_id), survey_id)
+
+
+async def aget_version(survey_id):
+    return await _aget_or_create_version(_version_key(survey_id), survey_id)
+
+
+def peek_version(survey_id):
+    """Return the version of ``survey_id`` if one is cached, without creating it (which queries the database)."""
+    return _cache().get(_version_key(survey_id))
+
+
+def get_list_version():
+    return _get_or_create_version(LIST_VERSION_KEY)
+
+
+def _bump_versions(survey_id):
+    _cache().set_many({_version_key(survey_id): uuid4().hex, LIST_VERSION_KEY: uuid4().hex}, timeout=None)
+
+
+def survey_changed(survey_id):
+    """Invalidate everything derived from the definition of ``survey_id``, including its stored document.
+
+    The versions are bumped immediately and, when called inside a transaction, again once it commits, so a
+    reader that cached the pre-commit state in between is not served afterwards.
+    """
+    visibility.invalidate(survey_id)
+    documents.invalidate(survey_id)
+    _bump_versions(survey_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump_versions(survey_id))
+
+
+def make_etag(*parts):
+    """Build a strong ETag from version tokens and other request-specific parts."""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def get_document(key):
+    data = _cache().get(f"surveys:document:{key}")
+    record_cache("document", data is not None)
+    return data
+
+
+def set_document(key, data):
+    _cache().set(f"surveys:document:{key}", data, timeout=settings.SURVEY_CACHE_TIMEOUT)
+
+
+async def aset_document(key, data):
+    await _cache().aset(f"surveys:document:{key}", data, timeout=settings.SURVEY_CACHE_TIMEOUT)
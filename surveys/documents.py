@@ -0,0 +1,116 @@
+"""Materialized survey documents, stored as pre-encoded JSON.
+
+Rendering a survey through the nested serializers costs CPU proportional to its size on every read. Instead
+the document is rendered once when the survey definition is written and stored on ``SurveyDocument`` twice,
+already encoded: as served without any answers, which is what anonymous respondents get byte for byte, and
+with every field, which is decoded and filtered by the visibility rules for respondents with answers.
+
+``invalidate`` is called through ``document_cache.survey_changed``. It deletes the stored document in the
+writing transaction and rebuilds it once that commits. Readers build missing documents themselves and never
+overwrite an existing one, so a reader that rendered the previous definition cannot replace the rebuild.
+"""
+
+import json
+import weakref
+
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from . import validation, visibility
+from .models import Survey, SurveyDocument
+
+# Per database connection, the rebuild callbacks queued for the current transaction, by survey id
+_pending_rebuilds = weakref.WeakKeyDictionary()
+
+
+def encode(data):
+    """Encode ``data`` exactly as the API's JSON renderer does."""
+    return JSONRenderer().render(data)
+
+
+def visible(document, fields, user_responses):
+    """Copy of a full ``document`` keeping only the fields visible for ``user_responses``.
+
+    ``fields`` maps field ids to the ``Field`` instances whose rules are evaluated.
+    """
+    engine = visibility.get_engine(document["id"])
+    sections = []
+    for section in document["sections"]:
+        section_fields = [
+            field_data
+            for field_data in section["fields"]
+            if field_data["id"] not in fields or engine.is_visible(fields[field_data["id"]], user_responses)
+        ]
+        sections.append({**section, "fields": section_fields})
+    return {**document, "sections": sections}
+
+
+def build(survey_id):
+    """Render the document of ``survey_id``, unsaved. Returns ``None`` when the survey does not exist."""
+    # Imported here: serializers import the writers, which invalidate documents through the document cache
+    from .serializers import SurveySerializer
+
+    survey = Survey.objects.prefetch_related("sections__fields").filter(pk=survey_id).first()
+    if survey is None:
+        return None
+    full = SurveySerializer(survey, context={"filter_visibility": False}).data
+    fields = {field.id: field for section in survey.sections.all() for field in section.fields.all()}
+    return SurveyDocument(survey=survey, anonymous=encode(visible(full, fields, {})), full=encode(full))
+
+
+def rebuild(survey_id):
+    """Render and store the document of ``survey_id``, replacing the stored one."""
+    # Writes after this rebuild need another one
+    _pending_rebuilds.get(transaction.get_connection(), {}).pop(survey_id, None)
+    document = build(survey_id)
+    if document is not None:
+        SurveyDocument.objects.update_or_create(
+            survey_id=survey_id, defaults={"anonymous": document.anonymous, "full": document.full}
+        )
+
+
+def invalidate(survey_id):
+    """Drop the stored document of ``survey_id`` and rebuild it, after the current transaction commits.
+
+    Within a transaction the document is rebuilt once, however many writes invalidate it.
+    """
+    SurveyDocument.objects.filter(survey_id=survey_id).delete()
+    connection = transaction.get_connection()
+    rebuilds = _pending_rebuilds.setdefault(connection, {})
+    # Rollbacks drop the queued callback, and rebuilds unregister it
+    if any(callback is rebuilds.get(survey_id) for _, callback, _ in connection.run_on_commit):
+        return
+
+    rebuilds[survey_id] = lambda: rebuild(survey_id)
+    # Robust: the write is committed by then, a failed rebuild only leaves the document to the next reader
+    transaction.on_commit(rebuilds[survey_id], robust=True)
+
+
+def _load(survey_id, column):
+    content = SurveyDocument.objects.filter(survey_id=survey_id).values_list(column, flat=True).first()
+    if content is not None:
+        # Binary columns come back as memoryview on some databases
+        return bytes(content)
+
+    document = build(survey_id)
+    if document is None:
+        return None
+    SurveyDocument.objects.bulk_create([document], ignore_conflicts=True)
+    return bytes(getattr(document, column))
+
+
+def render(survey_id, user_responses):
+    """The encoded document of ``survey_id`` for a respondent with ``user_responses``, or ``None`` if missing.
+
+    Without answers this is the stored anonymous document as is; otherwise the full document is filtered by
+    the visibility rules, which are evaluated against the fields of the cached ``SurveySchema``.
+    """
+    if not user_responses:
+        return _load(survey_id, "anonymous")
+
+    content = _load(survey_id, "full")
+    if content is None:
+        return None
+    validators = validation.get_schema(survey_id).validators
+    fields = {field_id: validator.field for field_id, validator in validators.items()}
+    return encode(visible(json.loads(content), fields, user_responses))
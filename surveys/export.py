@@ -0,0 +1,94 @@
+"""Streaming export of survey responses.
+
+Responses and their answers are read with two server-side cursors ordered by response id and merged, so
+memory stays bounded by ``chunk_size`` regardless of how many responses a survey has. Each response becomes
+one row with one column per field of the survey.
+"""
+
+import csv
+import json
+
+from .models import Field, Response, ResponseData
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+DEFAULT_CHUNK_SIZE = 2000
+RESPONSE_COLUMNS = ["response_id", "email", "completed", "created_at"]
+
+
+def export_fields(survey_id):
+    """The ``(id, label)`` of every field of the survey, in display order."""
+    return list(
+        Field.objects.filter(section__survey_id=survey_id)
+        .order_by("section__order", "order", "id")
+        .values_list("id", "label")
+    )
+
+
+def iter_responses(survey_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield ``(response_id, email, completed, created_at, answers)`` for every response of the survey."""
+    responses = (
+        Response.objects.filter(survey_id=survey_id)
+        .order_by("id")
+        .values_list("id", "email", "completed", "created_at")
+        .iterator(chunk_size=chunk_size)
+    )
+    answers = (
+        ResponseData.objects.filter(response__survey_id=survey_id)
+        .order_by("response_id")
+        .values_list("response_id", "field_id", "value")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    pending = next(answers, None)
+    for response_id, email, completed, created_at in responses:
+        response_answers = {}
+        while pending is not None and pending[0] <= response_id:
+            if pending[0] == response_id:
+                response_answers[pending[1]] = pending[2]
+            pending = next(answers, None)
+        yield response_id, email, completed, created_at, response_answers
+
+
+class _Echo:
+    """A file-like object that hands back what is written, for streaming ``csv.writer`` output."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(survey_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    fields = export_fields(survey_id)
+    writer = csv.writer(_Echo())
+    yield writer.writerow(RESPONSE_COLUMNS + [label for _, label in fields])
+    for response_id, email, completed, created_at, answers in iter_responses(survey_id, chunk_size):
+        yield writer.writerow(
+            [response_id, email or "", completed, created_at.isoformat()]
+            + [answers.get(field_id, "") for field_id, _ in fields]
+        )
+
+
+def stream_ndjson(survey_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    fields = export_fields(survey_id)
+    for response_id, email, completed, created_at, answers in iter_responses(survey_id, chunk_size):
+        row = {
+            "response_id": response_id,
+            "email": email,
+            "completed": completed,
+            "created_at": created_at.isoformat(),
+            "answers": {str(field_id): answers.get(field_id) for field_id, _ in fields},
+        }
+        yield json.dumps(row) + "\n"
+
+
+STREAMERS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+}
+
+
+def stream_export(survey_id, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return an iterator over the encoded export of ``survey_id`` in ``export_format``."""
+    return STREAMERS[export_format](survey_id, chunk_size)
@@ -0,0 +1,68 @@
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+
+class ResponseFilterSerializer(serializers.Serializer):
+    survey = serializers.IntegerField(required=False)
+    email = serializers.EmailField(required=False)
+    completed = serializers.BooleanField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+
+class ResponseDataFilterSerializer(serializers.Serializer):
+    survey = serializers.IntegerField(required=False)
+    response = serializers.IntegerField(required=False)
+    field = serializers.IntegerField(required=False)
+    number_min = serializers.FloatField(required=False)
+    number_max = serializers.FloatField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+
+class QueryParamFilter(BaseFilterBackend):
+    """Filter a queryset by validated query parameters.
+
+    ``lookups`` maps each parameter of ``serializer_class`` to the ORM lookup it filters on. Invalid values
+    are rejected with a 400 response instead of being silently ignored.
+    """
+
+    serializer_class = None
+    lookups = {}
+
+    def filter_queryset(self, request, queryset, view):
+        # A plain dict, so that missing booleans are not read as unchecked HTML checkboxes
+        serializer = self.serializer_class(data=request.query_params.dict())
+        serializer.is_valid(raise_exception=True)
+        filters = {self.lookups[name]: value for name, value in serializer.validated_data.items()}
+        return queryset.filter(**filters)
+
+
+class ResponseFilter(QueryParamFilter):
+    serializer_class = ResponseFilterSerializer
+    lookups = {
+        "survey": "survey_id",
+        "email": "email",
+        "completed": "completed",
+        "created_after": "created_at__gte",
+        "created_before": "created_at__lt",
+    }
+
+
+class ResponseDataFilter(QueryParamFilter):
+    serializer_class = ResponseDataFilterSerializer
+    lookups = {
+        # The copied survey of the answers, served by the (survey, created_at, id) index without joining responses
+        "survey": "survey_id",
+        "response": "response_id",
+        "field": "field_id",
+        # Range lookups on the typed columns, served by the (field, value_number/value_date) indexes
+        "number_min": "value_number__gte",
+        "number_max": "value_number__lte",
+        "date_from": "value_date__gte",
+        "date_to": "value_date__lte",
+        "created_after": "created_at__gte",
+        "created_before": "created_at__lt",
+    }
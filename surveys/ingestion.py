@@ -0,0 +1,368 @@
+"""Write-behind ingestion of survey submissions.
+
+``submit`` takes a submission already validated against the cached ``SurveySchema``, pushes it onto a queue
+and returns immediately, so the submitting request never waits on the database. Celery workers ``drain`` the
+queue in batches and write each batch in one transaction with a few bulk inserts and a single aggregate
+update.
+
+Every submission carries a ``submission_id`` that is stored uniquely on ``Response``. A batch that fails is
+put back on the queue and retried; submissions it already wrote are skipped, so a retry never duplicates
+them. A batch that fails because the database is unavailable is kept whole for as long as the outage lasts.
+Any other failure is narrowed down by writing the batch's submissions one at a time: only those that fail are
+retried, and after ``SURVEY_INGESTION_MAX_ATTEMPTS`` attempts they are moved to the queue's dead letters, so
+that a submission that can never be written does not hold up the ones behind it.
+
+Two queues are available: ``RedisSubmissionQueue`` shared by web and worker processes, and
+``InMemorySubmissionQueue`` for tests and single-node deployments, which is drained in-process right after
+each push.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, DataError, IntegrityError, InterfaceError, transaction
+
+from . import respondents
+from .analytics.aggregates import AggregateDelta
+from .models import Response, ResponseData, Survey
+from .validation import get_schema
+
+logger = logging.getLogger(__name__)
+
+Batch = namedtuple("Batch", ["id", "messages"])
+
+
+class InMemorySubmissionQueue:
+    """A process-local queue. Popped batches are held until acknowledged or requeued."""
+
+    drain_on_push = True
+
+    def __init__(self):
+        self._items = deque()
+        self._pending = {}
+        self._dead = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def push(self, message):
+        with self._lock:
+            self._items.append(json.dumps(message))
+            return len(self._items)
+
+    def pop_batch(self, size):
+        with self._lock:
+            items = [self._items.popleft() for _ in range(min(size, len(self._items)))]
+            batch_id = uuid4().hex
+            if items:
+                self._pending[batch_id] = (time.time(), items)
+        return Batch(batch_id, [json.loads(item) for item in items])
+
+    def ack(self, batch):
+        with self._lock:
+            self._pending.pop(batch.id, None)
+
+    def requeue(self, batch, messages=None):
+        """Put a popped batch back at the head of the queue, as ``messages`` when given."""
+        with self._lock:
+            _, items = self._pending.pop(batch.id, (None, []))
+            if messages is not None:
+                items = [json.dumps(message) for message in messages]
+            # Back at the head of the queue, in their original order
+            self._items.extendleft(reversed(items))
+
+    def dead_letter(self, batch, messages):
+        """Set a popped batch aside as ``messages``, for inspection instead of further attempts."""
+        with self._lock:
+            self._pending.pop(batch.id, None)
+            self._dead.extend(json.dumps(message) for message in messages)
+
+    def dead_letters(self):
+        return [json.loads(item) for item in self._dead]
+
+    def recover(self, timeout):
+        """Requeue the batches that were popped more than ``timeout`` seconds ago and never acknowledged."""
+        deadline = time.time() - timeout
+        stale = [batch_id for batch_id, (popped_at, _) in list(self._pending.items()) if popped_at < deadline]
+        for batch_id in stale:
+            self.requeue(Batch(batch_id, []))
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._pending.clear()
+            self._dead.clear()
+
+
+# Move up to ARGV[1] items from the head of the queue to a per-batch processing list, atomically
+_POP_BATCH = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+    redis.call('ZADD', KEYS[3], ARGV[2], KEYS[2])
+end
+return items
+"""
+
+# Move a processing list back to the head of the queue, keeping its order
+_REQUEUE_BATCH = """
+local items = redis.call('LRANGE', KEYS[2], 0, -1)
+for i = #items, 1, -1 do
+    redis.call('LPUSH', KEYS[1], items[i])
+end
+redis.call('DEL', KEYS[2])
+redis.call('ZREM', KEYS[3], KEYS[2])
+return #items
+"""
+
+
+class RedisSubmissionQueue:
+    """A Redis list shared by every process.
+
+    Popped items are moved to a processing list in the same script, so a worker that dies mid-batch loses
+    nothing: ``recover`` puts its batch back once the visibility timeout has passed.
+    """
+
+    drain_on_push = False
+
+    def __init__(self, url, key):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+        self.pending_key = f"{key}:pending"
+        self.dead_key = f"{key}:dead"
+        self._pop_batch = self.client.register_script(_POP_BATCH)
+        self._requeue_batch = self.client.register_script(_REQUEUE_BATCH)
+
+    def __len__(self):
+        return self.client.llen(self.key)
+
+    def push(self, message):
+        return self.client.rpush(self.key, json.dumps(message))
+
+    def pop_batch(self, size):
+        batch_id = f"{self.key}:processing:{uuid4().hex}"
+        items = self._pop_batch(keys=[self.key, batch_id, self.pending_key], args=[size, time.time()])
+        return Batch(batch_id, [json.loads(item) for item in items])
+
+    def ack(self, batch):
+        pipeline = self.client.pipeline()
+        pipeline.delete(batch.id)
+        pipeline.zrem(self.pending_key, batch.id)
+        pipeline.execute()
+
+    def requeue(self, batch, messages=None):
+        """Put a popped batch back at the head of the queue, as ``messages`` when given."""
+        if messages is None:
+            self._requeue_batch(keys=[self.key, batch.id, self.pending_key])
+            return
+        pipeline = self.client.pipeline()
+        pipeline.lpush(self.key, *[json.dumps(message) for message in reversed(messages)])
+        pipeline.delete(batch.id)
+        pipeline.zrem(self.pending_key, batch.id)
+        pipeline.execute()
+
+    def dead_letter(self, batch, messages):
+        """Set a popped batch aside as ``messages``, for inspection instead of further attempts."""
+        pipeline = self.client.pipeline()
+        pipeline.rpush(self.dead_key, *[json.dumps(message) for message in messages])
+        pipeline.delete(batch.id)
+        pipeline.zrem(self.pending_key, batch.id)
+        pipeline.execute()
+
+    def dead_letters(self):
+        return [json.loads(item) for item in self.client.lrange(self.dead_key, 0, -1)]
+
+    def recover(self, timeout):
+        """Requeue the batches that were popped more than ``timeout`` seconds ago and never acknowledged."""
+        stale = self.client.zrangebyscore(self.pending_key, "-inf", time.time() - timeout)
+        for batch_id in stale:
+            self.requeue(Batch(batch_id.decode(), []))
+        return len(stale)
+
+    def clear(self):
+        for batch_id in self.client.zrange(self.pending_key, 0, -1):
+            self.client.delete(batch_id)
+        self.client.delete(self.key, self.pending_key, self.dead_key)
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the queue of the configured ``SURVEY_INGESTION_BACKEND``, shared by the whole process."""
+    backend = settings.SURVEY_INGESTION_BACKEND
+    queue = _queues.get(backend)
+    if queue is None:
+        if backend == "memory":
+            queue = InMemorySubmissionQueue()
+        elif backend == "redis":
+            if not settings.REDIS_URL:
+                raise ImproperlyConfigured("The redis ingestion backend requires REDIS_URL.")
+            queue = RedisSubmissionQueue(settings.REDIS_URL, settings.SURVEY_INGESTION_QUEUE_KEY)
+        else:
+            raise ImproperlyConfigured(f"Unknown ingestion backend: {backend}")
+        with _queues_lock:
+            queue = _queues.setdefault(backend, queue)
+    return queue
+
+
+def submit(data):
+    """Queue a validated submission for writing and return its ``submission_id``."""
+    message = {
+        "submission_id": str(data.get("submission_id") or uuid4()),
+        "survey": data["survey"],
+        "email": data.get("email"),
+        "completed": data.get("completed", False),
+        "response_data": [{"field": answer["field"], "value": answer["value"]} for answer in data["response_data"]],
+    }
+    queue = get_queue()
+    length = queue.push(message)
+
+    if queue.drain_on_push:
+        try:
+            drain()
+        except DatabaseError:
+            # The submission is back on the queue and is written by the next drain
+            logger.exception("Draining submission %s failed", message["submission_id"])
+    elif length % settings.SURVEY_INGESTION_BATCH_SIZE == 0:
+        # A full batch is waiting: do not wait for the periodic drain
+        from .tasks import drain_submissions
+
+        drain_submissions.delay()
+    return message["submission_id"]
+
+
+def drain(batch_size=None, max_batches=100):
+    """Write queued submissions in batches until the queue is empty. Returns the number of responses written.
+
+    A batch that fails on an unavailable database is requeued whole and the error raised, so that the task is
+    retried with a backoff. A batch that fails otherwise is written one submission at a time (see
+    ``_write_separately``).
+    """
+    queue = get_queue()
+    batch_size = batch_size or settings.SURVEY_INGESTION_BATCH_SIZE
+    written = 0
+    for _ in range(max_batches):
+        batch = queue.pop_batch(batch_size)
+        if not batch.messages:
+            break
+        try:
+            written += write_batch(batch.messages)
+        except Exception as exc:
+            if _is_transient(exc):
+                # Not the submissions' fault: no attempt is counted
+                queue.requeue(batch)
+                raise
+            written += _write_separately(queue, batch)
+            continue
+        queue.ack(batch)
+    return written
+
+
+def _is_transient(exc):
+    """Whether ``exc`` comes from the database being unavailable rather than from the submissions written."""
+    return isinstance(exc, (DatabaseError, InterfaceError)) and not isinstance(exc, (DataError, IntegrityError))
+
+
+def _write_separately(queue, batch):
+    """Write the submissions of a failed batch one at a time and return the number written.
+
+    The submissions that fail have an attempt counted on their message. Those under
+    ``SURVEY_INGESTION_MAX_ATTEMPTS`` are requeued and the first error raised; the others go to the dead letters.
+    """
+    written, failed, error = 0, [], None
+    for index, message in enumerate(batch.messages):
+        try:
+            written += write_batch([message])
+        except Exception as exc:
+            if _is_transient(exc):
+                queue.requeue(batch, failed + batch.messages[index:])
+                raise
+            logger.exception("Writing submission %s failed", message["submission_id"])
+            failed.append({**message, "attempts": message.get("attempts", 0) + 1})
+            error = error or exc
+
+    retried = [message for message in failed if message["attempts"] < settings.SURVEY_INGESTION_MAX_ATTEMPTS]
+    dead = [message for message in failed if message["attempts"] >= settings.SURVEY_INGESTION_MAX_ATTEMPTS]
+    if dead:
+        queue.dead_letter(batch, dead)
+        logger.error("Moved %d submissions to the dead letters", len(dead))
+    if retried:
+        queue.requeue(batch, retried)
+        raise error
+    queue.ack(batch)
+    return written
+
+
+def write_batch(messages):
+    """Write a batch of queued submissions in one transaction, skipping those already written.
+
+    Submissions to surveys deleted since they were queued are dropped, as are answers to deleted fields.
+    Returns the number of responses created.
+    """
+    submissions = {message["submission_id"]: message for message in messages}
+    with transaction.atomic():
+        written = {
+            str(submission_id)
+            for submission_id in Response.objects.filter(submission_id__in=list(submissions)).values_list(
+                "submission_id", flat=True
+            )
+        }
+        survey_ids = set(
+            Survey.objects.filter(pk__in={message["survey"] for message in submissions.values()}).values_list(
+                "pk", flat=True
+            )
+        )
+        pending = [
+            message
+            for submission_id, message in submissions.items()
+            if submission_id not in written and message["survey"] in survey_ids
+        ]
+
+        responses = Response.objects.bulk_create(
+            [
+                Response(
+                    submission_id=message["submission_id"],
+                    survey_id=message["survey"],
+                    email=message["email"],
+                    completed=message["completed"],
+                )
+                for message in pending
+            ]
+        )
+
+        delta = AggregateDelta()
+        response_data = []
+        for response, message in zip(responses, pending):
+            delta.add_response(response.survey_id, response.completed)
+            validators = get_schema(response.survey_id).validators
+            for answer in message["response_data"]:
+                validator = validators.get(answer["field"])
+                if validator is None:
+                    continue
+                answer_data = ResponseData(
+                    response=response, survey_id=response.survey_id, field_id=answer["field"], value=answer["value"]
+                )
+                answer_data.populate_typed_values(validator.field.field_type)
+                response_data.append(answer_data)
+                delta.add_answer(response.survey_id, answer["field"], answer["value"])
+        ResponseData.objects.bulk_create(response_data)
+        delta.apply()
+        respondent_emails = defaultdict(set)
+        for response in responses:
+            respondent_emails[response.survey_id].add(response.email)
+        for survey_id, emails in respondent_emails.items():
+            respondents.answers_changed(survey_id, *emails)
+    return len(responses)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from surveys import export
+from surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = "Stream all responses of a survey as CSV or NDJSON, one row per response."
+
+    def add_arguments(self, parser):
+        parser.add_argument("survey_id", type=int)
+        parser.add_argument("--format", choices=sorted(export.EXPORT_FORMATS), default="csv", dest="export_format")
+        parser.add_argument("--output", help="File to write to. Defaults to standard output.")
+        parser.add_argument("--chunk-size", type=int, default=export.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, survey_id, export_format, output, chunk_size, **options):
+        if not Survey.objects.filter(pk=survey_id).exists():
+            raise CommandError(f"Survey {survey_id} does not exist.")
+
+        chunks = export.stream_export(survey_id, export_format, chunk_size)
+        if output is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            f.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(f"Exported survey {survey_id} to {output}."))
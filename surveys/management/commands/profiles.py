@@ -0,0 +1,49 @@
+import io
+
+from django.core.management.base import BaseCommand, CommandError
+
+from survey_platform import profiling
+
+
+class Command(BaseCommand):
+    help = "List and summarise the stored request profiles, or issue a token that enables profiling."
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="subcommand", required=True)
+        listing = subcommands.add_parser("list", help="List the stored profiles, newest first.")
+        listing.add_argument("--limit", type=int, default=20)
+        show = subcommands.add_parser("show", help="Print the functions of a profile that cost the most.")
+        show.add_argument("profile_id")
+        show.add_argument("--sort", choices=["cumulative", "tottime", "ncalls"], default="cumulative")
+        show.add_argument("--limit", type=int, default=30)
+        show.add_argument(
+            "--match", help="Only functions whose location matches this regex, e.g. 'to_representation|visibility'."
+        )
+        subcommands.add_parser("token", help="Print a token for the X-Profile-Token header.")
+
+    def handle(self, *args, subcommand, **options):
+        getattr(self, f"handle_{subcommand}")(**options)
+
+    def handle_list(self, limit, **options):
+        profiles = profiling.stored_profiles()[:limit]
+        if not profiles:
+            self.stdout.write("No stored profiles.")
+            return
+        for profile in profiles:
+            self.stdout.write(
+                f"{profile['id']}  {profile['status']}  {profile['duration_ms']:>9.2f} ms  "
+                f"{profile['queries']} queries  {profile['trigger']:<6}  {profile['method']} {profile['path']}"
+            )
+
+    def handle_show(self, profile_id, sort, limit, match, **options):
+        try:
+            stats = profiling.load(profile_id)
+        except FileNotFoundError:
+            raise CommandError(f"Profile {profile_id} does not exist.")
+        stats.stream = io.StringIO()
+        restrictions = [match] if match else []
+        stats.strip_dirs().sort_stats(sort).print_stats(*restrictions, limit)
+        self.stdout.write(stats.stream.getvalue())
+
+    def handle_token(self, **options):
+        self.stdout.write(profiling.issue_token())
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from surveys.analytics import aggregates
+from surveys.models import Survey
+
+
+class Command(BaseCommand):
+    help = "Recompute the answer aggregates of the given surveys (all surveys by default) from their responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("survey_ids", nargs="*", type=int)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, survey_ids, chunk_size, **options):
+        if not survey_ids:
+            survey_ids = list(Survey.objects.values_list("id", flat=True))
+
+        for survey_id in survey_ids:
+            with transaction.atomic():
+                aggregates.rebuild(survey_id, chunk_size=chunk_size)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt aggregates of survey {survey_id}."))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+
+from surveys import partitioning
+
+
+class Command(BaseCommand):
+    help = "Partition the response tables by survey on PostgreSQL, and attach or detach the partitions of surveys."
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="subcommand", required=True)
+        subcommands.add_parser("status", help="List the partitions of the response tables.")
+        subcommands.add_parser(
+            "enable", help="Partition the response tables. Requires SURVEY_RESPONSE_PARTITIONING; locks both tables."
+        )
+        attach = subcommands.add_parser(
+            "attach", help="Move the responses of existing surveys, or archived partitions, into their own partitions."
+        )
+        attach.add_argument("survey_ids", nargs="+", type=int)
+        detach = subcommands.add_parser(
+            "detach", help="Detach the partitions of surveys, keeping them as standalone tables for archiving."
+        )
+        detach.add_argument("survey_ids", nargs="+", type=int)
+        detach.add_argument("--drop", action="store_true", help="Drop the partitions and their responses instead.")
+
+    def handle(self, *args, subcommand, **options):
+        if not partitioning.is_supported():
+            raise CommandError("Partitioning the response tables requires PostgreSQL.")
+        if subcommand in ("attach", "detach") and not partitioning.is_partitioned():
+            raise CommandError("The response tables are not partitioned, run the enable subcommand first.")
+        getattr(self, f"handle_{subcommand}")(**options)
+
+    def handle_status(self, **options):
+        if not partitioning.is_partitioned():
+            self.stdout.write("The response tables are not partitioned.")
+            return
+        for table, partition, bounds, rows, size in partitioning.partitions():
+            self.stdout.write(f"{table:<22} {partition:<32} {bounds:<22} {rows:>12} rows  {filesizeformat(size)}")
+
+    def handle_enable(self, **options):
+        if not partitioning.enabled():
+            raise CommandError("Set SURVEY_RESPONSE_PARTITIONING=True before partitioning the response tables.")
+        if not partitioning.convert():
+            raise CommandError("The response tables are already partitioned.")
+        self.stdout.write(self.style.SUCCESS("Partitioned the response tables by survey."))
+
+    def handle_attach(self, survey_ids, **options):
+        for survey_id in survey_ids:
+            partitioning.attach(survey_id)
+            self.stdout.write(self.style.SUCCESS(f"Attached the partitions of survey {survey_id}."))
+
+    def handle_detach(self, survey_ids, drop, **options):
+        for survey_id in survey_ids:
+            if not partitioning.detach(survey_id, drop=drop):
+                raise CommandError(f"Survey {survey_id} has no partitions.")
+            action = "Dropped" if drop else "Detached"
+            self.stdout.write(self.style.SUCCESS(f"{action} the partitions of survey {survey_id}."))
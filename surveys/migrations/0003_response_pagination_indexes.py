@@ -0,0 +1,29 @@
+# Generated by Django 4.2.15 on 2026-10-17 00:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0002_field_choices_alter_response_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['created_at', 'id'], name='response_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['survey', 'created_at', 'id'], name='response_survey_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['email', 'created_at', 'id'], name='response_email_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='responsedata',
+            index=models.Index(fields=['created_at', 'id'], name='responsedata_created_id_idx'),
+        ),
+    ]
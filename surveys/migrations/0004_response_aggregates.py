@@ -0,0 +1,44 @@
+# Generated by Django 4.2.15 on 2026-10-17 01:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0003_response_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldNumericStats',
+            fields=[
+                ('field', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='numeric_stats', serialize=False, to='surveys.field')),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SurveyResponseStats',
+            fields=[
+                ('survey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='response_stats', serialize=False, to='surveys.survey')),
+                ('submitted', models.BigIntegerField(default=0)),
+                ('completed', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FieldChoiceCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.TextField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choice_counts', to='surveys.field')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('field', 'value'), name='unique_field_choice_count')],
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.15 on 2026-10-17 01:40
+
+from django.db import migrations, models
+
+from surveys.coercion import TYPED_FIELD_TYPES, typed_columns
+
+BATCH_SIZE = 2000
+
+
+def backfill_typed_values(apps, schema_editor):
+    """Populate the typed columns of existing answers, in batches of ``BATCH_SIZE`` rows."""
+    ResponseData = apps.get_model("surveys", "ResponseData")
+    answers = (
+        ResponseData.objects.filter(field__field_type__in=TYPED_FIELD_TYPES)
+        .order_by("id")
+        .values_list("id", "value", "field__field_type")
+    )
+
+    last_id = 0
+    while True:
+        batch = list(answers.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        ResponseData.objects.bulk_update(
+            [
+                ResponseData(id=answer_id, **typed_columns(field_type, value))
+                for answer_id, value, field_type in batch
+            ],
+            ["value_number", "value_date", "value_json"],
+        )
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+    # The backfill commits batch by batch instead of holding one transaction over the whole table
+    atomic = False
+
+    dependencies = [
+        ('surveys', '0004_response_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='responsedata',
+            name='value_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='responsedata',
+            name='value_json',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='responsedata',
+            name='value_number',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_typed_values, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='responsedata',
+            index=models.Index(fields=['field', 'value_number'], name='responsedata_field_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='responsedata',
+            index=models.Index(fields=['field', 'value_date'], name='responsedata_field_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-17 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0005_responsedata_typed_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='submission_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
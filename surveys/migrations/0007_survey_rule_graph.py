@@ -0,0 +1,32 @@
+# Generated by Django 4.2.15 on 2026-10-17 13:20
+
+from django.db import migrations, models
+
+from surveys.dependency_graph import RuleGraph
+
+
+def backfill_rule_graphs(apps, schema_editor):
+    """Store the rule graph of existing surveys, one survey at a time."""
+    Survey = apps.get_model("surveys", "Survey")
+    Field = apps.get_model("surveys", "Field")
+
+    for survey_id in Survey.objects.order_by("id").values_list("id", flat=True).iterator():
+        fields = Field.objects.filter(section__survey_id=survey_id).order_by("section__order", "order", "id")
+        rule_graph = RuleGraph.from_fields(list(fields)).as_json()
+        Survey.objects.filter(id=survey_id).update(rule_graph=rule_graph)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0006_response_submission_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='rule_graph',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_rule_graphs, migrations.RunPython.noop),
+    ]
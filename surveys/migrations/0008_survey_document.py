@@ -0,0 +1,23 @@
+# Generated by Django 4.2.15 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0007_survey_rule_graph'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyDocument',
+            fields=[
+                ('survey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='surveys.survey')),
+                ('anonymous', models.BinaryField()),
+                ('full', models.BinaryField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
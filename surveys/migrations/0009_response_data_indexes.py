@@ -0,0 +1,89 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:05
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from survey_platform.common.operations import ConcurrentAddIndex, ConcurrentAddUniqueConstraint
+from surveys.analytics.aggregates import rebuild_fields
+
+# Duplicated (response, field) pairs handled per query
+BATCH_SIZE = 200
+
+
+def deduplicate_answers(apps, schema_editor):
+    """Keep only the most recently written answer of every response to a field, in batches of ``BATCH_SIZE``.
+
+    The aggregates counted every duplicate, so those of the affected fields are rebuilt from the answers kept.
+    """
+    Field = apps.get_model("surveys", "Field")
+    ResponseData = apps.get_model("surveys", "ResponseData")
+    duplicated = list(
+        ResponseData.objects.values_list("response_id", "field_id")
+        .annotate(answers=models.Count("id"))
+        .filter(answers__gt=1)
+        .order_by()
+    )
+
+    for start in range(0, len(duplicated), BATCH_SIZE):
+        pairs = models.Q()
+        for response_id, field_id, _ in duplicated[start : start + BATCH_SIZE]:
+            pairs |= models.Q(response_id=response_id, field_id=field_id)
+        latest = {}
+        for answer_id, response_id, field_id in (
+            ResponseData.objects.filter(pairs).order_by("updated_at", "id").values_list("id", "response_id", "field_id")
+        ):
+            latest[(response_id, field_id)] = answer_id
+        ResponseData.objects.filter(pairs).exclude(id__in=latest.values()).delete()
+
+    fields_per_survey = defaultdict(list)
+    for field in Field.objects.filter(id__in={field_id for _, field_id, _ in duplicated}).select_related("section"):
+        fields_per_survey[field.section.survey_id].append(field)
+    for survey_id, fields in fields_per_survey.items():
+        rebuild_fields(survey_id, fields)
+
+
+class Migration(migrations.Migration):
+    # The deduplication commits batch by batch instead of holding one transaction over the whole table, and
+    # indexes are built concurrently on PostgreSQL. Answers are deduplicated again right before the unique
+    # constraint is built, but duplicates written meanwhile make the build fail: stop the writes to answers while
+    # the migration runs.
+    atomic = False
+
+    dependencies = [
+        ('surveys', '0008_survey_document'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_answers, migrations.RunPython.noop),
+        ConcurrentAddIndex(
+            model_name='responsedata',
+            index=models.Index(fields=['field', 'response'], name='responsedata_field_resp_idx'),
+        ),
+        ConcurrentAddIndex(
+            model_name='response',
+            index=models.Index(fields=['survey', 'email', 'id'], name='response_survey_email_idx'),
+        ),
+        ConcurrentAddIndex(
+            model_name='response',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['survey', 'created_at', 'id'], name='response_completed_idx'),
+        ),
+        # Duplicates written while the indexes above were built
+        migrations.RunPython(deduplicate_answers, migrations.RunPython.noop),
+        ConcurrentAddUniqueConstraint(
+            model_name='responsedata',
+            constraint=models.UniqueConstraint(fields=('response', 'field'), name='unique_response_field'),
+        ),
+        # Dropped last: the constraint and the indexes above start with these columns
+        migrations.AlterField(
+            model_name='responsedata',
+            name='field',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='surveys.field'),
+        ),
+        migrations.AlterField(
+            model_name='responsedata',
+            name='response',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='response_data', to='surveys.response'),
+        ),
+    ]
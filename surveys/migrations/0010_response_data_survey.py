@@ -0,0 +1,46 @@
+# Generated by Django 4.2.15 on 2026-10-17 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Answers updated per query
+BATCH_SIZE = 5000
+
+
+def copy_response_survey(apps, schema_editor):
+    """Copy the survey of every answer's response, in batches of ``BATCH_SIZE`` answers paged by id."""
+    Response = apps.get_model("surveys", "Response")
+    ResponseData = apps.get_model("surveys", "ResponseData")
+    response_survey = Response.objects.filter(pk=models.OuterRef("response_id")).values("survey_id")[:1]
+    answer_ids = ResponseData.objects.order_by("id").values_list("id", flat=True)
+
+    last_id = 0
+    while True:
+        batch = list(answer_ids.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        ResponseData.objects.filter(id__in=batch).update(survey_id=models.Subquery(response_survey))
+        last_id = batch[-1]
+
+
+class Migration(migrations.Migration):
+    # The copy commits batch by batch instead of holding one transaction over the whole table
+    atomic = False
+
+    dependencies = [
+        ('surveys', '0009_response_data_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='responsedata',
+            name='survey',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='surveys.survey'),
+        ),
+        migrations.RunPython(copy_response_survey, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='responsedata',
+            name='survey',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='surveys.survey'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.15 on 2026-10-17 03:25
+
+from django.db import migrations
+
+from surveys import partitioning
+
+
+def partition_responses(apps, schema_editor):
+    """Partition the response tables by survey when ``SURVEY_RESPONSE_PARTITIONING`` is enabled on PostgreSQL."""
+    if partitioning.enabled():
+        partitioning.convert()
+
+
+def check_unpartitioned(apps, schema_editor):
+    if partitioning.is_partitioned():
+        raise RuntimeError("The response tables are partitioned by survey and cannot be migrated back.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('surveys', '0010_response_data_survey'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_responses, check_unpartitioned),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.15 on 2026-10-17 16:05
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def drop_closures(apps, schema_editor):
+    """Remove the dependency closures from the stored rule graphs, in batches of ``BATCH_SIZE`` surveys."""
+    Survey = apps.get_model("surveys", "Survey")
+    surveys = Survey.objects.filter(rule_graph__has_key="closure").order_by("id").only("id", "rule_graph")
+
+    last_id = 0
+    while True:
+        batch = list(surveys.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for survey in batch:
+            survey.rule_graph.pop("closure")
+        Survey.objects.bulk_update(batch, ["rule_graph"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    # The rewrite commits batch by batch instead of holding one transaction over the whole table
+    atomic = False
+
+    dependencies = [
+        ('surveys', '0011_response_partitioning'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_closures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.15 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+from survey_platform.common.operations import ConcurrentAddIndex
+
+
+class Migration(migrations.Migration):
+    # The index is built concurrently on PostgreSQL, partition by partition once the answers are partitioned
+    atomic = False
+
+    dependencies = [
+        ('surveys', '0012_survey_rule_graph_order'),
+    ]
+
+    operations = [
+        ConcurrentAddIndex(
+            model_name='responsedata',
+            index=models.Index(fields=['survey', 'created_at', 'id'], name='responsedata_survey_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from survey_platform.common.models import TimestampedModel
+from .coercion import typed_columns
 
 
 class Survey(TimestampedModel):
@@ -7,6 +8,8 @@ class Survey(TimestampedModel):
 
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
+    # Evaluation order and transitive dependencies of the field rules, see ``surveys.dependency_graph``
+    rule_graph = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return self.title
@@ -62,6 +65,24 @@ class Response(TimestampedModel):
         null=True, blank=True, db_index=True
     )  # Email for tracking user, nullable for anonymous users
     completed = models.BooleanField(default=False)
+    # Client or server generated id of a queued submission, so that retried batches never insert it twice
+    submission_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination on (created_at, id), optionally narrowed to a survey or a respondent
+            models.Index(fields=["created_at", "id"], name="response_created_id_idx"),
+            models.Index(fields=["survey", "created_at", "id"], name="response_survey_created_idx"),
+            models.Index(fields=["email", "created_at", "id"], name="response_email_created_idx"),
+            # A respondent's responses to one survey; covers the ids joined to their answers
+            models.Index(fields=["survey", "email", "id"], name="response_survey_email_idx"),
+            # Completed responses only, the usual filter of analytics and listings
+            models.Index(
+                fields=["survey", "created_at", "id"],
+                name="response_completed_idx",
+                condition=models.Q(completed=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Response to {self.survey.title} by {'Anonymous' if not self.email else self.email}"
@@ -70,9 +91,102 @@ class Response(TimestampedModel):
 class ResponseData(TimestampedModel):
     """Model representing the data for a specific response field."""
 
-    response = models.ForeignKey(Response, related_name="response_data", on_delete=models.CASCADE)
-    field = models.ForeignKey(Field, related_name="responses", on_delete=models.CASCADE)
+    # No single-column indexes: the unique constraint and the indexes below start with these columns
+    response = models.ForeignKey(Response, related_name="response_data", on_delete=models.CASCADE, db_index=False)
+    field = models.ForeignKey(Field, related_name="responses", on_delete=models.CASCADE, db_index=False)
+    # The survey of ``response``, copied as the partition key of the answers (see ``surveys.partitioning``) and
+    # to filter them by survey without joining the responses. Answers are deleted with their response. No
+    # constraint: a survey delete would have to check it for every answer left.
+    survey = models.ForeignKey(
+        Survey, related_name="+", on_delete=models.DO_NOTHING, db_index=False, db_constraint=False
+    )
     value = models.TextField()
+    # Typed copies of ``value``, populated according to ``Field.field_type`` at write time
+    value_number = models.FloatField(null=True, blank=True)
+    value_date = models.DateField(null=True, blank=True)
+    value_json = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One answer per field and response; also the access path to a response's answers
+            models.UniqueConstraint(fields=["response", "field"], name="unique_response_field"),
+        ]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="responsedata_created_id_idx"),
+            # The answers to a survey in the keyset pagination order
+            models.Index(fields=["survey", "created_at", "id"], name="responsedata_survey_idx"),
+            # The answers to a field, joined to their responses (crosstabs, aggregate rebuilds). ``value`` is
+            # not included: unbounded text would exceed the maximum size of a B-tree entry.
+            models.Index(fields=["field", "response"], name="responsedata_field_resp_idx"),
+            models.Index(fields=["field", "value_number"], name="responsedata_field_number_idx"),
+            models.Index(fields=["field", "value_date"], name="responsedata_field_date_idx"),
+        ]
 
     def __str__(self):
         return f"Response to {self.field.label}: {self.value}"
+
+    def populate_typed_values(self, field_type):
+        """Fill the typed columns from ``value`` for a field of ``field_type``."""
+        for column, typed_value in typed_columns(field_type, self.value).items():
+            setattr(self, column, typed_value)
+
+    def save(self, *args, **kwargs):
+        if self.survey_id is None or ResponseData.response.is_cached(self):
+            self.survey_id = self.response.survey_id
+        self.populate_typed_values(self.field.field_type)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "value" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "value_number", "value_date", "value_json"}
+        super().save(*args, **kwargs)
+
+
+class SurveyResponseStats(models.Model):
+    """Incrementally maintained response counters of a survey."""
+
+    survey = models.OneToOneField(Survey, related_name="response_stats", on_delete=models.CASCADE, primary_key=True)
+    submitted = models.BigIntegerField(default=0)
+    completed = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for {self.survey_id}: {self.submitted} submitted, {self.completed} completed"
+
+
+class FieldChoiceCount(models.Model):
+    """Incrementally maintained number of answers selecting ``value`` for a choice field."""
+
+    field = models.ForeignKey(Field, related_name="choice_counts", on_delete=models.CASCADE)
+    value = models.TextField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["field", "value"], name="unique_field_choice_count")]
+
+    def __str__(self):
+        return f"{self.value}: {self.count}"
+
+
+class FieldNumericStats(models.Model):
+    """Incrementally maintained count, sum, min and max of the answers to a number field."""
+
+    field = models.OneToOneField(Field, related_name="numeric_stats", on_delete=models.CASCADE, primary_key=True)
+    count = models.BigIntegerField(default=0)
+    total = models.FloatField(default=0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Numeric stats for {self.field_id}: {self.count} answers"
+
+
+class SurveyDocument(models.Model):
+    """The rendered survey document, encoded as JSON and rebuilt whenever the survey definition is written."""
+
+    survey = models.OneToOneField(Survey, related_name="document", on_delete=models.CASCADE, primary_key=True)
+    # The document with the fields visible without any answers, as served to anonymous respondents
+    anonymous = models.BinaryField()
+    # Every field regardless of its rules, filtered per respondent
+    full = models.BinaryField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Document of survey {self.survey_id}"
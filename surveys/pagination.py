@@ -0,0 +1,74 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination on ``(created_at, id)``.
+
+    The cursor holds the ``(created_at, id)`` of the row a page ends on, and the next page is fetched with
+    ``WHERE created_at >= <created_at> AND (created_at > <created_at> OR id > <id>)``: a range scan of the
+    ``(created_at, id)`` indexes instead of an OFFSET scan. Rows created in the same instant are neither skipped
+    nor repeated, and no COUNT(*) is issued, so the last page of a large table costs the same as the first one.
+    """
+
+    ordering = ("created_at", "id")
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # DRF's implementation filters on ``created_at`` alone and skips the rows sharing it with an offset
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        if reverse:
+            queryset = queryset.order_by("-created_at", "-id")
+        else:
+            queryset = queryset.order_by("created_at", "id")
+        if current_position is not None:
+            queryset = queryset.filter(self._after(current_position, reverse))
+
+        # One extra row tells whether a page follows
+        results = list(queryset[offset : offset + self.page_size + 1])
+        self.page = results[: self.page_size]
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if len(results) > len(self.page) else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _after(self, position, reverse):
+        """The rows past ``position`` in the direction of the page, by ``(created_at, id)``."""
+        created_at, _, pk = position.rpartition(",")
+        try:
+            created_at, pk = parse_datetime(created_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        if reverse:
+            return Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+        return Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            return f"{instance['created_at'].isoformat()},{instance['id']}"
+        return f"{instance.created_at.isoformat()},{instance.id}"
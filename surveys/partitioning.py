@@ -0,0 +1,296 @@
+"""Optional partitioning of the response tables by survey on PostgreSQL.
+
+With ``SURVEY_RESPONSE_PARTITIONING`` enabled, migration 0011 (or ``manage.py response_partitions enable``)
+turns ``Response`` and ``ResponseData`` into tables partitioned by ``LIST (survey_id)``. Every survey created
+afterwards gets its own pair of partitions, ``<table>_s<survey id>``, so that deleting a survey drops two tables
+instead of deleting its rows one response at a time, and queries filtered on a survey only read its partitions.
+
+The existing rows are not copied: the original tables become the ``DEFAULT`` partitions, ``<table>_default``. A
+``CHECK`` constraint bounds their survey ids so that attaching the partitions of new surveys never scans them.
+``attach`` moves the rows of an older survey out of the default partitions into partitions of its own.
+
+Partitioned tables only enforce keys that contain the partition key: the primary keys become ``(id,
+survey_id)``, ``submission_id`` is unique per survey and the unique answer constraint is ``(response_id,
+field_id, survey_id)``. Ids still come from one sequence per table and stay unique. The answers reference their
+response through ``(response_id, survey_id)``, which is why ``ResponseData`` carries the survey of its response.
+
+On other databases and unpartitioned tables the partition operations are no-ops, and ``delete_responses`` deletes
+the answers of a survey with one statement.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Response, ResponseData, Survey
+
+# Partitioned together, parents first; answers are dropped before the responses they reference
+MODELS = [Response, ResponseData]
+
+RESPONSE_FOREIGN_KEY = "responsedata_response_survey_fk"
+
+
+def is_supported():
+    return connection.vendor == "postgresql"
+
+
+def enabled():
+    """Whether the settings ask for partitioned response tables on this database."""
+    return settings.SURVEY_RESPONSE_PARTITIONING and is_supported()
+
+
+def is_partitioned():
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [Response._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def partition_name(model, survey_id):
+    return f"{model._meta.db_table}_s{survey_id}"
+
+
+def _default_name(name):
+    # Identifiers are truncated at 63 characters
+    return f"{name[:54]}_default"
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _table_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cursor.fetchone()[0]
+
+
+def _is_partition(cursor, name, parent):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%s) AND inhparent = to_regclass(%s))",
+        [name, parent],
+    )
+    return cursor.fetchone()[0]
+
+
+def _foreign_keys(cursor, table, referenced):
+    cursor.execute(
+        "SELECT conname FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = %s::regclass AND confrelid = %s::regclass",
+        [table, referenced],
+    )
+    return [name for name, in cursor.fetchall()]
+
+
+def _move_sequence(cursor, table):
+    """Replace an identity ``id`` column by a sequence default, which the partitioned table can inherit."""
+    cursor.execute(
+        "SELECT pg_get_serial_sequence(%s, 'id'), attidentity != '' FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attname = 'id'",
+        [table, table],
+    )
+    sequence, identity = cursor.fetchone()
+    if identity:
+        cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+        last_value, is_called = cursor.fetchone()
+        cursor.execute(f"ALTER TABLE {_quote(table)} ALTER COLUMN id DROP IDENTITY")
+        sequence = _quote(f"{table}_id_seq")
+        cursor.execute(f"CREATE SEQUENCE {sequence} AS bigint")
+        cursor.execute("SELECT setval(%s::regclass, %s, %s)", [sequence, last_value, is_called])
+        cursor.execute(f"ALTER TABLE {_quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+    return sequence
+
+
+def _partition_table(cursor, table, max_survey_id):
+    """Recreate ``table`` as a partitioned table with the original one as its default partition."""
+    default = _default_name(table)
+    sequence = _move_sequence(cursor, table)
+
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid), ARRAY("
+        "  SELECT attname::text FROM unnest(conkey) WITH ORDINALITY AS k(attnum, n)"
+        "  JOIN pg_attribute ON attrelid = conrelid AND pg_attribute.attnum = k.attnum ORDER BY k.n"
+        ") FROM pg_constraint WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f') ORDER BY conname",
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass "
+        "AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = %s::regclass)",
+        [table, table],
+    )
+    indexes = cursor.fetchall()
+
+    cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(default)}")
+    for name, kind, _, _ in constraints:
+        if kind != "f":
+            cursor.execute(
+                f"ALTER TABLE {_quote(default)} RENAME CONSTRAINT {_quote(name)} TO {_quote(_default_name(name))}"
+            )
+    for name, _ in indexes:
+        cursor.execute(f"ALTER INDEX {_quote(name)} RENAME TO {_quote(_default_name(name))}")
+
+    cursor.execute(
+        f"CREATE TABLE {_quote(table)} (LIKE {_quote(default)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY LIST (survey_id)"
+    )
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {_quote(table)}.id")
+    for name, kind, definition, columns in constraints:
+        if kind == "f":
+            cursor.execute(f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} {definition}")
+            continue
+        if "survey_id" not in columns:
+            columns = [*columns, "survey_id"]
+        key = "PRIMARY KEY" if kind == "p" else "UNIQUE"
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} {key} ({', '.join(map(_quote, columns))})"
+        )
+    for _, definition in indexes:
+        cursor.execute(definition)
+
+    cursor.execute(
+        f"ALTER TABLE {_quote(default)} ADD CONSTRAINT {_quote(f'{default}_surveys')} "
+        "CHECK (survey_id <= %s)",
+        [max_survey_id],
+    )
+    # Matching indexes and foreign keys of the default partition are attached rather than rebuilt
+    cursor.execute(f"ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(default)} DEFAULT")
+
+
+@transaction.atomic
+def convert():
+    """Partition the response tables by survey. Existing rows stay in the default partitions.
+
+    Both tables are locked for the duration, which includes building the composite primary keys and unique
+    constraints on the existing rows. Returns ``False`` if the tables were already partitioned.
+    """
+    if is_partitioned():
+        return False
+    response_table, answer_table = Response._meta.db_table, ResponseData._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {_quote(response_table)}, {_quote(answer_table)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {_quote(Survey._meta.db_table)}")
+        max_survey_id = cursor.fetchone()[0]
+
+        # Response ids are only unique per survey once partitioned
+        for name in _foreign_keys(cursor, answer_table, response_table):
+            cursor.execute(f"ALTER TABLE {_quote(answer_table)} DROP CONSTRAINT {_quote(name)}")
+        for model in MODELS:
+            _partition_table(cursor, model._meta.db_table, max_survey_id)
+        cursor.execute(
+            f"ALTER TABLE {_quote(answer_table)} ADD CONSTRAINT {RESPONSE_FOREIGN_KEY} "
+            f"FOREIGN KEY (response_id, survey_id) REFERENCES {_quote(response_table)} (id, survey_id) "
+            "DEFERRABLE INITIALLY DEFERRED"
+        )
+    return True
+
+
+def _attach_partition(cursor, model, survey_id):
+    table, partition = model._meta.db_table, partition_name(model, survey_id)
+    cursor.execute(f"ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(partition)} FOR VALUES IN (%s)", [survey_id])
+
+
+def create_partitions(survey_id):
+    """Create the empty partitions of a new survey. Returns ``False`` when the tables are not partitioned.
+
+    The partitions are created standalone and attached, which unlike ``CREATE TABLE ... PARTITION OF`` does not
+    lock the parent tables against reads and writes. Attaching still locks the default partitions, and with them
+    every unattached survey's responses, until the transaction ends. The ``post_save`` signal of ``Survey`` calls
+    it in the transaction creating the survey, so that a failure rolls the survey back: the ``CHECK`` constraint of
+    the default partitions rejects the rows of a survey left without partitions.
+    """
+    if not is_partitioned():
+        return False
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in MODELS:
+            cursor.execute(
+                f"CREATE TABLE {_quote(partition_name(model, survey_id))} "
+                f"(LIKE {_quote(model._meta.db_table)} INCLUDING DEFAULTS)"
+            )
+            _attach_partition(cursor, model, survey_id)
+    return True
+
+
+def attach(survey_id):
+    """Give an existing survey its own partitions, moving its rows out of the default partitions.
+
+    Partitions previously detached with ``detach`` are attached back as they are. Attaching scans the default
+    partitions, which are locked meanwhile. Returns ``False`` when the tables are not partitioned.
+    """
+    if not is_partitioned():
+        return False
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Check the deletion of the moved responses while their answers are out of the table, not at commit
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        pending = []
+        for model in reversed(MODELS):
+            table, partition = model._meta.db_table, partition_name(model, survey_id)
+            if _is_partition(cursor, partition, table):
+                continue
+            pending.insert(0, model)
+            if not _table_exists(cursor, partition):
+                cursor.execute(f"CREATE TABLE {_quote(partition)} (LIKE {_quote(table)} INCLUDING DEFAULTS)")
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {_quote(_default_name(table))} WHERE survey_id = %s RETURNING *) "
+                    f"INSERT INTO {_quote(partition)} SELECT * FROM moved",
+                    [survey_id],
+                )
+        # Responses first, which the attached answers are checked against
+        for model in pending:
+            _attach_partition(cursor, model, survey_id)
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+    return True
+
+
+def detach(survey_id, drop=False):
+    """Detach the partitions of a survey from the response tables, and ``drop`` them.
+
+    Kept partitions become standalone tables holding the survey's data, for archiving, and can be attached back
+    with ``attach``. Returns ``False`` if the survey has no partitions.
+    """
+    if not is_partitioned():
+        return False
+    response_table = Response._meta.db_table
+    detached = False
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in reversed(MODELS):
+            table, partition = model._meta.db_table, partition_name(model, survey_id)
+            if not _is_partition(cursor, partition, table):
+                continue
+            detached = True
+            cursor.execute(f"ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(partition)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {_quote(partition)}")
+                continue
+            # Archived answers no longer reference the (detached) responses
+            for name in _foreign_keys(cursor, partition, response_table):
+                cursor.execute(f"ALTER TABLE {_quote(partition)} DROP CONSTRAINT {_quote(name)}")
+    return detached
+
+
+def delete_responses(survey_id):
+    """Delete the answers of a survey, and its responses where they have their own partitions.
+
+    Drops the survey's partitions, or deletes its answers with a single statement on unpartitioned tables (and for
+    surveys left in the default partitions). The responses left are deleted with the survey.
+    """
+    if not detach(survey_id, drop=True):
+        ResponseData.objects.filter(response__survey_id=survey_id).delete()
+
+
+def partitions():
+    """The partitions of the response tables: ``(table, partition, bounds, estimated rows, bytes)``."""
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT parent.relname, child.relname, pg_get_expr(child.relpartbound, child.oid), "
+            "greatest(child.reltuples, 0)::bigint, pg_total_relation_size(child.oid) "
+            "FROM pg_inherits JOIN pg_class parent ON parent.oid = inhparent "
+            "JOIN pg_class child ON child.oid = inhrelid "
+            "WHERE inhparent = ANY(ARRAY[%s, %s]::regclass[]) ORDER BY parent.relname, child.relname",
+            [model._meta.db_table for model in MODELS],
+        )
+        return cursor.fetchall()
@@ -0,0 +1,79 @@
+"""Cached answers of a respondent to a survey.
+
+Logged-in respondents load the survey document on every page turn, and the document depends on what they
+have answered so far. Their recorded answers are fetched with one narrow query and cached per
+``(survey, email)`` until one of their answers is written; typing them with the survey's ``SurveySchema``
+happens in-process, so a survey update never leaves stale typed values in the cache.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from survey_platform.instrumentation import record_cache
+
+from .models import ResponseData
+from .validation import aget_schema, get_schema
+
+
+def _cache():
+    return caches[settings.SURVEY_CACHE_ALIAS]
+
+
+def _key(survey_id, email):
+    # Hashed: emails may contain characters that some cache backends reject in keys
+    return f"surveys:{survey_id}:respondent:{hashlib.sha1(email.encode()).hexdigest()}"
+
+
+def _recorded_answers(survey_id, email):
+    # Ordered by response so that, with several responses, the latest answer to a field wins
+    return (
+        ResponseData.objects.filter(response__survey_id=survey_id, response__email=email)
+        .order_by("response_id")
+        .values_list("field_id", "value")
+    )
+
+
+def get_answers(survey_id, email):
+    """The typed answers of ``email`` to ``survey_id``, keyed by field id. Empty for anonymous respondents."""
+    if not email:
+        return {}
+    key = _key(survey_id, email)
+    recorded = _cache().get(key)
+    record_cache("answers", recorded is not None)
+    if recorded is None:
+        recorded = dict(_recorded_answers(survey_id, email))
+        _cache().set(key, recorded, timeout=settings.SURVEY_CACHE_TIMEOUT)
+    return get_schema(survey_id).clean_recorded(recorded)
+
+
+async def aget_answers(survey_id, email):
+    """Async variant of ``get_answers``."""
+    if not email:
+        return {}
+    key = _key(survey_id, email)
+    recorded = await _cache().aget(key)
+    record_cache("answers", recorded is not None)
+    if recorded is None:
+        recorded = {field_id: value async for field_id, value in _recorded_answers(survey_id, email)}
+        await _cache().aset(key, recorded, timeout=settings.SURVEY_CACHE_TIMEOUT)
+    return (await aget_schema(survey_id)).clean_recorded(recorded)
+
+
+def _delete(keys):
+    _cache().delete_many(keys)
+
+
+def answers_changed(survey_id, *emails):
+    """Drop the cached answers of ``emails`` to ``survey_id`` after one of their answers was written.
+
+    Like ``document_cache.survey_changed``, the entries are dropped now and again once the current
+    transaction commits, so a read that cached the pre-commit answers in between is not served afterwards.
+    """
+    keys = [_key(survey_id, email) for email in set(emails) if email]
+    if not keys:
+        return
+    _delete(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _delete(keys))
@@ -1,8 +1,36 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, prefetch_related_objects
+from django.utils import timezone
 from rest_framework import serializers
+from . import respondents, visibility
+from .analytics import numeric
+from .analytics.aggregates import AggregateDelta
+from .coercion import typed_columns
 from .models import Survey, Section, Field, Response, ResponseData
+from .validation import get_schema
+from .dependency_graph import RuleGraph
+from .writers import create_sections, store_rule_graph, sync_sections
+
+# Attributes of the survey list entries; the counts are only computed when requested
+SURVEY_COLUMNS = ["id", "title", "description", "created_at", "updated_at"]
+SURVEY_LIST_FIELDS = [
+    "id",
+    "title",
+    "description",
+    "sections",
+    "section_count",
+    "field_count",
+    "created_at",
+    "updated_at",
+]
+SURVEY_LIST_DEFAULT_FIELDS = ["id", "title", "description", "sections", "created_at", "updated_at"]
+SURVEY_LIST_EXPAND = ["sections", "sections.fields"]
 
 
 class FieldSerializer(serializers.ModelSerializer):
+    # Writable so that survey updates can match incoming fields against existing ones
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Field
         fields = [
@@ -17,89 +45,61 @@ class FieldSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        read_only_fields = ["created_at", "updated_at"]
+
+    @staticmethod
+    def _compile_rule(rule, compile_rule):
+        """Check that a rule compiles like ``visibility`` will compile it, so that it cannot fail on reads."""
+        if rule is None:
+            return rule
+        if not isinstance(rule, dict):
+            raise serializers.ValidationError("Rules must be JSON objects.")
+        try:
+            compile_rule(rule)
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+        return rule
+
+    def validate_conditional_logic(self, conditional_logic):
+        return self._compile_rule(conditional_logic, visibility.compile_conditional_logic)
+
+    def validate_dependencies(self, dependencies):
+        return self._compile_rule(dependencies, visibility.compile_dependencies)
 
 
 class SectionSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
     fields = FieldSerializer(many=True)
 
     class Meta:
         model = Section
         fields = ["id", "title", "order", "fields", "created_at", "updated_at"]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        read_only_fields = ["created_at", "updated_at"]
 
+    @transaction.atomic
     def create(self, validated_data):
-        fields_data = validated_data.pop("fields")
-        section = Section.objects.create(**validated_data)
-
-        for field_data in fields_data:
-            Field.objects.create(section=section, **field_data)
-
+        survey = validated_data.pop("survey")
+        (section,), _ = create_sections(survey, [validated_data])
         return section
 
     def to_representation(self, instance):
-        """Override to customize how sections and fields are serialized."""
+        """Override to only include the fields that are visible for the user's responses."""
+        # Make sure the representation and the visibility checks below iterate the same field list
+        prefetch_related_objects([instance], "fields")
         ret = super().to_representation(instance)
+        if not self.context.get("filter_visibility", True):
+            # Rendering the full document of ``surveys.documents``
+            return ret
         user_responses = self.context.get("user_responses", {})
-        relevant_fields = []
-
-        for field in instance.fields.all():
-            if self._should_include_field(field, user_responses):
-                relevant_fields.append(FieldSerializer(field).data)
+        engine = visibility.get_engine(instance.survey_id)
 
-        ret["fields"] = relevant_fields
+        ret["fields"] = [
+            field_data
+            for field, field_data in zip(instance.fields.all(), ret["fields"])
+            if engine.is_visible(field, user_responses)
+        ]
         return ret
 
-    def _should_include_field(self, field, user_responses):
-        # Evaluate conditional logic
-        if field.conditional_logic:
-            if not self._evaluate_conditional_logic(field.conditional_logic, user_responses):
-                return False
-
-        # Evaluate dependencies
-        if field.dependencies:
-            if not self._evaluate_dependencies(field.dependencies, user_responses):
-                return False
-
-        return True
-
-    def _evaluate_conditional_logic(self, logic, user_responses):
-        operator_map = {
-            "==": lambda actual, expected: actual == expected,
-            "!=": lambda actual, expected: actual != expected,
-            ">": lambda actual, expected: actual > expected,
-            "<": lambda actual, expected: actual < expected,
-            ">=": lambda actual, expected: actual >= expected,
-            "<=": lambda actual, expected: actual <= expected,
-        }
-
-        field_id = logic.get("depends_on_field")
-        operator = logic.get("operator")
-        expected_value = logic.get("value")
-        actual_value = user_responses.get(field_id)
-
-        if operator in operator_map:
-            return operator_map[operator](actual_value, expected_value)
-        else:
-            raise ValueError(f"Unsupported operator: {operator}")
-
-    def _evaluate_dependencies(self, dependencies, user_responses):
-        operator_map = {
-            "in": lambda actual, expected_values: actual in expected_values,
-            "not_in": lambda actual, expected_values: actual not in expected_values,
-            "contains": lambda actual, expected_value: expected_value in actual if isinstance(actual, list) else False,
-        }
-
-        field_id = dependencies.get("depends_on_field")
-        operator = dependencies.get("operator")
-        expected_values = dependencies.get("values")  # Expected values should be a list
-        actual_value = user_responses.get(field_id)
-
-        if operator in operator_map:
-            return operator_map[operator](actual_value, expected_values)
-        else:
-            raise ValueError(f"Unsupported operator: {operator}")
-
 
 class SurveySerializer(serializers.ModelSerializer):
     sections = SectionSerializer(many=True)
@@ -109,16 +109,47 @@ class SurveySerializer(serializers.ModelSerializer):
         fields = ["id", "title", "description", "sections", "created_at", "updated_at"]
         read_only_fields = ["id", "created_at", "updated_at"]
 
+    def validate_sections(self, sections):
+        """Check the submitted ids and that the field rules reference fields of the survey without cycles.
+
+        On update, ids must belong to the survey being updated. On create, field ids are provisional: rules may
+        reference them and are rewritten to the ids of the created fields.
+        """
+        section_ids = [section["id"] for section in sections if "id" in section]
+        field_ids = [field["id"] for section in sections for field in section["fields"] if "id" in field]
+        if len(set(section_ids)) != len(section_ids) or len(set(field_ids)) != len(field_ids):
+            raise serializers.ValidationError("Section and field ids must be unique.")
+
+        rule_errors = RuleGraph.from_sections_data(sections).errors()
+        if rule_errors:
+            raise serializers.ValidationError(rule_errors)
+
+        if self.instance is None:
+            return sections
+
+        unknown_sections = section_ids and set(section_ids) - set(
+            Section.objects.filter(survey=self.instance).values_list("id", flat=True)
+        )
+        if unknown_sections:
+            raise serializers.ValidationError(f"Unknown section ids for this survey: {sorted(unknown_sections)}.")
+
+        unknown_fields = field_ids and set(field_ids) - set(
+            Field.objects.filter(section__survey=self.instance).values_list("id", flat=True)
+        )
+        if unknown_fields:
+            raise serializers.ValidationError(f"Unknown field ids for this survey: {sorted(unknown_fields)}.")
+
+        return sections
+
+    @transaction.atomic
     def create(self, validated_data):
         sections_data = validated_data.pop("sections")
         survey = Survey.objects.create(**validated_data)
-
-        for section_data in sections_data:
-            section_data["survey"] = survey
-            SectionSerializer.create(SectionSerializer(), validated_data=section_data)
-
+        _, fields = create_sections(survey, sections_data)
+        store_rule_graph(survey, fields)
         return survey
 
+    @transaction.atomic
     def update(self, instance: Survey, validated_data):
         sections_data = validated_data.pop("sections", None)
 
@@ -127,13 +158,8 @@ class SurveySerializer(serializers.ModelSerializer):
         instance.save()
 
         if sections_data is not None:
-            # Clear existing sections
-            instance.sections.all().delete()
-
-            # Create new sections and fields
-            for section_data in sections_data:
-                section_data["survey"] = instance
-                SectionSerializer.create(SectionSerializer(), validated_data=section_data)
+            # Only write the sections and fields that changed, keeping the answers of untouched fields
+            sync_sections(instance, sections_data)
 
         return instance
 
@@ -141,17 +167,252 @@ class SurveySerializer(serializers.ModelSerializer):
         # Retrieve user responses from the context to pass down to the section serializer
         user_responses = self.context.get("user_responses", {})
         self.context["user_responses"] = user_responses
+        if "sections" in self.fields and isinstance(self.fields["sections"].child, SectionSerializer):
+            # Two queries for the whole tree, rather than one per section in ``SectionSerializer``. A no-op for
+            # querysets that prefetched it.
+            prefetch_related_objects([instance], "sections__fields")
         return super().to_representation(instance)
 
 
+class SectionSummarySerializer(serializers.ModelSerializer):
+    """A section without its fields, for survey lists that expand sections only."""
+
+    class Meta:
+        model = Section
+        fields = ["id", "title", "order", "created_at", "updated_at"]
+
+
+class SurveyListSerializer(SurveySerializer):
+    """Read-only survey list entries, trimmed to the ``fields`` and ``expand`` of ``SurveyListQuerySerializer``.
+
+    Querysets must come from ``setup_queryset`` with the same arguments, which loads just what is rendered.
+    """
+
+    section_count = serializers.IntegerField(read_only=True)
+    field_count = serializers.IntegerField(read_only=True)
+
+    class Meta(SurveySerializer.Meta):
+        fields = SurveySerializer.Meta.fields + ["section_count", "field_count"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields", SURVEY_LIST_DEFAULT_FIELDS)
+        for name in set(self.fields) - set(requested):
+            self.fields.pop(name)
+        if "sections" in self.fields and "sections.fields" not in self.context.get("expand", SURVEY_LIST_EXPAND):
+            self.fields["sections"] = SectionSummarySerializer(many=True, read_only=True)
+
+    @staticmethod
+    def setup_queryset(queryset, fields, expand):
+        """Restrict ``queryset`` to the requested columns, counts and relations."""
+        queryset = queryset.only("id", *(name for name in fields if name in SURVEY_COLUMNS))
+        if "section_count" in fields:
+            queryset = queryset.annotate(section_count=Count("sections", distinct=True))
+        if "field_count" in fields:
+            queryset = queryset.annotate(field_count=Count("sections__fields", distinct=True))
+        if "sections" in fields:
+            queryset = queryset.prefetch_related("sections__fields" if "sections.fields" in expand else "sections")
+        return queryset
+
+
+class ResponseAnswerSerializer(serializers.Serializer):
+    """A single answer nested in a response submission."""
+
+    # A plain id rather than a related field: all fields of the survey are loaded in one query on validation
+    field = serializers.IntegerField()
+    value = serializers.CharField()
+
+
+def validate_answers(schema, answers, recorded=None, completed=False):
+    """Validate the nested answers of a submission against ``schema``, raising a ``response_data`` error."""
+    field_ids = [answer["field"] for answer in answers]
+    if len(set(field_ids)) != len(field_ids):
+        raise serializers.ValidationError({"response_data": "Each field can only be answered once."})
+
+    _, errors, missing = schema.validate(answers, recorded, completed)
+    if any(errors):
+        raise serializers.ValidationError({"response_data": errors})
+    if missing:
+        raise serializers.ValidationError({"response_data": [f"Field {field_id} is required." for field_id in missing]})
+
+
 class ResponseSerializer(serializers.ModelSerializer):
+    response_data = ResponseAnswerSerializer(many=True, write_only=True, required=False)
+
     class Meta:
         model = Response
-        fields = ["id", "survey", "email", "completed", "created_at", "updated_at"]
+        fields = ["id", "survey", "email", "completed", "response_data", "created_at", "updated_at"]
         read_only_fields = ["id", "created_at", "updated_at"]
 
+    def validate(self, data):
+        answers = data.get("response_data")
+        if not answers:
+            return data
+
+        survey = data.get("survey") or self.instance.survey
+        recorded = None
+        if self.instance is not None:
+            # Rules are evaluated against the whole submission, on top of what the response already recorded
+            recorded = dict(self.instance.response_data.values_list("field_id", "value"))
+
+        completed = data.get("completed", self.instance.completed if self.instance is not None else False)
+        validate_answers(get_schema(survey.id), answers, recorded, completed)
+        return data
+
+    @transaction.atomic
+    def create(self, validated_data):
+        answers = validated_data.pop("response_data", [])
+        response = super().create(validated_data)
+        self._write_answers(response, answers)
+
+        delta = AggregateDelta()
+        delta.add_response(response.survey_id, response.completed)
+        for answer in answers:
+            delta.add_answer(response.survey_id, answer["field"], answer["value"])
+        delta.apply()
+        respondents.answers_changed(response.survey_id, response.email)
+        return response
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        answers = validated_data.pop("response_data", [])
+        previous_respondent = (instance.survey_id, instance.email)
+        delta = AggregateDelta()
+        delta.remove_response(instance.survey_id, instance.completed)
+
+        replaced = instance.response_data.none()
+        if answers:
+            # Submitted answers replace whatever was recorded for the same fields
+            replaced = instance.response_data.filter(field_id__in=[answer["field"] for answer in answers])
+            for field_id, value in replaced.values_list("field_id", "value"):
+                delta.remove_answer(instance.survey_id, field_id, value)
+
+        response = super().update(instance, validated_data)
+        if response.survey_id != previous_respondent[0]:
+            response.response_data.update(survey_id=response.survey_id)
+        if answers:
+            replaced.delete()
+            self._write_answers(response, answers)
+            for answer in answers:
+                delta.add_answer(response.survey_id, answer["field"], answer["value"])
+
+        delta.add_response(response.survey_id, response.completed)
+        delta.apply()
+        respondents.answers_changed(*previous_respondent)
+        respondents.answers_changed(response.survey_id, response.email)
+        return response
+
+    def _write_answers(self, response, answers):
+        validators = get_schema(response.survey_id).validators
+        response_data = []
+        for answer in answers:
+            answer_data = ResponseData(
+                response=response, survey_id=response.survey_id, field_id=answer["field"], value=answer["value"]
+            )
+            answer_data.populate_typed_values(validators[answer["field"]].field.field_type)
+            response_data.append(answer_data)
+        ResponseData.objects.bulk_create(response_data)
+
+
+class AnswerUpsertSerializer(serializers.Serializer):
+    """Autosave of a single answer: creates or replaces the answer of the context's ``response`` to ``field_id``.
+
+    The representation lists the fields that depend on the answer and became visible (``shown``) or hidden, so
+    that clients do not reload the survey document after every change.
+    """
+
+    value = serializers.CharField()
+
+    def validate(self, data):
+        response = self.context["response"]
+        field_id = self.context["field_id"]
+        schema = get_schema(response.survey_id)
+        validator = schema.validators.get(field_id)
+        if validator is None:
+            raise serializers.ValidationError({"field": [f"Field {field_id} does not belong to this survey."]})
+        try:
+            validator.clean(data["value"])
+        except ValueError as exc:
+            raise serializers.ValidationError({"value": [str(exc)]})
+
+        # One narrow query for everything the response recorded; rules are then evaluated in memory
+        recorded = list(response.response_data.values_list("id", "field_id", "value"))
+        before = schema.clean_recorded({answer_field_id: value for _, answer_field_id, value in recorded})
+        others = {answer_field_id: value for answer_field_id, value in before.items() if answer_field_id != field_id}
+        error = schema.check_rules(visibility.get_engine(response.survey_id), validator.field, others)
+        if error:
+            raise serializers.ValidationError(error)
+
+        data.update(schema=schema, field=validator.field, recorded=recorded, before=before)
+        return data
+
+    @transaction.atomic
+    def create(self, validated_data):
+        response = self.context["response"]
+        schema, field, raw = validated_data["schema"], validated_data["field"], validated_data["value"]
+        previous = [
+            (answer_id, value)
+            for answer_id, answer_field_id, value in validated_data["recorded"]
+            if answer_field_id == field.id
+        ]
+
+        if not previous:
+            try:
+                with transaction.atomic():
+                    ResponseData(response=response, field=field, value=raw).save()
+            except IntegrityError:
+                # A concurrent autosave of the same field inserted its answer first: replace that one
+                previous = list(
+                    ResponseData.objects.select_for_update()
+                    .filter(response=response, field=field)
+                    .values_list("id", "value")
+                )
+
+        delta = AggregateDelta()
+        for _, value in previous:
+            delta.remove_answer(response.survey_id, field.id, value)
+        delta.add_answer(response.survey_id, field.id, raw)
+        if previous:
+            ResponseData.objects.filter(pk__in=[answer_id for answer_id, _ in previous]).update(
+                value=raw, updated_at=timezone.now(), **typed_columns(field.field_type, raw)
+            )
+        delta.apply()
+        respondents.answers_changed(response.survey_id, response.email)
+
+        before = validated_data["before"]
+        after = {**before, field.id: schema.validators[field.id].clean(raw)}
+        shown, hidden = schema.visibility_delta(field.id, before, after)
+        return {"field": field.id, "value": raw, "created": not previous, "shown": shown, "hidden": hidden}
+
+    def to_representation(self, instance):
+        return instance
+
+
+class SubmissionSerializer(serializers.Serializer):
+    """A complete response queued for write-behind ingestion. Validation reads only the cached schema."""
+
+    # Clients retrying a submission should resend the same id so that it is written once
+    submission_id = serializers.UUIDField(required=False)
+    survey = serializers.IntegerField()
+    email = serializers.EmailField(required=False, allow_null=True)
+    completed = serializers.BooleanField(default=False)
+    response_data = ResponseAnswerSerializer(many=True, required=False, default=list)
+
+    def validate(self, data):
+        # Async views load the schema with the async ORM beforehand and pass it in the context
+        schema = self.context.get("schema")
+        if schema is None or schema.survey_id != data["survey"]:
+            schema = get_schema(data["survey"])
+        if not schema.exists:
+            raise serializers.ValidationError({"survey": ["Survey does not exist."]})
+        validate_answers(schema, data["response_data"], completed=data["completed"])
+        return data
+
 
 class ResponseDataSerializer(serializers.ModelSerializer):
+    # With its section, which gives the survey the answer is validated against
+    field = serializers.PrimaryKeyRelatedField(queryset=Field.objects.select_related("section"))
+
     class Meta:
         model = ResponseData
         fields = ["id", "response", "field", "value", "created_at", "updated_at"]
@@ -161,20 +422,162 @@ class ResponseDataSerializer(serializers.ModelSerializer):
         field: Field = data["field"]
         value = data["value"]
 
-        # Validate against predefined choices if the field has them
-        if field.choices and value not in field.choices:
-            raise serializers.ValidationError(f"Value '{value}' is not a valid choice.")
+        if field.section.survey_id != data["response"].survey_id:
+            raise serializers.ValidationError({"field": ["This field does not belong to the survey of the response."]})
+
+        # One answer per field and response; the autosave endpoint replaces answers instead
+        answered = ResponseData.objects.filter(response=data["response"], field=field)
+        if self.instance is not None:
+            answered = answered.exclude(pk=self.instance.pk)
+        if answered.exists():
+            raise serializers.ValidationError({"field": ["This field is already answered in this response."]})
+
+        # Type coercion and choices, from the survey's precomputed schema
+        validator = self._get_schema(field).validators.get(field.id)
+        if validator is not None:
+            try:
+                validator.clean(value)
+            except ValueError as exc:
+                raise serializers.ValidationError(str(exc))
 
         # Conditional logic check
         if field.conditional_logic:
-            # Implement logic to check if the conditions are met
             if not self._check_conditional_logic(field, data):
                 raise serializers.ValidationError("Conditional logic not satisfied.")
 
         # Dependencies check
         if field.dependencies:
-            # Implement logic to ensure dependencies are respected
             if not self._check_dependencies(field, data):
                 raise serializers.ValidationError("Dependency conditions not met.")
 
         return data
+
+    @transaction.atomic
+    def create(self, validated_data):
+        response_data = super().create(validated_data)
+
+        delta = AggregateDelta()
+        delta.add_answer(response_data.response.survey_id, response_data.field_id, response_data.value)
+        delta.apply()
+        respondents.answers_changed(response_data.response.survey_id, response_data.response.email)
+        return response_data
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        previous_response = instance.response
+        delta = AggregateDelta()
+        delta.remove_answer(previous_response.survey_id, instance.field_id, instance.value)
+        response_data = super().update(instance, validated_data)
+        delta.add_answer(response_data.response.survey_id, response_data.field_id, response_data.value)
+        delta.apply()
+        respondents.answers_changed(previous_response.survey_id, previous_response.email)
+        respondents.answers_changed(response_data.response.survey_id, response_data.response.email)
+        return response_data
+
+    def _get_schema(self, field: Field):
+        return get_schema(field.section.survey_id)
+
+    def _user_responses(self, field, data):
+        """Typed answers already recorded for the same response, keyed by field id."""
+        response = data.get("response")
+        if response is None:
+            return {}
+        answers = ResponseData.objects.filter(response=response)
+        if self.instance is not None:
+            answers = answers.exclude(pk=self.instance.pk)
+        return self._get_schema(field).clean_recorded(dict(answers.values_list("field_id", "value")))
+
+    def _check_conditional_logic(self, field, data):
+        engine = visibility.get_engine(field.section.survey_id)
+        try:
+            return engine.check_conditional_logic(field, self._user_responses(field, data))
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def _check_dependencies(self, field, data):
+        engine = visibility.get_engine(field.section.survey_id)
+        try:
+            return engine.check_dependencies(field, self._user_responses(field, data))
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class NumericStatisticsQuerySerializer(serializers.Serializer):
+    """Query parameters of the numeric statistics endpoint."""
+
+    percentiles = serializers.CharField(required=False)
+    bins = serializers.IntegerField(required=False, min_value=1, max_value=1000, default=numeric.DEFAULT_BINS)
+    range_min = serializers.FloatField(required=False)
+    range_max = serializers.FloatField(required=False)
+    segment_field = serializers.IntegerField(required=False)
+    segment_value = serializers.CharField(required=False)
+
+    def validate_percentiles(self, value):
+        try:
+            percentiles = [float(p) for p in value.split(",")]
+        except ValueError:
+            raise serializers.ValidationError("Percentiles must be a comma-separated list of numbers.")
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise serializers.ValidationError("Percentiles must be between 0 and 100.")
+        return percentiles
+
+    def validate(self, data):
+        if ("range_min" in data) != ("range_max" in data):
+            raise serializers.ValidationError("range_min and range_max must be given together.")
+        if "range_min" in data and data["range_min"] >= data["range_max"]:
+            raise serializers.ValidationError("range_min must be lower than range_max.")
+        if ("segment_field" in data) != ("segment_value" in data):
+            raise serializers.ValidationError("segment_field and segment_value must be given together.")
+        return data
+
+
+class SurveyListQuerySerializer(serializers.Serializer):
+    """Query parameters of the survey list: comma-separated survey ``fields`` and the relations to ``expand``.
+
+    ``expand=sections`` lists sections without their fields and ``expand=sections.fields`` lists both, which is
+    the default. Sections are only listed when ``sections`` is among the requested fields.
+    """
+
+    fields = serializers.CharField(required=False)
+    expand = serializers.CharField(required=False, allow_blank=True)
+
+    @staticmethod
+    def _split(value, allowed, label):
+        names = {name.strip() for name in value.split(",")} - {""}
+        unknown = names - set(allowed)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown {label}: {', '.join(sorted(unknown))}. Choose from: {', '.join(allowed)}."
+            )
+        return names
+
+    def validate_fields(self, value):
+        names = self._split(value, SURVEY_LIST_FIELDS, "fields")
+        if not names:
+            raise serializers.ValidationError("Request at least one field.")
+        # In the order of the representation
+        return [name for name in SURVEY_LIST_FIELDS if name in names]
+
+    def validate_expand(self, value):
+        expand = self._split(value, SURVEY_LIST_EXPAND, "relations")
+        if "sections.fields" in expand:
+            expand.add("sections")
+        return expand
+
+    def validate(self, data):
+        data.setdefault("fields", SURVEY_LIST_DEFAULT_FIELDS)
+        data.setdefault("expand", set(SURVEY_LIST_EXPAND))
+        return data
+
+
+class CrosstabQuerySerializer(serializers.Serializer):
+    """Query parameters of the cross-tabulation endpoint."""
+
+    row_field = serializers.IntegerField()
+    column_field = serializers.IntegerField()
+    completed = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        if data["row_field"] == data["column_field"]:
+            raise serializers.ValidationError("row_field and column_field must be different fields.")
+        return data
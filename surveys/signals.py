@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import document_cache, partitioning
+from .models import Field, Section, Survey
+
+
+def _field_survey_id(field: Field):
+    if Field.section.is_cached(field):
+        return field.section.survey_id
+    return Section.objects.filter(pk=field.section_id).values_list("survey_id", flat=True).first()
+
+
+def _is_bulk_delete(model, origin):
+    """Whether a delete signal comes from a cascade or a queryset ``delete()`` rather than ``instance.delete()``.
+
+    The parent's own signal covers cascades, and bulk writers such as ``writers.sync_sections`` invalidate
+    explicitly, which avoids one lookup per deleted row.
+    """
+    return origin is not None and not isinstance(origin, model)
+
+
+@receiver([post_save, post_delete], sender=Survey)
+def survey_changed(sender, instance: Survey, **kwargs):
+    document_cache.survey_changed(instance.pk)
+
+
+@receiver(post_save, sender=Survey)
+def survey_created(sender, instance: Survey, created, raw=False, **kwargs):
+    if created and not raw:
+        # In the creating transaction: the default partitions reject the survey's rows, so a survey whose
+        # partitions cannot be created must not be created either
+        partitioning.create_partitions(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Section)
+def section_changed(sender, instance: Section, origin=None, **kwargs):
+    if _is_bulk_delete(Section, origin):
+        return
+    document_cache.survey_changed(instance.survey_id)
+
+
+@receiver([post_save, post_delete], sender=Field)
+def field_changed(sender, instance: Field, origin=None, **kwargs):
+    if _is_bulk_delete(Field, origin):
+        return
+    document_cache.survey_changed(_field_survey_id(instance))
@@ -0,0 +1,16 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import DatabaseError
+from . import ingestion
+
+
+@shared_task(autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=5)
+def drain_submissions(batch_size=None):
+    """Write queued submissions to the database. Failed batches are requeued before the task is retried."""
+    return ingestion.drain(batch_size)
+
+
+@shared_task
+def recover_submissions():
+    """Requeue batches abandoned by workers that stopped before acknowledging them."""
+    return ingestion.get_queue().recover(settings.SURVEY_INGESTION_VISIBILITY_TIMEOUT)
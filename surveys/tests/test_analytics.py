@@ -0,0 +1,227 @@
+import io
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from surveys.analytics import aggregates
+from surveys.models import Survey, Section, Field, Response, ResponseData
+
+
+class SurveyAnalyticsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="analyst", password="testpassword")
+        cls.survey = Survey.objects.create(title="Analytics Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.score = Field.objects.create(section=section, label="Score", field_type="number", order=1)
+        cls.topics = Field.objects.create(
+            section=section, label="Topics", field_type="checkbox", order=2, choices=["price", "support"]
+        )
+        cls.comment = Field.objects.create(section=section, label="Comment", field_type="text", order=3)
+        cls.analytics_url = reverse("survey-analytics", kwargs={"pk": cls.survey.id})
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def submit(self, score, topics, completed=True):
+        data = {
+            "survey": self.survey.id,
+            "completed": completed,
+            "response_data": [
+                {"field": self.score.id, "value": score},
+                {"field": self.topics.id, "value": topics},
+                {"field": self.comment.id, "value": "Free text"},
+            ],
+        }
+        response = self.client.post(reverse("response-list-create"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, msg=response.content)
+        return response.json()["id"]
+
+    def report(self):
+        response = self.client.get(self.analytics_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_aggregates_are_maintained_on_submission(self):
+        """Test that submissions update the counters, choice counts and numeric stats."""
+        self.submit("9", '["price", "support"]')
+        self.submit("4", '["price"]', completed=False)
+
+        report = self.report()
+        self.assertEqual((report["submitted"], report["completed"]), (2, 1))
+        score, topics, comment = report["fields"]
+        self.assertEqual(score["numeric"], {"count": 2, "sum": 13.0, "mean": 6.5, "min": 4.0, "max": 9.0})
+        self.assertEqual(topics["choices"], {"price": 2, "support": 1})
+        self.assertNotIn("choices", comment)
+
+    def test_schema_is_resolved_once_per_submission(self):
+        """Test that the aggregates resolve the survey's schema once rather than once per answer."""
+        with mock.patch("surveys.analytics.aggregates.get_schema", wraps=aggregates.get_schema) as get_schema:
+            self.submit("9", '["price", "support"]')
+        get_schema.assert_called_once_with(self.survey.id)
+
+    def test_aggregates_are_maintained_on_delete(self):
+        """Test that deleting a response retracts its answers and recomputes a removed extreme."""
+        self.submit("9", '["support"]')
+        lowest = self.submit("2", '["price"]')
+
+        response = self.client.delete(reverse("response-detail", kwargs={"pk": lowest}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        report = self.report()
+        self.assertEqual((report["submitted"], report["completed"]), (1, 1))
+        self.assertEqual(report["fields"][0]["numeric"], {"count": 1, "sum": 9.0, "mean": 9.0, "min": 9.0, "max": 9.0})
+        self.assertEqual(report["fields"][1]["choices"], {"support": 1})
+
+    def test_completion_is_maintained_on_update(self):
+        """Test that completing or reopening a response updates the completed counter."""
+        response_id = self.submit("9", '["price"]', completed=False)
+        url = reverse("response-detail", kwargs={"pk": response_id})
+
+        response = self.client.patch(url, {"completed": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+        report = self.report()
+        self.assertEqual((report["submitted"], report["completed"]), (1, 1))
+
+        response = self.client.patch(url, {"completed": False}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+        report = self.report()
+        self.assertEqual((report["submitted"], report["completed"]), (1, 0))
+
+    def test_rebuild_command_matches_incremental_aggregates(self):
+        """Test that rebuilding from scratch gives the same report as incremental maintenance."""
+        self.submit("9", '["price", "support"]')
+        self.submit("4", '["price"]', completed=False)
+        Response.objects.create(survey=self.survey)  # Written behind the aggregates' back
+        expected = self.report()
+        expected["submitted"] += 1
+
+        call_command("rebuild_aggregates", self.survey.id, stdout=io.StringIO())
+        self.assertEqual(self.report(), expected)
+
+    def test_aggregates_are_rebuilt_when_a_field_changes(self):
+        """Test that changing the type or choices of a field rebuilds its aggregates from its answers."""
+        self.submit("9", '["price", "support"]')
+        self.submit("4", '["price"]')
+
+        url = reverse("survey-detail", kwargs={"pk": self.survey.id})
+        survey = self.client.get(url).json()
+        score, topics, comment = survey["sections"][0]["fields"]
+        score.update(field_type="radio", choices=["4", "9"])
+        topics["choices"] = ["price"]
+        comment["field_type"] = "number"
+        response = self.client.put(url, survey, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+
+        score, topics, comment = self.report()["fields"]
+        self.assertEqual(score["choices"], {"4": 1, "9": 1})
+        self.assertNotIn("numeric", score)
+        # Answers that no longer validate are not counted, like "support" or "Free text" as a number
+        self.assertEqual(topics["choices"], {"price": 1})
+        self.assertEqual(comment["numeric"], {"count": 0, "sum": 0.0, "mean": None, "min": None, "max": None})
+
+    def test_analytics_queries_do_not_scan_answers(self):
+        """Test that the report is served from the aggregate tables with a constant number of queries."""
+        for score in range(5):
+            self.submit(str(score), '["price"]')
+
+        with self.assertNumQueries(5):  # Survey, response stats, fields, choice counts and numeric stats
+            self.report()
+
+
+class FieldNumericStatisticsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="analyst", password="testpassword")
+        cls.survey = Survey.objects.create(title="Numeric Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.score = Field.objects.create(section=section, label="Score", field_type="number", order=1)
+        cls.plan = Field.objects.create(section=section, label="Plan", field_type="radio", order=2)
+        for score, plan in [("1", "free"), ("2", "free"), ("3", "pro"), ("4", "pro"), ("10", "pro")]:
+            response = Response.objects.create(survey=cls.survey)
+            ResponseData.objects.create(response=response, field=cls.score, value=score)
+            ResponseData.objects.create(response=response, field=cls.plan, value=plan)
+        cls.url = reverse("survey-field-statistics", kwargs={"pk": cls.survey.id, "field_id": cls.score.id})
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def test_numeric_statistics(self):
+        """Test the summary statistics, percentiles and histogram of a number field."""
+        response = self.client.get(self.url, {"percentiles": "50,100", "bins": 2, "range_min": 0, "range_max": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+
+        data = response.json()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["mean"], 4.0)
+        self.assertAlmostEqual(data["stddev"], 3.5355, places=4)
+        self.assertEqual((data["min"], data["max"]), (1.0, 10.0))
+        self.assertEqual(data["percentiles"], {"50": 3.0, "100": 10.0})
+        self.assertEqual(data["histogram"], {"bin_edges": [0.0, 5.0, 10.0], "counts": [4, 1]})
+
+    def test_numeric_statistics_segment(self):
+        """Test that statistics can be restricted to respondents with a given answer to another field."""
+        response = self.client.get(self.url, {"segment_field": self.plan.id, "segment_value": "pro"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+        self.assertEqual((response.json()["count"], response.json()["mean"]), (3, 17 / 3))
+
+    def test_numeric_statistics_rejects_other_field_types(self):
+        """Test that only number fields can be described."""
+        url = reverse("survey-field-statistics", kwargs={"pk": self.survey.id, "field_id": self.plan.id})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"percentiles": "50,200"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SurveyCrosstabTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="analyst", password="testpassword")
+        cls.survey = Survey.objects.create(title="Crosstab Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.plan = Field.objects.create(
+            section=section, label="Plan", field_type="radio", order=1, choices=["free", "pro"]
+        )
+        cls.topics = Field.objects.create(
+            section=section, label="Topics", field_type="checkbox", order=2, choices=["price", "support"]
+        )
+        cls.comment = Field.objects.create(section=section, label="Comment", field_type="text", order=3)
+        for plan, topics, completed in [
+            ("free", '["price"]', True),
+            ("free", '["price", "support"]', False),
+            ("pro", '["support"]', True),
+        ]:
+            response = Response.objects.create(survey=cls.survey, completed=completed)
+            ResponseData.objects.create(response=response, field=cls.plan, value=plan)
+            ResponseData.objects.create(response=response, field=cls.topics, value=topics)
+        cls.url = reverse("survey-crosstab", kwargs={"pk": cls.survey.id})
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def test_crosstab(self):
+        """Test the counts and percentages between a radio and a checkbox field."""
+        with self.assertNumQueries(2):  # The two fields, then the grouped counts
+            response = self.client.get(self.url, {"row_field": self.plan.id, "column_field": self.topics.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+
+        table = response.json()
+        self.assertEqual((table["rows"], table["columns"]), (["free", "pro"], ["price", "support"]))
+        self.assertEqual(table["counts"], [[2, 1], [0, 1]])
+        self.assertEqual((table["row_totals"], table["column_totals"], table["total"]), ([3, 1], [2, 2], 4))
+        self.assertEqual(table["row_percentages"], [[66.67, 33.33], [0.0, 100.0]])
+        self.assertEqual(table["column_percentages"], [[100.0, 50.0], [0.0, 50.0]])
+
+    def test_crosstab_completed_filter(self):
+        """Test that the table can be restricted to completed responses."""
+        params = {"row_field": self.plan.id, "column_field": self.topics.id, "completed": "true"}
+        self.assertEqual(self.client.get(self.url, params).json()["counts"], [[1, 0], [0, 1]])
+
+    def test_crosstab_rejects_non_choice_fields(self):
+        """Test that both fields must be choice fields of the survey."""
+        response = self.client.get(self.url, {"row_field": self.plan.id, "column_field": self.comment.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("column_field", response.json())
@@ -0,0 +1,95 @@
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from surveys import ingestion
+from surveys.models import Survey, Section, Field, Response, ResponseData
+
+
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="respondent", email="user@example.com", password="testpassword")
+        cls.survey = Survey.objects.create(title="Async Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.rating = Field.objects.create(section=section, label="Rating", field_type="text", order=1)
+        cls.reason = Field.objects.create(
+            section=section,
+            label="Why?",
+            field_type="text",
+            order=2,
+            conditional_logic={"depends_on_field": cls.rating.id, "operator": "==", "value": "bad"},
+        )
+        cls.detail_url = reverse("survey-detail-async", kwargs={"pk": cls.survey.id})
+        cls.submit_url = reverse("response-submit-async")
+
+    def setUp(self):
+        self.auth = {"authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        ingestion.get_queue().clear()
+
+    async def test_detail_matches_sync_view(self):
+        """Test that the async view serves the same document and ETag as the sync view."""
+        response = await self.async_client.get(self.detail_url)
+        sync_response = await self.async_client.get(reverse("survey-detail", kwargs={"pk": self.survey.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), sync_response.json())
+        self.assertEqual(response["ETag"], sync_response["ETag"])
+
+        response = await self.async_client.get(self.detail_url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_detail_applies_respondent_answers(self):
+        """Test that fields hidden by the respondent's answers are left out of the document."""
+        response = await Response.objects.acreate(survey=self.survey, email=self.user.email)
+        await ResponseData.objects.acreate(response=response, field=self.rating, value="good")
+
+        response = await self.async_client.get(self.detail_url, headers=self.auth)
+        field_ids = [field["id"] for field in response.json()["sections"][0]["fields"]]
+        self.assertEqual(field_ids, [self.rating.id])
+
+    async def test_detail_not_found_and_invalid_token(self):
+        """Test that missing surveys return 404 and invalid tokens 401."""
+        response = await self.async_client.get(reverse("survey-detail-async", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.get(self.detail_url, headers={"authorization": "Bearer invalid"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_submit(self):
+        """Test that a valid submission is accepted with 202 and written once drained."""
+        submission_id = str(uuid4())
+        data = {
+            "submission_id": submission_id,
+            "survey": self.survey.id,
+            "response_data": [{"field": self.rating.id, "value": "bad"}, {"field": self.reason.id, "value": "Slow"}],
+        }
+        response = await self.async_client.post(
+            self.submit_url, data, content_type="application/json", headers=self.auth
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, msg=response.content)
+        self.assertEqual(response.json(), {"submission_id": submission_id, "status": "queued"})
+        self.assertEqual(await ResponseData.objects.filter(response__submission_id=submission_id).acount(), 2)
+
+    async def test_submit_rejects_invalid_and_anonymous(self):
+        """Test that submissions are validated and require authentication."""
+        data = {"survey": self.survey.id, "response_data": [{"field": self.reason.id, "value": "Slow"}]}
+        response = await self.async_client.post(
+            self.submit_url, data, content_type="application/json", headers=self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Conditional logic not satisfied.", str(response.json()))
+
+        response = await self.async_client.post(
+            self.submit_url, {"survey": "x"}, content_type="application/json", headers=self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("survey", response.json())
+
+        response = await self.async_client.post(self.submit_url, data, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(await Response.objects.aexists())
@@ -0,0 +1,99 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from surveys.models import Survey, Section, Field, Response, ResponseData, FieldNumericStats
+from surveys.serializers import AnswerUpsertSerializer
+from surveys.validation import get_schema
+
+
+class AutosaveTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="respondent", password="testpassword")
+        cls.survey = Survey.objects.create(title="Autosave Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.score = Field.objects.create(section=section, label="Score", field_type="number", order=1)
+        cls.praise = Field.objects.create(
+            section=section,
+            label="What did you like?",
+            field_type="text",
+            order=2,
+            conditional_logic={"depends_on_field": cls.score.id, "operator": ">=", "value": 8},
+        )
+        cls.complaint = Field.objects.create(
+            section=section,
+            label="What went wrong?",
+            field_type="text",
+            order=3,
+            dependencies={"depends_on_field": cls.score.id, "operator": "in", "values": [1, 2, 3]},
+        )
+        cls.comment = Field.objects.create(section=section, label="Comment", field_type="text", order=4)
+        cls.response = Response.objects.create(survey=cls.survey)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def save(self, field, value):
+        url = reverse("response-answer", kwargs={"pk": self.response.id, "field_id": field.id})
+        return self.client.put(url, {"value": value}, format="json")
+
+    def test_reverse_dependency_index(self):
+        """Test that the schema indexes fields by the answers their rules read."""
+        dependents = get_schema(self.survey.id).dependents
+        self.assertEqual({field.id for field in dependents[self.score.id]}, {self.praise.id, self.complaint.id})
+        self.assertNotIn(self.comment.id, dependents)
+
+    def test_upsert_returns_visibility_delta(self):
+        """Test that saving an answer creates then replaces it and reports only the changed dependents."""
+        response = self.save(self.score, "9")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, msg=response.content)
+        self.assertEqual(response.json()["shown"], [self.praise.id])
+        self.assertEqual(response.json()["hidden"], [])
+
+        response = self.save(self.score, "2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["shown"], [self.complaint.id])
+        self.assertEqual(response.json()["hidden"], [self.praise.id])
+
+        answer = ResponseData.objects.get(response=self.response, field=self.score)
+        self.assertEqual((answer.value, answer.value_number), ("2", 2))
+        self.assertEqual(FieldNumericStats.objects.get(field=self.score).count, 1)
+
+    def test_concurrent_first_saves_replace_each_other(self):
+        """Test that an autosave racing another first save of the field replaces its answer."""
+        context = {"response": self.response, "field_id": self.score.id}
+        first = AnswerUpsertSerializer(data={"value": "9"}, context=context)
+        second = AnswerUpsertSerializer(data={"value": "2"}, context=context)
+        self.assertTrue(first.is_valid(), msg=first.errors)
+        self.assertTrue(second.is_valid(), msg=second.errors)
+
+        self.assertTrue(first.save()["created"])
+        self.assertFalse(second.save()["created"])
+        answer = ResponseData.objects.get(response=self.response, field=self.score)
+        self.assertEqual((answer.value, answer.value_number), ("2", 2))
+        self.assertEqual(FieldNumericStats.objects.get(field=self.score).count, 1)
+
+    def test_unrelated_answer_has_empty_delta(self):
+        """Test that an answer no rule depends on reports no visibility change."""
+        response = self.save(self.comment, "Nice")
+        self.assertEqual(
+            response.json(), {"field": self.comment.id, "value": "Nice", "created": True, "shown": [], "hidden": []}
+        )
+
+    def test_rejects_invalid_and_hidden_answers(self):
+        """Test that malformed values, hidden fields and foreign fields are rejected."""
+        self.assertEqual(self.save(self.score, "abc").status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.save(self.praise, "Everything")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Conditional logic not satisfied.", str(response.json()))
+
+        other = Field.objects.create(
+            section=Section.objects.create(survey=Survey.objects.create(title="Other"), title="S", order=1),
+            label="Other",
+            field_type="text",
+            order=1,
+        )
+        self.assertEqual(self.save(other, "x").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ResponseData.objects.exists())
@@ -0,0 +1,104 @@
+from django.test import TestCase
+from surveys.dependency_graph import RuleGraph
+from surveys.models import Survey, Field
+from surveys.serializers import SurveySerializer
+from surveys.validation import get_schema
+
+
+def rule(depends_on_field):
+    return {"depends_on_field": depends_on_field, "operator": "==", "value": "yes"}
+
+
+class RuleGraphTest(TestCase):
+
+    def test_order_and_closure(self):
+        """Test that fields come after their dependencies and closures are transitive."""
+        graph = RuleGraph({3: [2], 1: [], 2: [1], 4: [1, 3]})
+        self.assertEqual(graph.errors(), [])
+        self.assertEqual(graph.order(), [1, 2, 3, 4])
+        self.assertEqual(graph.closure(), {1: [], 2: [1], 3: [1, 2], 4: [1, 2, 3]})
+
+    def test_cycles_are_reported(self):
+        """Test that cycles, including a field depending on itself, are reported with their path."""
+        errors = RuleGraph({1: [3], 2: [1], 3: [2]}).errors()
+        self.assertEqual(errors, ["Rules form a dependency cycle: 1 -> 3 -> 2 -> 1."])
+        self.assertEqual(RuleGraph({1: [1]}).find_cycle(), [1, 1])
+
+    def test_dangling_references_are_reported(self):
+        """Test that rules pointing outside the survey or without a target are reported."""
+        graph = RuleGraph({1: [7], 2: [None]}, {1: "Score"})
+        self.assertEqual(
+            graph.errors(),
+            [
+                "Field 1 ('Score') depends on field 7, which is not in this survey.",
+                "Field 2 has a rule without depends_on_field.",
+            ],
+        )
+
+
+class SurveyRuleGraphTest(TestCase):
+
+    def survey_data(self, fields):
+        return {"title": "Rules", "sections": [{"title": "Section", "order": 1, "fields": fields}]}
+
+    def field_data(self, provisional_id, order, **rules):
+        return {"id": provisional_id, "label": f"Field {order}", "field_type": "text", "order": order, **rules}
+
+    def test_create_remaps_provisional_ids(self):
+        """Test that rules on create reference provisional ids, rewritten to the created fields."""
+        fields = [
+            self.field_data(-2, 1, dependencies={"depends_on_field": -1, "operator": "in", "values": ["a"]}),
+            self.field_data(-1, 2),
+            self.field_data(-3, 3, conditional_logic=rule(-2)),
+        ]
+        serializer = SurveySerializer(data=self.survey_data(fields))
+        self.assertTrue(serializer.is_valid(), msg=serializer.errors)
+        survey = serializer.save()
+
+        first, second, third = Field.objects.filter(section__survey=survey).order_by("order")
+        self.assertEqual(first.dependencies["depends_on_field"], second.id)
+        self.assertEqual(third.conditional_logic["depends_on_field"], first.id)
+
+        survey.refresh_from_db()
+        self.assertEqual(survey.rule_graph["order"], [second.id, first.id, third.id])
+        self.assertEqual(set(survey.rule_graph), {"order"})
+        self.assertEqual(list(get_schema(survey.id).validators), [second.id, first.id, third.id])
+
+    def test_rejects_dangling_and_cyclic_rules(self):
+        """Test that surveys whose rules reference unknown fields or form cycles are rejected."""
+        serializer = SurveySerializer(data=self.survey_data([self.field_data(1, 1, conditional_logic=rule(99))]))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("depends on field 99, which is not in this survey.", str(serializer.errors["sections"]))
+
+        fields = [self.field_data(1, 1, conditional_logic=rule(2)), self.field_data(2, 2, conditional_logic=rule(1))]
+        serializer = SurveySerializer(data=self.survey_data(fields))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("dependency cycle", str(serializer.errors["sections"]))
+        self.assertFalse(Survey.objects.exists())
+
+    def test_rejects_unsupported_operators(self):
+        """Test that rules with operators the visibility engine does not support are rejected."""
+        fields = [
+            self.field_data(1, 1),
+            self.field_data(2, 2, conditional_logic={"depends_on_field": 1, "operator": "matches", "value": "a"}),
+            self.field_data(3, 3, dependencies={"depends_on_field": 1, "operator": "equals", "values": ["a"]}),
+        ]
+        serializer = SurveySerializer(data=self.survey_data(fields))
+        self.assertFalse(serializer.is_valid())
+        field_errors = serializer.errors["sections"][0]["fields"]
+        self.assertEqual(field_errors[1]["conditional_logic"], ["Unsupported operator: matches"])
+        self.assertEqual(field_errors[2]["dependencies"], ["Unsupported operator: equals"])
+
+    def test_update_rejects_removing_a_referenced_field(self):
+        """Test that an update cannot remove a field that remaining rules depend on."""
+        serializer = SurveySerializer(
+            data=self.survey_data([self.field_data(1, 1), self.field_data(2, 2, conditional_logic=rule(1))])
+        )
+        self.assertTrue(serializer.is_valid(), msg=serializer.errors)
+        survey = serializer.save()
+        first, second = Field.objects.filter(section__survey=survey).order_by("order")
+
+        data = self.survey_data([{**self.field_data(second.id, 2), "conditional_logic": rule(first.id)}])
+        serializer = SurveySerializer(survey, data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn(f"depends on field {first.id}", str(serializer.errors["sections"]))
@@ -0,0 +1,83 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from surveys import documents
+from surveys.models import Survey, Section, Field, Response, ResponseData, SurveyDocument
+from surveys.serializers import SurveySerializer
+
+
+class SurveyDocumentTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="respondent", email="user@example.com", password="testpassword")
+        cls.survey = Survey.objects.create(title="Stored Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.rating = Field.objects.create(section=section, label="Rating", field_type="text", order=1)
+        cls.reason = Field.objects.create(
+            section=section,
+            label="Why?",
+            field_type="text",
+            order=2,
+            conditional_logic={"depends_on_field": cls.rating.id, "operator": "==", "value": "bad"},
+        )
+        cls.detail_url = reverse("survey-detail", kwargs={"pk": cls.survey.id})
+
+    def setUp(self):
+        cache.clear()  # Answers below are written with the ORM, which does not invalidate
+
+    def field_ids(self, document):
+        return [field["id"] for section in document["sections"] for field in section["fields"]]
+
+    def test_anonymous_reads_serve_the_stored_document(self):
+        """Test that anonymous reads serve the stored bytes, rendered like the serializer would."""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        stored = SurveyDocument.objects.get(survey=self.survey)
+        self.assertEqual(response.content, bytes(stored.anonymous))
+        self.assertEqual(response.json(), json.loads(json.dumps(SurveySerializer(self.survey).data)))
+        self.assertEqual(self.field_ids(response.json()), [self.rating.id])
+        self.assertEqual(self.field_ids(json.loads(bytes(stored.full))), [self.rating.id, self.reason.id])
+
+    def test_respondents_get_the_fields_visible_for_their_answers(self):
+        """Test that the full document is filtered by the answers of a logged-in respondent."""
+        response = Response.objects.create(survey=self.survey, email=self.user.email)
+        ResponseData.objects.create(response=response, field=self.rating, value="bad")
+
+        self.client.force_authenticate(user=self.user)
+        document = self.client.get(self.detail_url).json()
+        self.assertEqual(self.field_ids(document), [self.rating.id, self.reason.id])
+        missing = self.client.get(reverse("survey-detail", kwargs={"pk": 0}))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_survey_update_rebuilds_the_document_once(self):
+        """Test that the invalidations of one survey write queue a single rebuild of its document."""
+        documents.rebuild(self.survey.id)
+        self.client.force_authenticate(user=self.user)
+        data = SurveySerializer(self.survey).data
+        data["sections"][0]["fields"][0]["label"] = "Score"
+        with mock.patch.object(documents, "build", wraps=documents.build) as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.put(self.detail_url, {**data, "title": "Renamed Survey"}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+        self.assertEqual(build.call_count, 1)
+
+    def test_writes_rebuild_the_document(self):
+        """Test that a survey write drops the stored document and rebuilds it once the transaction commits."""
+        documents.rebuild(self.survey.id)
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(self.detail_url, {"title": "Renamed Survey"}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(SurveyDocument.objects.filter(survey=self.survey).exists())
+
+        stored = SurveyDocument.objects.get(survey=self.survey)
+        self.assertEqual(json.loads(bytes(stored.anonymous))["title"], "Renamed Survey")
+        with self.assertNumQueries(1):
+            self.assertEqual(documents.render(self.survey.id, {}), bytes(stored.anonymous))
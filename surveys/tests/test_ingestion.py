@@ -0,0 +1,173 @@
+from unittest import mock
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, OperationalError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from surveys import ingestion, tasks
+from surveys.models import Survey, Section, Field, Response, ResponseData, SurveyResponseStats
+
+
+class SubmissionIngestionTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="respondent", password="testpassword")
+        cls.survey = Survey.objects.create(title="Ingestion Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.score = Field.objects.create(section=section, label="Score", field_type="number", order=1, required=True)
+        cls.comment = Field.objects.create(section=section, label="Comment", field_type="text", order=2)
+        cls.url = reverse("response-submit")
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        self.queue = ingestion.get_queue()
+        self.queue.clear()
+
+    def message(self, score="7", submission_id=None):
+        return {
+            "submission_id": submission_id or str(uuid4()),
+            "survey": self.survey.id,
+            "email": "user@example.com",
+            "completed": True,
+            "response_data": [{"field": self.score.id, "value": score}, {"field": self.comment.id, "value": "Fine"}],
+        }
+
+    def test_submit_is_accepted_and_written(self):
+        """Test that a submission is accepted with 202 and written with its typed answers and aggregates."""
+        data = self.message()
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED, msg=response.content)
+        self.assertEqual(response.json(), {"submission_id": data["submission_id"], "status": "queued"})
+        written = Response.objects.get(submission_id=data["submission_id"])
+        self.assertTrue(written.completed)
+        answer = ResponseData.objects.get(response=written, field=self.score)
+        self.assertEqual((answer.value_number, answer.survey_id), (7, self.survey.id))
+        self.assertEqual(SurveyResponseStats.objects.get(survey=self.survey).completed, 1)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_submit_validates_before_queueing(self):
+        """Test that invalid submissions are rejected without being queued."""
+        response = self.client.post(self.url, self.message(score="abc"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("not a valid number", str(response.json()["response_data"]))
+
+        data = self.message()
+        data["response_data"] = data["response_data"][1:]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f"Field {self.score.id} is required.", str(response.json()))
+
+        response = self.client.post(self.url, {**self.message(), "survey": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Response.objects.exists())
+
+    def test_write_batch_is_idempotent(self):
+        """Test that submissions already written, or repeated in a batch, are skipped on retry."""
+        first, second = self.message(), self.message(score="3")
+        self.assertEqual(ingestion.write_batch([first, first]), 1)
+        self.assertEqual(ingestion.write_batch([first, second]), 1)
+
+        self.assertEqual(Response.objects.count(), 2)
+        self.assertEqual(ResponseData.objects.count(), 4)
+        self.assertEqual(SurveyResponseStats.objects.get(survey=self.survey).submitted, 2)
+
+    def test_batch_is_written_with_constant_queries(self):
+        """Test that the number of queries of a batch does not grow with its size."""
+        ingestion.write_batch([self.message()])  # Warm the schema and create the aggregate rows
+        with self.assertNumQueries(10):
+            ingestion.write_batch([self.message() for _ in range(3)])
+        with self.assertNumQueries(10):
+            ingestion.write_batch([self.message() for _ in range(30)])
+
+    def test_failed_batch_is_requeued(self):
+        """Test that a batch that fails to write goes back on the queue and is written by the next drain."""
+        self.queue.push(self.message())
+        with mock.patch.object(ResponseData.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                ingestion.drain()
+
+        self.assertEqual(len(self.queue), 1)
+        self.assertFalse(Response.objects.exists())
+        self.assertEqual(ingestion.drain(), 1)
+        self.assertEqual(Response.objects.count(), 1)
+
+    @override_settings(SURVEY_INGESTION_MAX_ATTEMPTS=2)
+    def test_failing_batch_is_dead_lettered(self):
+        """Test that a batch failing SURVEY_INGESTION_MAX_ATTEMPTS times is set aside and the queue drained on."""
+        poison = self.message()
+        self.queue.push(poison)
+        self.queue.push(self.message())
+        write_batch = ingestion.write_batch
+
+        def fail_on_poison(messages):
+            if any(message["submission_id"] == poison["submission_id"] for message in messages):
+                raise ValueError("Unwritable submission")
+            return write_batch(messages)
+
+        with mock.patch.object(ingestion, "write_batch", side_effect=fail_on_poison), self.assertLogs(ingestion.logger):
+            with self.assertRaises(ValueError):
+                ingestion.drain(batch_size=1)
+            self.assertEqual(len(self.queue), 2)
+            self.assertEqual(ingestion.drain(batch_size=1), 1)
+
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(Response.objects.count(), 1)
+        [dead] = self.queue.dead_letters()
+        self.assertEqual((dead["submission_id"], dead["attempts"]), (poison["submission_id"], 2))
+
+    @override_settings(SURVEY_INGESTION_MAX_ATTEMPTS=2)
+    def test_unavailable_database_does_not_count_attempts(self):
+        """Test that a batch failing on an unavailable database is kept whole, however often it fails."""
+        self.queue.push(self.message())
+        with mock.patch.object(ingestion, "write_batch", side_effect=OperationalError):
+            for _ in range(3):
+                with self.assertRaises(OperationalError):
+                    ingestion.drain()
+
+        self.assertEqual(self.queue.dead_letters(), [])
+        self.assertNotIn("attempts", self.queue.pop_batch(10).messages[0])
+
+    @override_settings(SURVEY_INGESTION_MAX_ATTEMPTS=1)
+    def test_only_failing_submissions_are_dead_lettered(self):
+        """Test that the submissions of a failed batch are written separately and only the failing ones set aside."""
+        poison, valid = self.message(), self.message()
+        self.queue.push(valid)
+        self.queue.push(poison)
+        write_batch = ingestion.write_batch
+
+        def fail_on_poison(messages):
+            if any(message["submission_id"] == poison["submission_id"] for message in messages):
+                raise ValueError("Unwritable submission")
+            return write_batch(messages)
+
+        with mock.patch.object(ingestion, "write_batch", side_effect=fail_on_poison), self.assertLogs(ingestion.logger):
+            self.assertEqual(ingestion.drain(), 1)
+
+        self.assertTrue(Response.objects.filter(submission_id=valid["submission_id"]).exists())
+        self.assertEqual([dead["submission_id"] for dead in self.queue.dead_letters()], [poison["submission_id"]])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_drain_task(self):
+        """Test that the Celery task drains the queue (inline, as no broker is configured)."""
+        self.queue.push(self.message())
+        self.queue.push(self.message())
+        self.assertEqual(tasks.drain_submissions.delay(batch_size=1).get(), 2)
+
+    def test_recover_stale_batches(self):
+        """Test that batches popped but never acknowledged are requeued after the visibility timeout."""
+        self.queue.push(self.message())
+        self.queue.pop_batch(10)
+        self.assertEqual(len(self.queue), 0)
+
+        self.assertEqual(self.queue.recover(timeout=60), 0)
+        self.assertEqual(self.queue.recover(timeout=-1), 1)
+        self.assertEqual(len(self.queue), 1)
+
+    def test_deleted_survey_is_dropped(self):
+        """Test that submissions to a survey deleted after queueing are dropped instead of failing the batch."""
+        message = {**self.message(), "survey": 0}
+        self.assertEqual(ingestion.write_batch([message, self.message()]), 1)
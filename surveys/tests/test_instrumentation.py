@@ -0,0 +1,94 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from surveys.models import Survey, Section, Field
+
+
+class InstrumentationTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="adminpassword")
+        cls.survey = Survey.objects.create(title="Measured Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        Field.objects.create(section=section, label="Name", field_type="text", order=1)
+        cls.detail_url = reverse("survey-detail", kwargs={"pk": cls.survey.id})
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def timings(self, response):
+        """The ``Server-Timing`` entries of ``response``, by name."""
+        entries = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            entries[name] = dict(param.split("=", 1) for param in params)
+        return entries
+
+    def test_server_timing_reports_database_and_serialization(self):
+        """Test that the Server-Timing header counts the request's queries and times its rendering."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("survey-list-create"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        timings = self.timings(response)
+        self.assertEqual(timings["db"]["desc"], f'"{len(queries)} queries"')
+        self.assertGreater(float(timings["serialize"]["dur"]), 0)
+        self.assertGreaterEqual(float(timings["total"]["dur"]), float(timings["db"]["dur"]))
+
+    def test_cache_lookups_are_reported(self):
+        """Test that a cold and a warm read of a survey report a miss and a hit of the document cache."""
+        cold = self.timings(self.client.get(self.detail_url))
+        warm = self.timings(self.client.get(self.detail_url))
+        self.assertEqual(cold["cache-document"]["desc"], '"0 hits / 1 misses"')
+        self.assertEqual(warm["cache-document"]["desc"], '"1 hits / 0 misses"')
+
+    def test_requests_are_logged_as_json(self):
+        """Test that every request logs one JSON line labelled with its route."""
+        with self.assertLogs("survey_platform.requests", "INFO") as logs:
+            self.client.get(self.detail_url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["route"], "/api/surveys/<int:pk>/")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["cache"]["document"], {"hits": 0, "misses": 1})
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_metrics_endpoint(self):
+        """Test that /metrics serves per-route histograms to allowed clients with the token only."""
+        self.client.get(self.detail_url)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+        text = response.content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        labels = 'route="/api/surveys/<int:pk>/",method="GET"'
+        self.assertRegex(text, re.escape(f"http_request_queries_count{{{labels}}} ") + r"[1-9]")
+        self.assertRegex(text, re.escape(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} ') + r"[1-9]")
+        self.assertIn('http_request_cache_lookups_total{cache="document",result="miss"}', text)
+
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong-token")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-token", REMOTE_ADDR="203.0.113.7"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_endpoint_is_disabled_without_token(self):
+        """Test that /metrics does not exist unless METRICS_TOKEN is set."""
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_views_are_measured(self):
+        """Test that queries run by async views in worker threads are counted."""
+        response = await self.async_client.get(reverse("survey-detail-async", kwargs={"pk": self.survey.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(self.timings(response)["db"]["desc"], '"0 queries"')
@@ -1,3 +1,6 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from surveys.models import Survey, Section, Field, Response, ResponseData
 
@@ -68,6 +71,59 @@ class ResponseModelTest(TestCase):
         )
         response_data = ResponseData.objects.create(response=self.response, field=field, value="Very Satisfied")
         self.assertEqual(response_data.response, self.response)
+        self.assertEqual(response_data.survey, self.survey)
         self.assertEqual(str(response_data), "Response to How satisfied are you with our service?: Very Satisfied")
         self.assertEqual(response_data.field, field)
         self.assertEqual(response_data.value, "Very Satisfied")
+
+
+class ResponseDataTypedValuesTest(TestCase):
+
+    def setUp(self):
+        self.survey = Survey.objects.create(title="Typed Survey")
+        self.section = Section.objects.create(survey=self.survey, title="Section", order=1)
+        self.response = Response.objects.create(survey=self.survey)
+
+    def answer(self, field_type, value):
+        field = Field.objects.create(section=self.section, label=field_type, field_type=field_type, order=1)
+        response_data = ResponseData.objects.create(response=self.response, field=field, value=value)
+        response_data.refresh_from_db()
+        return response_data
+
+    def test_typed_values_are_populated_on_save(self):
+        """Test that numeric, date and checkbox answers get typed copies of their value."""
+        self.assertEqual(self.answer("number", "8.5").value_number, 8.5)
+        self.assertEqual(self.answer("date", "2024-05-01").value_date, date(2024, 5, 1))
+        self.assertEqual(self.answer("checkbox", '["a", "b"]').value_json, ["a", "b"])
+
+        text = self.answer("text", "42")
+        self.assertEqual((text.value_number, text.value_date, text.value_json), (None, None, None))
+
+    def test_invalid_values_leave_typed_columns_empty(self):
+        """Test that answers that cannot be coerced are stored without typed values."""
+        self.assertIsNone(self.answer("number", "eight").value_number)
+        self.assertIsNone(self.answer("date", "yesterday").value_date)
+
+    def test_typed_values_follow_value_updates(self):
+        """Test that updating the value also updates its typed copy."""
+        response_data = self.answer("number", "3")
+        response_data.value = "7"
+        response_data.save(update_fields=["value"])
+        response_data.refresh_from_db()
+        self.assertEqual(response_data.value_number, 7.0)
+
+    def test_range_query_on_typed_column(self):
+        """Test that numeric answers can be range-filtered in the database."""
+        field = Field.objects.create(section=self.section, label="Score", field_type="number", order=2)
+        for value in ["2", "8", "10"]:
+            response = Response.objects.create(survey=self.response.survey)
+            ResponseData.objects.create(response=response, field=field, value=value)
+        high = ResponseData.objects.filter(field=field, value_number__gte=8).values_list("value", flat=True)
+        self.assertEqual(sorted(high), ["10", "8"])
+
+    def test_one_answer_per_response_and_field(self):
+        """Test that a response cannot answer the same field twice."""
+        field = Field.objects.create(section=self.section, label="Name", field_type="text", order=2)
+        ResponseData.objects.create(response=self.response, field=field, value="Ada")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ResponseData.objects.create(response=self.response, field=field, value="Grace")
@@ -0,0 +1,139 @@
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from surveys import partitioning
+from surveys.models import Survey, Section, Field, Response, ResponseData
+from surveys.serializers import ResponseSerializer
+
+
+class ResponseDataSurveyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.survey = Survey.objects.create(title="Survey")
+        cls.other_survey = Survey.objects.create(title="Other Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.field = Field.objects.create(section=section, label="Name", field_type="text", order=1)
+
+    def test_nested_answers_carry_the_survey(self):
+        """Test that answers written with their response carry its survey, also when the response moves."""
+        serializer = ResponseSerializer(
+            data={"survey": self.survey.pk, "response_data": [{"field": self.field.pk, "value": "Ada"}]}
+        )
+        self.assertTrue(serializer.is_valid(), msg=serializer.errors)
+        response = serializer.save()
+        self.assertEqual(list(response.response_data.values_list("survey_id", flat=True)), [self.survey.pk])
+
+        serializer = ResponseSerializer(response, data={"survey": self.other_survey.pk}, partial=True)
+        self.assertTrue(serializer.is_valid(), msg=serializer.errors)
+        serializer.save()
+        self.assertEqual(list(response.response_data.values_list("survey_id", flat=True)), [self.other_survey.pk])
+
+    def test_saved_answer_follows_its_response(self):
+        """Test that saving an answer takes the survey of its response."""
+        response = Response.objects.create(survey=self.survey)
+        answer = ResponseData(response_id=response.pk, field=self.field, value="Ada")
+        answer.save()
+        self.assertEqual(answer.survey_id, self.survey.pk)
+
+
+    def test_answers_are_filtered_by_their_survey(self):
+        """Test that filtering answers by survey filters on their own survey column rather than their response's."""
+        answers = {}
+        for survey in (self.survey, self.other_survey):
+            response = Response.objects.create(survey=survey)
+            answers[survey.pk] = ResponseData.objects.create(response=response, field=self.field, value="Ada").pk
+
+        self.client.force_login(User.objects.create_user(username="testuser", password="password"))
+        url = reverse("response-data-list-create")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"survey": self.other_survey.pk})
+        self.assertEqual([item["id"] for item in response.json()["results"]], [answers[self.other_survey.pk]])
+        self.assertIn('WHERE "surveys_responsedata"."survey_id" = ', queries[-1]["sql"])
+
+class PartitioningFallbackTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="password")
+        cls.survey = Survey.objects.create(title="Finished Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.field = Field.objects.create(section=section, label="Name", field_type="text", order=1)
+        for email in ["a@example.com", "b@example.com"]:
+            response = Response.objects.create(survey=cls.survey, email=email)
+            ResponseData.objects.create(response=response, field=cls.field, value="Ada")
+
+    def test_partition_operations_are_noops(self):
+        """Test that the partition operations do nothing on unpartitioned tables."""
+        self.assertFalse(partitioning.is_partitioned())
+        self.assertFalse(partitioning.create_partitions(self.survey.pk))
+        self.assertFalse(partitioning.attach(self.survey.pk))
+        self.assertFalse(partitioning.detach(self.survey.pk, drop=True))
+        self.assertEqual(partitioning.partitions(), [])
+        self.assertEqual(ResponseData.objects.count(), 2)
+
+    def test_survey_delete_removes_its_responses(self):
+        """Test that deleting a survey deletes its responses and answers without partitions."""
+        other = Survey.objects.create(title="Running Survey")
+        section = Section.objects.create(survey=other, title="Section", order=1)
+        field = Field.objects.create(section=section, label="Name", field_type="text", order=1)
+        ResponseData.objects.create(response=Response.objects.create(survey=other), field=field, value="Grace")
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.delete(reverse("survey-detail", kwargs={"pk": self.survey.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Response.objects.filter(survey_id=self.survey.pk).exists())
+        self.assertEqual(list(ResponseData.objects.values_list("value", flat=True)), ["Grace"])
+
+    def test_failed_partitions_roll_back_the_survey(self):
+        """Test that a survey whose partitions cannot be created is not created."""
+        self.client.force_authenticate(user=self.user)
+        with mock.patch.object(partitioning, "create_partitions", side_effect=DatabaseError("Lock timeout")):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse("survey-list-create"), {"title": "New Survey", "sections": []}, format="json")
+        self.assertFalse(Survey.objects.filter(title="New Survey").exists())
+
+    def test_management_command_requires_postgresql(self):
+        """Test that the response_partitions command refuses to run on other databases."""
+        with self.assertRaisesMessage(CommandError, "requires PostgreSQL"):
+            call_command("response_partitions", "status", stdout=StringIO())
+
+
+@skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL")
+class PartitionedTablesTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="testuser", password="password")
+        cls.old_survey = Survey.objects.create(title="Old Survey")
+        partitioning.convert()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def create_survey(self, title):
+        return self.client.post(reverse("survey-list-create"), {"title": title, "sections": []}, format="json")
+
+    def test_new_survey_is_created_with_its_partitions(self):
+        """Test that a survey created on partitioned tables has partitions and accepts responses right away."""
+        response = self.create_survey("New Survey")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, msg=response.content)
+        survey_id = response.json()["id"]
+
+        partitions = {partition for _, partition, _, _, _ in partitioning.partitions()}
+        expected = {partitioning.partition_name(model, survey_id) for model in partitioning.MODELS}
+        self.assertLessEqual(expected, partitions)
+        Response.objects.create(survey_id=survey_id)
+        Response.objects.create(survey=self.old_survey)
+
+    def test_failed_partitions_roll_back_the_survey(self):
+        """Test that a survey is not created when attaching its partitions fails."""
+        with mock.patch.object(partitioning, "_attach_partition", side_effect=DatabaseError("Lock timeout")):
+            with self.assertRaises(DatabaseError):
+                self.create_survey("New Survey")
+        self.assertFalse(Survey.objects.filter(title="New Survey").exists())
@@ -0,0 +1,92 @@
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from survey_platform import profiling
+from surveys.models import Survey, Section, Field
+
+
+class ProfilingTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username="staff", password="password", is_staff=True)
+        cls.respondent = User.objects.create_user(username="respondent", password="password")
+        cls.survey = Survey.objects.create(title="Slow Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        Field.objects.create(section=section, label="Name", field_type="text", order=1)
+        cls.list_url = reverse("survey-list-create")
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILING_DIR=directory.name, PROFILING_MAX_FILES=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+    def test_signed_token_profiles_the_request(self):
+        """Test that a signed token profiles the request, down to the serializers, and describes it."""
+        response = self.client.get(self.list_url, HTTP_X_PROFILE_TOKEN=profiling.issue_token())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = profiling.load(response["X-Profile-Id"])
+        self.assertTrue(any(function == "to_representation" for _, _, function in stats.stats))
+
+        [description] = profiling.stored_profiles()
+        self.assertEqual(description["id"], response["X-Profile-Id"])
+        self.assertEqual(description["trigger"], "token")
+        self.assertEqual(description["route"], "/api/surveys/")
+        self.assertIsNone(description["user_id"])
+        self.assertGreater(description["queries"], 0)
+
+        self.assertNotIn("X-Profile-Id", self.client.get(self.list_url))
+        self.assertNotIn("X-Profile-Id", self.client.get(self.list_url, HTTP_X_PROFILE_TOKEN="forged"))
+
+    def test_query_parameter_is_staff_only(self):
+        """Test that the profile query parameter profiles staff requests only."""
+        self.authenticate(self.respondent)
+        self.assertNotIn("X-Profile-Id", self.client.get(self.list_url, {"profile": ""}))
+
+        self.authenticate(self.staff)
+        url = reverse("survey-detail", kwargs={"pk": self.survey.id})
+        response = self.client.get(url, {"profile": ""})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [description] = profiling.stored_profiles()
+        self.assertEqual(description["trigger"], "staff")
+        self.assertEqual(description["view_kwargs"], {"pk": self.survey.id})
+        self.assertEqual(description["user_id"], self.staff.id)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_ring_directory_keeps_the_newest_profiles(self):
+        """Test that sampled profiles are pruned down to the newest PROFILING_MAX_FILES."""
+        self.authenticate(self.respondent)
+        ids = [self.client.get(self.list_url)["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual([description["id"] for description in profiling.stored_profiles()], ids[:0:-1])
+        with self.assertRaises(FileNotFoundError):
+            profiling.load(ids[0])
+
+    def test_management_command(self):
+        """Test that the profiles command lists and summarises stored profiles."""
+        out = StringIO()
+        call_command("profiles", "token", stdout=out)
+        response = self.client.get(self.list_url, HTTP_X_PROFILE_TOKEN=out.getvalue().strip())
+        profile_id = response["X-Profile-Id"]
+
+        out = StringIO()
+        call_command("profiles", "list", stdout=out)
+        self.assertIn(f"{profile_id}  200", out.getvalue())
+
+        out = StringIO()
+        call_command("profiles", "show", profile_id, "--match", "dispatch", stdout=out)
+        self.assertIn("dispatch", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "does not exist"):
+            call_command("profiles", "show", "../missing")
@@ -0,0 +1,320 @@
+"""Query budgets of the views in ``surveys.views``.
+
+Every endpoint is requested against a small and a large seeded dataset with cold caches. The number of
+queries must not depend on the dataset and must stay within the ``query_budget`` its view declares for the
+method. Failures list the slowest queries of the request with their EXPLAIN plans; set ``QUERY_BUDGET_REPORT``
+to a file path to also record every measurement there as JSON.
+"""
+
+import json
+import os
+from collections import namedtuple
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+from rest_framework.test import APITestCase
+from surveys import ingestion, views
+from surveys.models import Field, Response, ResponseData, Section, Survey
+
+Dataset = namedtuple("Dataset", ["name", "survey", "score", "plan", "region", "comment", "response", "answer"])
+
+# ``request(test, dataset)`` creates what the request needs and returns its ``(path, data)``
+Scenario = namedtuple("Scenario", ["name", "method", "request"])
+
+# Sections, text fields per section and responses of each dataset
+DATASETS = {"small": (1, 2, 3), "large": (4, 12, 40)}
+
+
+def survey_payload(sections, fields):
+    return {
+        "title": "Budgeted survey",
+        "sections": [
+            {
+                "title": f"Section {section}",
+                "order": section,
+                "fields": [
+                    {"label": f"Question {index}", "field_type": "text", "order": index} for index in range(fields)
+                ],
+            }
+            for section in range(sections)
+        ],
+    }
+
+
+def submission(dataset, email="writer@example.com"):
+    return {
+        "submission_id": str(uuid4()),
+        "survey": dataset.survey.id,
+        "email": email,
+        "completed": True,
+        "response_data": [
+            {"field": dataset.score.id, "value": "7"},
+            {"field": dataset.plan.id, "value": "pro"},
+            {"field": dataset.region.id, "value": "eu"},
+        ],
+    }
+
+
+def write_response(dataset):
+    message = submission(dataset)
+    ingestion.write_batch([message])
+    return Response.objects.get(submission_id=message["submission_id"])
+
+
+def seed(name, sections, fields, responses):
+    survey = Survey.objects.create(title=f"{name.title()} survey")
+    first = Section.objects.create(survey=survey, title="Profile", order=0)
+    score = Field.objects.create(section=first, label="Score", field_type="number", order=0)
+    plan = Field.objects.create(section=first, label="Plan", field_type="radio", order=1, choices=["free", "pro"])
+    region = Field.objects.create(section=first, label="Region", field_type="dropdown", order=2, choices=["eu", "us"])
+    comment = Field.objects.create(section=first, label="Comment", field_type="text", order=3)
+    for section_order in range(1, sections + 1):
+        section = Section.objects.create(survey=survey, title=f"Section {section_order}", order=section_order)
+        Field.objects.bulk_create(
+            Field(
+                section=section,
+                label=f"Question {order}",
+                field_type="text",
+                order=order,
+                # Every other question depends on the score
+                conditional_logic={"depends_on_field": score.id, "operator": ">=", "value": 5} if order % 2 else None,
+            )
+            for order in range(fields)
+        )
+
+    dataset = Dataset(name, survey, score, plan, region, comment, None, None)
+    messages = [submission(dataset, f"respondent{index}@example.com") for index in range(responses)]
+    ingestion.write_batch(messages)
+    response = Response.objects.get(submission_id=messages[0]["submission_id"])
+    return dataset._replace(response=response, answer=response.response_data.get(field=score))
+
+
+def detail(name, **kwargs):
+    return lambda test, dataset: (reverse(name, kwargs=kwargs_for(dataset, kwargs)), None)
+
+
+def kwargs_for(dataset, kwargs):
+    """Resolve ``{"pk": "survey"}`` style URL arguments to the ids of the dataset's objects."""
+    return {key: getattr(dataset, attribute).id for key, attribute in kwargs.items()}
+
+
+def new_answer(test, dataset):
+    response = write_response(dataset)
+    data = {"response": response.id, "field": dataset.comment.id, "value": "Fine."}
+    return reverse("response-data-list-create"), data
+
+
+def disposable_answer(test, dataset):
+    answer = ResponseData.objects.create(response=write_response(dataset), field=dataset.comment, value="Fine.")
+    return reverse("response-data-detail", kwargs={"pk": answer.id}), None
+
+
+def submission_data(dataset):
+    data = submission(dataset)
+    del data["submission_id"]
+    return data
+
+
+def create_survey(test, dataset):
+    sections, fields, _ = DATASETS[dataset.name]
+    return reverse("survey-list-create"), survey_payload(sections, fields)
+
+
+def update_survey(test, dataset):
+    """A full update that renames every section and field, so that each is written."""
+    sections = []
+    for section in dataset.survey.sections.all():
+        fields = [
+            {"id": field.id, "label": f"{field.label}?", "field_type": field.field_type, "order": field.order}
+            for field in section.fields.all()
+        ]
+        sections.append({"id": section.id, "title": f"{section.title}.", "order": section.order, "fields": fields})
+    return reverse("survey-detail", kwargs={"pk": dataset.survey.id}), {"title": "Renamed", "sections": sections}
+
+
+def delete_survey(test, dataset):
+    sections, fields, _ = DATASETS[dataset.name]
+    survey = Survey.objects.create(title="Disposable survey")
+    for order in range(sections):
+        section = Section.objects.create(survey=survey, title="Section", order=order)
+        Field.objects.bulk_create(
+            Field(section=section, label="Question", field_type="text", order=index) for index in range(fields)
+        )
+    return reverse("survey-detail", kwargs={"pk": survey.id}), None
+
+
+SCENARIOS = [
+    Scenario("survey list", "GET", lambda test, dataset: (reverse("survey-list-create"), None)),
+    Scenario(
+        "shallow survey list",
+        "GET",
+        lambda test, dataset: (reverse("survey-list-create") + "?fields=id,title,section_count,field_count", None),
+    ),
+    Scenario("survey create", "POST", create_survey),
+    Scenario("survey detail", "GET", detail("survey-detail", pk="survey")),
+    Scenario("survey update", "PUT", update_survey),
+    Scenario(
+        "survey patch",
+        "PATCH",
+        lambda test, dataset: (reverse("survey-detail", kwargs={"pk": dataset.survey.id}), {"title": "Patched"}),
+    ),
+    Scenario("survey delete", "DELETE", delete_survey),
+    Scenario(
+        "survey export",
+        "GET",
+        lambda test, dataset: (reverse("survey-export", kwargs={"pk": dataset.survey.id}) + "?export_format=csv", None),
+    ),
+    Scenario("survey analytics", "GET", detail("survey-analytics", pk="survey")),
+    Scenario("field statistics", "GET", detail("survey-field-statistics", pk="survey", field_id="score")),
+    Scenario(
+        "crosstab",
+        "GET",
+        lambda test, dataset: (
+            reverse("survey-crosstab", kwargs={"pk": dataset.survey.id})
+            + f"?row_field={dataset.plan.id}&column_field={dataset.region.id}",
+            None,
+        ),
+    ),
+    Scenario(
+        "response list",
+        "GET",
+        lambda test, dataset: (reverse("response-list-create") + f"?survey={dataset.survey.id}", None),
+    ),
+    Scenario(
+        "response create",
+        "POST",
+        lambda test, dataset: (reverse("response-list-create"), submission_data(dataset)),
+    ),
+    Scenario("response detail", "GET", detail("response-detail", pk="response")),
+    Scenario(
+        "response update",
+        "PATCH",
+        lambda test, dataset: (reverse("response-detail", kwargs={"pk": dataset.response.id}), {"completed": False}),
+    ),
+    Scenario(
+        "response delete",
+        "DELETE",
+        lambda test, dataset: (reverse("response-detail", kwargs={"pk": write_response(dataset).id}), None),
+    ),
+    Scenario(
+        "answer autosave",
+        "PUT",
+        lambda test, dataset: (
+            reverse("response-answer", kwargs={"pk": dataset.response.id, "field_id": dataset.score.id}),
+            {"value": "8"},
+        ),
+    ),
+    Scenario("submission", "POST", lambda test, dataset: (reverse("response-submit"), submission_data(dataset))),
+    Scenario(
+        "answer list",
+        "GET",
+        lambda test, dataset: (reverse("response-data-list-create") + f"?survey={dataset.survey.id}", None),
+    ),
+    Scenario("answer create", "POST", new_answer),
+    Scenario("answer detail", "GET", detail("response-data-detail", pk="answer")),
+    Scenario(
+        "answer update",
+        "PUT",
+        lambda test, dataset: (
+            reverse("response-data-detail", kwargs={"pk": dataset.answer.id}),
+            {"response": dataset.response.id, "field": dataset.score.id, "value": "9"},
+        ),
+    ),
+    Scenario("answer delete", "DELETE", disposable_answer),
+]
+
+
+def explain(queries, limit=3):
+    """The slowest ``SELECT`` statements of ``queries`` with their EXPLAIN plans."""
+    slowest = sorted(queries, key=lambda query: float(query["time"]), reverse=True)
+    plans = []
+    for query in slowest:
+        if not query["sql"].lstrip().upper().startswith("SELECT"):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}")
+            plan = [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+        plans.append({"sql": query["sql"], "time": query["time"], "plan": plan})
+        if len(plans) == limit:
+            break
+    return plans
+
+
+class QueryBudgetTest(APITestCase):
+    report = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="budget", email="respondent0@example.com", password="password")
+        # Run the rebuilds the seeding registers, or writes to the seeded surveys would find them pending
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.datasets = [seed(name, *sizes) for name, sizes in DATASETS.items()]
+
+    @classmethod
+    def tearDownClass(cls):
+        path = os.environ.get("QUERY_BUDGET_REPORT")
+        if path and cls.report:
+            with open(path, "w") as file:
+                json.dump(cls.report, file, indent=2)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Authentication is not part of the budgets
+        self.client.force_authenticate(user=self.user)
+
+    def measure(self, scenario, dataset):
+        path, data = scenario.request(self, dataset)
+        cache.clear()
+        # The on_commit callbacks, document rebuilds and version bumps included, are part of the request's cost
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.generic(
+                scenario.method, path, json.dumps(data) if data is not None else "", content_type="application/json"
+            )
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, msg=f"{scenario.name}: {getattr(response, 'content', b'')}")
+        return path, queries.captured_queries
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        """Test that every endpoint runs as many queries on large datasets as on small ones, within its budget."""
+        for scenario in SCENARIOS:
+            with self.subTest(scenario.name):
+                counts = {}
+                for dataset in self.datasets:
+                    path, queries = self.measure(scenario, dataset)
+                    counts[dataset.name] = len(queries)
+                    budget = resolve(path.split("?")[0]).func.view_class.query_budget[scenario.method]
+                    plans = explain(queries)
+                    self.report.append(
+                        {"scenario": scenario.name, "dataset": dataset.name, "queries": len(queries), "slowest": plans}
+                    )
+                    self.assertLessEqual(
+                        len(queries),
+                        budget,
+                        msg=f"{scenario.name} over its budget on the {dataset.name} dataset:\n"
+                        + json.dumps(plans, indent=2),
+                    )
+                self.assertEqual(
+                    len(set(counts.values())), 1, msg=f"{scenario.name}: query count grows with the data: {counts}"
+                )
+
+    def test_every_view_declares_and_covers_its_budget(self):
+        """Test that every view in ``surveys.views`` declares a budget for each method that has a scenario."""
+        covered = {}
+        for scenario in SCENARIOS:
+            path, _ = scenario.request(self, self.datasets[0])
+            view_class = resolve(path.split("?")[0]).func.view_class
+            covered.setdefault(view_class, set()).add(scenario.method)
+
+        routed = {
+            pattern.callback.view_class
+            for pattern in get_resolver("surveys.urls").url_patterns
+            if pattern.callback.view_class.__module__ == views.__name__
+        }
+        for view_class in routed:
+            with self.subTest(view_class.__name__):
+                self.assertEqual(set(view_class.query_budget), covered.get(view_class, set()))
@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from surveys import respondents
+from surveys.models import Survey, Section, Field, Response, ResponseData
+from surveys.validation import get_schema
+
+
+class RespondentAnswersTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="respondent", email="user@example.com", password="testpassword")
+        cls.survey = Survey.objects.create(title="Respondent Survey")
+        section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.score = Field.objects.create(section=section, label="Score", field_type="number", order=1)
+        cls.praise = Field.objects.create(
+            section=section,
+            label="What did you like?",
+            field_type="text",
+            order=2,
+            conditional_logic={"depends_on_field": cls.score.id, "operator": ">=", "value": 8},
+        )
+        cls.response = Response.objects.create(survey=cls.survey, email=cls.user.email)
+        cls.detail_url = reverse("survey-detail", kwargs={"pk": cls.survey.id})
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        cache.clear()  # Answers below are written with the ORM, which does not invalidate
+
+    def test_answers_are_typed_and_cached(self):
+        """Test that answers are loaded with one query, typed, and served from the cache afterwards."""
+        ResponseData.objects.create(response=self.response, field=self.score, value="9")
+        get_schema(self.survey.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(respondents.get_answers(self.survey.id, self.user.email), {self.score.id: 9})
+        with self.assertNumQueries(0):
+            self.assertEqual(respondents.get_answers(self.survey.id, self.user.email), {self.score.id: 9})
+        self.assertEqual(respondents.get_answers(self.survey.id, None), {})
+
+    def test_answer_writes_invalidate(self):
+        """Test that writing an answer through the API drops the respondent's cached answers."""
+        self.assertEqual(respondents.get_answers(self.survey.id, self.user.email), {})
+
+        data = {"response": self.response.id, "field": self.score.id, "value": "9"}
+        response = self.client.post(reverse("response-data-list-create"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, msg=response.content)
+        self.assertEqual(respondents.get_answers(self.survey.id, self.user.email), {self.score.id: 9})
+
+        response = self.client.delete(reverse("response-data-detail", kwargs={"pk": response.json()["id"]}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(respondents.get_answers(self.survey.id, self.user.email), {})
+
+    def test_survey_detail_page_turns(self):
+        """Test that the detail view applies typed answers and repeated page turns hit no database."""
+        ResponseData.objects.create(response=self.response, field=self.score, value="9")
+
+        response = self.client.get(self.detail_url)
+        field_ids = [field["id"] for field in response.json()["sections"][0]["fields"]]
+        self.assertEqual(field_ids, [self.score.id, self.praise.id])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
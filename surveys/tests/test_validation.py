@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase
+from surveys import document_cache, validation
+from surveys.models import Survey, Section, Field
+from surveys.validation import get_schema
+
+
+class SurveySchemaTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.survey = Survey.objects.create(title="Validation Survey")
+        cls.section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.score = Field.objects.create(section=cls.section, label="Score", field_type="number", order=1)
+        cls.visited = Field.objects.create(section=cls.section, label="Visited on", field_type="date", order=2)
+        cls.topics = Field.objects.create(
+            section=cls.section, label="Topics", field_type="checkbox", order=3, choices=["price", "support"]
+        )
+        cls.praise = Field.objects.create(
+            section=cls.section,
+            label="What did you like?",
+            field_type="text",
+            required=True,
+            order=4,
+            conditional_logic={"depends_on_field": cls.score.id, "operator": ">=", "value": 8},
+        )
+
+    def test_schema_is_cached_per_version(self):
+        """Test that the schema is built once and rebuilt after the survey changes."""
+        schema = get_schema(self.survey.id)
+        with self.assertNumQueries(0):
+            self.assertIs(get_schema(self.survey.id), schema)
+
+        self.score.label = "Overall score"
+        self.score.save()
+        self.assertIsNot(get_schema(self.survey.id), schema)
+
+    def test_schemas_of_least_recently_used_surveys_are_evicted(self):
+        """Test that the per-process cache keeps only the most recently used surveys."""
+        other = Survey.objects.create(title="Other Survey")
+        schema = get_schema(self.survey.id)
+        with mock.patch.object(validation._schemas, "maxsize", 2):
+            get_schema(other.id)
+            with self.assertNumQueries(0):
+                self.assertIs(get_schema(self.survey.id), schema)
+            get_schema(Survey.objects.create(title="Third Survey").id)
+
+            self.assertIn(self.survey.id, validation._schemas)
+            self.assertNotIn(other.id, validation._schemas)
+
+    def test_missing_surveys_are_not_kept(self):
+        """Test that the schema of a survey that does not exist is not cached and its version expires quickly."""
+        survey_cache = caches[settings.SURVEY_CACHE_ALIAS]
+        survey_cache.clear()
+        with mock.patch.object(survey_cache, "add", wraps=survey_cache.add) as add:
+            self.assertFalse(get_schema(0).exists)
+            get_schema(self.survey.id)
+
+        self.assertNotIn(0, validation._schemas)
+        self.assertEqual(
+            [call.kwargs["timeout"] for call in add.call_args_list], [document_cache.MISSING_SURVEY_TIMEOUT, None]
+        )
+
+    def test_type_coercion(self):
+        """Test that number and date answers are coerced and rejected when malformed."""
+        answers = [
+            {"field": self.score.id, "value": "abc"},
+            {"field": self.visited.id, "value": "2024-02-30"},
+            {"field": self.topics.id, "value": '["price", "support"]'},
+        ]
+        cleaned, errors, _ = get_schema(self.survey.id).validate(answers)
+
+        self.assertIn("not a valid number", errors[0]["value"][0])
+        self.assertIn("not a valid date", errors[1]["value"][0])
+        self.assertEqual(errors[2], {})
+        self.assertEqual(cleaned, {self.topics.id: ["price", "support"]})
+
+    def test_checkbox_choices(self):
+        """Test that every selected checkbox value must be one of the field's choices."""
+        _, errors, _ = get_schema(self.survey.id).validate([{"field": self.topics.id, "value": '["price", "x"]'}])
+        self.assertEqual(errors, [{"value": ["Value 'x' is not a valid choice."]}])
+
+    def test_rules_use_typed_values(self):
+        """Test that rules are evaluated against the typed answers of the whole submission."""
+        schema = get_schema(self.survey.id)
+        answers = [{"field": self.praise.id, "value": "Everything"}, {"field": self.score.id, "value": "9"}]
+        self.assertEqual(schema.validate(answers)[1], [{}, {}])
+
+        answers[1]["value"] = "3"
+        errors = schema.validate(answers)[1]
+        self.assertEqual(errors[0], {"non_field_errors": ["Conditional logic not satisfied."]})
+
+    def test_required_fields_only_when_visible(self):
+        """Test that completed submissions must answer the required fields that are visible."""
+        schema = get_schema(self.survey.id)
+        self.assertEqual(schema.validate([{"field": self.score.id, "value": "9"}], completed=True)[2], [self.praise.id])
+        self.assertEqual(schema.validate([{"field": self.score.id, "value": "3"}], completed=True)[2], [])
+        self.assertEqual(schema.validate([{"field": self.score.id, "value": "9"}], completed=False)[2], [])
@@ -1,7 +1,13 @@
+import warnings
+
+from django.core.cache import cache
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
-from surveys.models import Survey, Response
+from surveys.models import Survey, Section, Field, Response, ResponseData
 from django.contrib.auth.models import User
 
 
@@ -82,6 +88,101 @@ class SurveyViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
 
+class SurveyDocumentCacheTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cacheuser", password="testpassword")
+        self.survey = Survey.objects.create(title="Cached Survey", description="Served from the cache.")
+        self.survey_url = reverse("survey-detail", kwargs={"pk": self.survey.id})
+
+    def test_retrieve_survey_is_served_from_cache(self):
+        """Test that repeated anonymous reads do not touch the database."""
+        first = self.client.get(self.survey_url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", first)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.survey_url)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_retrieve_survey_not_modified(self):
+        """Test that a matching If-None-Match returns 304 without touching the database."""
+        etag = self.client.get(self.survey_url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.survey_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_update_survey_invalidates_cache(self):
+        """Test that writing a survey changes its ETag and the cached document."""
+        etag = self.client.get(self.survey_url)["ETag"]
+        list_etag = self.client.get(reverse("survey-list-create"))["ETag"]
+
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(self.survey_url, {"title": "Renamed Survey"}, format="json")
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(self.survey_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["title"], "Renamed Survey")
+        self.assertNotEqual(self.client.get(reverse("survey-list-create"))["ETag"], list_etag)
+
+
+class SurveyListFieldsetTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(3):
+            survey = Survey.objects.create(title=f"Survey {index}", description="Listed.")
+            for order in range(2):
+                section = Section.objects.create(survey=survey, title=f"Section {order}", order=order)
+                Field.objects.create(section=section, label="Name", field_type="text", order=1)
+        cls.list_url = reverse("survey-list-create")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_shallow_list(self):
+        """Test that a list of requested attributes and counts loads no sections or fields."""
+        with self.assertNumQueries(2):  # The page count, then the surveys with their counts
+            response = self.client.get(self.list_url, {"fields": "id,title,section_count,field_count"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for survey in response.json()["results"]:
+            self.assertEqual(set(survey), {"id", "title", "section_count", "field_count"})
+            self.assertEqual((survey["section_count"], survey["field_count"]), (2, 2))
+
+    def test_expand_sections_only(self):
+        """Test that expanding sections lists them without their fields, which are not loaded."""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url, {"fields": "id,sections", "expand": "sections"})
+        section = response.json()["results"][0]["sections"][0]
+        self.assertEqual(set(section), {"id", "title", "order", "created_at", "updated_at"})
+
+    def test_default_list_is_unchanged(self):
+        """Test that without parameters surveys are listed with their full section and field trees."""
+        survey = self.client.get(self.list_url).json()["results"][0]
+        self.assertEqual(set(survey), {"id", "title", "description", "sections", "created_at", "updated_at"})
+        self.assertEqual(survey["sections"][0]["fields"][0]["label"], "Name")
+
+    def test_list_is_ordered_newest_first(self):
+        """Test that surveys are listed newest first, by id among surveys created at the same time."""
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", UnorderedObjectListWarning)
+            response = self.client.get(self.list_url, {"fields": "id,title"})
+        titles = [survey["title"] for survey in response.json()["results"]]
+        self.assertEqual(titles, ["Survey 2", "Survey 1", "Survey 0"])
+
+    def test_unknown_fields_are_rejected(self):
+        """Test that unknown attributes or relations are reported with the available choices."""
+        response = self.client.get(self.list_url, {"fields": "id,rule_graph"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Unknown fields: rule_graph.", response.json()["fields"][0])
+
+        response = self.client.get(self.list_url, {"expand": "responses"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class ResponseViewSetTest(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -111,9 +212,56 @@ class ResponseViewSetTest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        expected_response = {"count": 1, "next": None, "previous": None, "results": [self.response_obj_result]}
+        # Cursor pagination: no count, only links to the neighbouring pages
+        expected_response = {"next": None, "previous": None, "results": [self.response_obj_result]}
         self.assertEqual(response.json(), expected_response)
 
+    def test_list_responses_cursor_pagination(self):
+        """Test that responses are paged by cursor in (created_at, id) order without counting."""
+        later = [Response.objects.create(survey=self.survey) for _ in range(3)]
+        url = reverse("response-list-create")
+
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual([item["id"] for item in response.json()["results"]], [self.response.id, later[0].id])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.json()["next"])
+        self.assertEqual([item["id"] for item in response.json()["results"]], [later[1].id, later[2].id])
+        self.assertFalse(any("COUNT(" in query["sql"].upper() for query in queries))
+
+    def test_list_responses_cursor_pagination_breaks_ties_by_id(self):
+        """Test that responses created in the same instant are paged by id, forwards and backwards, without gaps."""
+        later = [Response.objects.create(survey=self.survey) for _ in range(4)]
+        Response.objects.update(created_at=self.response.created_at)
+        expected = [self.response.id] + [response.id for response in later]
+        url = reverse("response-list-create")
+
+        pages, page = [], self.client.get(url, {"page_size": 2}).json()
+        pages.append([item["id"] for item in page["results"]])
+        while page["next"]:
+            page = self.client.get(page["next"]).json()
+            pages.append([item["id"] for item in page["results"]])
+        self.assertEqual(pages, [expected[:2], expected[2:4], expected[4:]])
+
+        page = self.client.get(page["previous"]).json()
+        self.assertEqual([item["id"] for item in page["results"]], expected[2:4])
+
+    def test_list_responses_filters(self):
+        """Test that responses can be filtered by survey, email, completion and creation date."""
+        other_survey = Survey.objects.create(title="Other Survey")
+        other = Response.objects.create(survey=other_survey, email="other@example.com")
+        url = reverse("response-list-create")
+
+        def ids(**params):
+            return [item["id"] for item in self.client.get(url, params).json()["results"]]
+
+        self.assertEqual(ids(survey=other_survey.id), [other.id])
+        self.assertEqual(ids(email="test@example.com"), [self.response.id])
+        self.assertEqual(ids(completed="false"), [other.id])
+        self.assertEqual(ids(created_after=other.created_at.isoformat()), [other.id])
+        self.assertEqual(ids(created_before=other.created_at.isoformat()), [self.response.id])
+        self.assertEqual(self.client.get(url, {"completed": "maybe"}).status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_retrieve_response(self):
         """Test that we can retrieve a response."""
         response = self.client.get(self.response_url)
@@ -131,6 +279,57 @@ class ResponseViewSetTest(APITestCase):
         self.assertEqual(Response.objects.count(), 2)
         self.assertEqual(Response.objects.last().email, "new@example.com")
 
+    def test_create_response_with_nested_answers(self):
+        """Test that a response and all of its answers are submitted in one request."""
+        section = Section.objects.create(survey=self.survey, title="General Feedback", order=1)
+        rating = Field.objects.create(
+            section=section, label="Rating", field_type="radio", order=1, choices=["good", "bad"]
+        )
+        reason = Field.objects.create(
+            section=section,
+            label="Why?",
+            field_type="text",
+            order=2,
+            conditional_logic={"depends_on_field": rating.id, "operator": "==", "value": "bad"},
+        )
+        url = reverse("response-list-create")
+        data = {
+            "survey": self.survey.id,
+            "email": "nested@example.com",
+            "completed": True,
+            "response_data": [{"field": rating.id, "value": "bad"}, {"field": reason.id, "value": "Too slow"}],
+        }
+
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, msg=response.content)
+        created = Response.objects.get(pk=response.json()["id"])
+        self.assertEqual(
+            dict(created.response_data.values_list("field_id", "value")), {rating.id: "bad", reason.id: "Too slow"}
+        )
+
+    def test_create_response_with_invalid_answers_writes_nothing(self):
+        """Test that an invalid nested answer rejects the whole submission."""
+        section = Section.objects.create(survey=self.survey, title="General Feedback", order=1)
+        rating = Field.objects.create(
+            section=section, label="Rating", field_type="radio", order=1, choices=["good", "bad"]
+        )
+        other_survey = Survey.objects.create(title="Other Survey")
+        other_section = Section.objects.create(survey=other_survey, title="Other Section", order=1)
+        other_field = Field.objects.create(section=other_section, label="Other", field_type="text", order=1)
+        url = reverse("response-list-create")
+        data = {
+            "survey": self.survey.id,
+            "response_data": [{"field": rating.id, "value": "great"}, {"field": other_field.id, "value": "x"}],
+        }
+
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()["response_data"]
+        self.assertIn("not a valid choice", errors[0]["value"][0])
+        self.assertIn("does not belong to this survey", errors[1]["field"][0])
+        self.assertEqual(Response.objects.count(), 1)
+        self.assertFalse(ResponseData.objects.exists())
+
     def test_update_response(self):
         """Test that we can update a response."""
         data = {"survey": self.survey.id, "email": "updated@example.com", "completed": True}
@@ -0,0 +1,76 @@
+from django.test import TestCase
+from surveys import visibility
+from surveys.models import Survey, Section, Field, Response, ResponseData
+from surveys.serializers import ResponseDataSerializer
+
+
+class PredicateCompilationTest(TestCase):
+
+    def test_compile_conditional_logic(self):
+        """Test that conditional logic compiles into a predicate over the user's responses."""
+        predicate = visibility.compile_conditional_logic({"depends_on_field": 1, "operator": ">=", "value": 3})
+        self.assertTrue(predicate({1: 5}))
+        self.assertFalse(predicate({1: 2}))
+        self.assertFalse(predicate({}))  # A missing answer cannot satisfy an ordering comparison
+
+    def test_compile_dependencies(self):
+        """Test that dependencies compile into a predicate over the user's responses."""
+        predicate = visibility.compile_dependencies({"depends_on_field": 1, "operator": "contains", "values": "b"})
+        self.assertTrue(predicate({1: ["a", "b"]}))
+        self.assertFalse(predicate({1: "b"}))
+
+    def test_compile_unsupported_operator_raises_valueerror(self):
+        """Test that unsupported operators are rejected at compile time."""
+        with self.assertRaises(ValueError):
+            visibility.compile_conditional_logic({"depends_on_field": 1, "operator": "~", "value": 1})
+        with self.assertRaises(ValueError):
+            visibility.compile_dependencies({"depends_on_field": 1, "operator": "~", "values": [1]})
+
+
+class VisibilityEngineTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.survey = Survey.objects.create(title="Visibility Survey")
+        cls.section = Section.objects.create(survey=cls.survey, title="Section", order=1)
+        cls.field1 = Field.objects.create(section=cls.section, label="Field 1", field_type="text", order=1)
+        cls.field2 = Field.objects.create(
+            section=cls.section,
+            label="Field 2",
+            field_type="text",
+            order=2,
+            conditional_logic={"depends_on_field": cls.field1.id, "operator": "==", "value": "yes"},
+        )
+
+    def test_rules_are_compiled_once(self):
+        """Test that the engine reuses compiled rules across evaluations."""
+        engine = visibility.get_engine(self.survey.id)
+        self.assertIs(engine, visibility.get_engine(self.survey.id))
+        self.assertIs(engine.rules_for(self.field2), engine.rules_for(self.field2))
+        self.assertTrue(engine.is_visible(self.field2, {self.field1.id: "yes"}))
+        self.assertFalse(engine.is_visible(self.field2, {self.field1.id: "no"}))
+
+    def test_field_update_invalidates_engine(self):
+        """Test that saving a field drops the survey's compiled rules."""
+        engine = visibility.get_engine(self.survey.id)
+        engine.rules_for(self.field2)
+
+        self.field2.conditional_logic = {"depends_on_field": self.field1.id, "operator": "==", "value": "no"}
+        self.field2.save()
+
+        new_engine = visibility.get_engine(self.survey.id)
+        self.assertIsNot(engine, new_engine)
+        self.assertTrue(new_engine.is_visible(self.field2, {self.field1.id: "no"}))
+
+    def test_response_data_validation_uses_recorded_answers(self):
+        """Test that answers to hidden fields are rejected based on the response's other answers."""
+        response = Response.objects.create(survey=self.survey)
+        ResponseData.objects.create(response=response, field=self.field1, value="no")
+
+        serializer = ResponseDataSerializer(data={"response": response.id, "field": self.field2.id, "value": "x"})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("Conditional logic not satisfied.", str(serializer.errors))
+
+        ResponseData.objects.filter(response=response, field=self.field1).update(value="yes")
+        serializer = ResponseDataSerializer(data={"response": response.id, "field": self.field2.id, "value": "x"})
+        self.assertTrue(serializer.is_valid(), msg=serializer.errors)
@@ -1,20 +1,40 @@
 from django.urls import path
+from .async_views import AsyncSubmissionView, AsyncSurveyDetailView
 from .views import (
+    FieldNumericStatisticsView,
     ResponseDataDetailView,
     ResponseDataListCreateView,
     SurveyListCreateView,
+    SurveyAnalyticsView,
+    SurveyCrosstabView,
     SurveyDetailView,
+    SurveyResponseExportView,
+    SubmissionCreateView,
     ResponseListCreateView,
     ResponseDetailView,
+    ResponseAnswerView,
 )
 
 urlpatterns = [
     # Survey endpoints
     path("surveys/", SurveyListCreateView.as_view(), name="survey-list-create"),
     path("surveys/<int:pk>/", SurveyDetailView.as_view(), name="survey-detail"),
+    path("surveys/<int:pk>/export/", SurveyResponseExportView.as_view(), name="survey-export"),
+    path("surveys/<int:pk>/analytics/", SurveyAnalyticsView.as_view(), name="survey-analytics"),
+    path("surveys/<int:pk>/analytics/crosstab/", SurveyCrosstabView.as_view(), name="survey-crosstab"),
+    path(
+        "surveys/<int:pk>/analytics/fields/<int:field_id>/",
+        FieldNumericStatisticsView.as_view(),
+        name="survey-field-statistics",
+    ),
     # Response endpoints
     path("responses/", ResponseListCreateView.as_view(), name="response-list-create"),
+    path("responses/submit/", SubmissionCreateView.as_view(), name="response-submit"),
     path("responses/<int:pk>/", ResponseDetailView.as_view(), name="response-detail"),
+    path("responses/<int:pk>/answers/<int:field_id>/", ResponseAnswerView.as_view(), name="response-answer"),
+    # Async endpoints for respondents, to be served under ASGI
+    path("async/surveys/<int:pk>/", AsyncSurveyDetailView.as_view(), name="survey-detail-async"),
+    path("async/responses/submit/", AsyncSubmissionView.as_view(), name="response-submit-async"),
     # ResponseData endpoints
     path("response-data/", ResponseDataListCreateView.as_view(), name="response-data-list-create"),
     path("response-data/<int:pk>/", ResponseDataDetailView.as_view(), name="response-data-detail"),
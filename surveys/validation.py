@@ -0,0 +1,191 @@
+"""Precomputed answer validation for survey submissions.
+
+A ``SurveySchema`` holds one compact ``FieldValidator`` per field of a survey version: the coercion for the
+field type, the choices as a set and whether the field is required. Schemas are built with a single query
+and cached per process, for the ``SURVEY_PROCESS_CACHE_SIZE`` most recently used surveys, until the survey
+version changes, so validating a submission costs O(answers).
+Visibility rules are evaluated with the compiled predicates of ``surveys.visibility``.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+
+from survey_platform.common.lru import LRUCache
+from survey_platform.instrumentation import record_cache
+
+from . import document_cache, visibility
+from .coercion import COERCERS, coerce_text
+from .models import Field, Survey
+
+
+class FieldValidator:
+    """Type coercion and choice membership for the answers of one field."""
+
+    __slots__ = ("field", "required", "choices", "_coerce")
+
+    def __init__(self, field: Field):
+        self.field = field
+        self.required = field.required
+        self.choices = frozenset(str(choice) for choice in field.choices) if field.choices else None
+        self._coerce = COERCERS.get(field.field_type, coerce_text)
+
+    def clean(self, raw):
+        """Return the typed value of ``raw``. Raises ``ValueError`` with a user-facing message."""
+        value = self._coerce(raw)
+        if self.choices is not None:
+            for choice in value if isinstance(value, list) else (raw,):
+                if choice not in self.choices:
+                    raise ValueError(f"Value '{choice}' is not a valid choice.")
+        return value
+
+
+class SurveySchema:
+    """The validators of every field of a survey version."""
+
+    def __init__(self, survey_id, fields, exists=True, order=None):
+        self.survey_id = survey_id
+        if order:
+            # Topological order of the rules (see ``surveys.dependency_graph``): dependencies come first
+            position = {field_id: index for index, field_id in enumerate(order)}
+            fields = sorted(fields, key=lambda field: position.get(field.id, len(position)))
+        self.validators = {field.id: FieldValidator(field) for field in fields}
+        self.exists = exists
+        self.required_field_ids = [field_id for field_id, validator in self.validators.items() if validator.required]
+
+        # Reverse dependency index: field id -> the fields whose rules read its answer
+        self.dependents = defaultdict(list)
+        for validator in self.validators.values():
+            rules = (validator.field.conditional_logic, validator.field.dependencies)
+            depends_on = {rule.get("depends_on_field") for rule in rules if isinstance(rule, dict)} - {None}
+            for depends_on_field in depends_on:
+                self.dependents[depends_on_field].append(validator.field)
+
+    def clean_recorded(self, recorded):
+        """Type already stored answers (``{field_id: raw}``), skipping any that no longer validate."""
+        cleaned = {}
+        for field_id, raw in recorded.items():
+            validator = self.validators.get(field_id)
+            if validator is None:
+                continue
+            try:
+                cleaned[field_id] = validator.clean(raw)
+            except ValueError:
+                continue
+        return cleaned
+
+    def validate(self, answers, recorded=None, completed=False):
+        """Validate a whole submission in one pass.
+
+        ``answers`` is a list of ``{"field": id, "value": raw}`` dicts and ``recorded`` the answers already
+        stored for the response. Returns ``(cleaned, errors, missing)``: the typed values of the submission
+        keyed by field id, a list of error dicts aligned with ``answers``, and, when ``completed``, the ids
+        of the visible required fields that were left unanswered.
+        """
+        user_responses = self.clean_recorded(recorded) if recorded else {}
+        cleaned = {}
+        errors = []
+
+        # First pass: types and choices, so the rule pass sees typed values for the whole submission
+        for answer in answers:
+            validator = self.validators.get(answer["field"])
+            if validator is None:
+                errors.append({"field": [f"Field {answer['field']} does not belong to this survey."]})
+                continue
+            try:
+                cleaned[answer["field"]] = validator.clean(answer["value"])
+            except ValueError as exc:
+                errors.append({"value": [str(exc)]})
+                continue
+            errors.append({})
+        user_responses.update(cleaned)
+
+        # Second pass: visibility rules, evaluated against each other
+        engine = visibility.get_engine(self.survey_id)
+        for answer, error in zip(answers, errors):
+            if not error:
+                error.update(self.check_rules(engine, self.validators[answer["field"]].field, user_responses))
+
+        missing = []
+        if completed:
+            for field_id in self.required_field_ids:
+                if field_id in user_responses:
+                    continue
+                # A required field only has to be answered while it is visible
+                hidden = self.check_rules(engine, self.validators[field_id].field, user_responses)
+                if not hidden:
+                    missing.append(field_id)
+
+        return cleaned, errors, missing
+
+    def visibility_delta(self, field_id, before, after):
+        """Compare the fields that depend on ``field_id`` between two sets of typed answers.
+
+        Only the dependents of the changed field are evaluated. Returns ``(shown, hidden)``: the ids of the fields
+        that became visible and of those that became hidden.
+        """
+        engine = visibility.get_engine(self.survey_id)
+        shown, hidden = [], []
+        for field in self.dependents.get(field_id, ()):
+            try:
+                was_visible, is_visible = engine.is_visible(field, before), engine.is_visible(field, after)
+            except ValueError:
+                continue
+            if is_visible and not was_visible:
+                shown.append(field.id)
+            elif was_visible and not is_visible:
+                hidden.append(field.id)
+        return shown, hidden
+
+    @staticmethod
+    def check_rules(engine, field, user_responses):
+        """Return an error dict when ``field`` is hidden for ``user_responses``, an empty dict otherwise."""
+        try:
+            if not engine.check_conditional_logic(field, user_responses):
+                return {"non_field_errors": ["Conditional logic not satisfied."]}
+            if not engine.check_dependencies(field, user_responses):
+                return {"non_field_errors": ["Dependency conditions not met."]}
+        except ValueError as exc:
+            return {"non_field_errors": [str(exc)]}
+        return {}
+
+
+_schemas = LRUCache(settings.SURVEY_PROCESS_CACHE_SIZE)
+
+
+def _store(survey_id, version, fields, rule_graph):
+    order = rule_graph.get("order") if rule_graph else None
+    schema = SurveySchema(survey_id, fields, rule_graph is not None, order)
+    # Surveys that do not exist are not kept, so that arbitrary ids do not push out the real ones
+    if schema.exists:
+        _schemas.set(survey_id, (version, schema))
+    return schema
+
+
+def get_schema(survey_id):
+    """Return the schema of the current version of ``survey_id``, building it on first use."""
+    version = document_cache.get_version(survey_id)
+    entry = _schemas.get(survey_id)
+    hit = entry is not None and entry[0] == version
+    record_cache("schema", hit)
+    if hit:
+        return entry[1]
+
+    fields = list(Field.objects.filter(section__survey_id=survey_id))
+    # ``None`` when the survey does not exist
+    rule_graph = Survey.objects.filter(pk=survey_id).values_list("rule_graph", flat=True).first()
+    return _store(survey_id, version, fields, rule_graph)
+
+
+async def aget_schema(survey_id):
+    """Async variant of ``get_schema`` for async views, sharing the same per-process cache."""
+    version = await document_cache.aget_version(survey_id)
+    entry = _schemas.get(survey_id)
+    hit = entry is not None and entry[0] == version
+    record_cache("schema", hit)
+    if hit:
+        return entry[1]
+
+    fields = [field async for field in Field.objects.filter(section__survey_id=survey_id)]
+    rule_graph = await Survey.objects.filter(pk=survey_id).values_list("rule_graph", flat=True).afirst()
+    return _store(survey_id, version, fields, rule_graph)
@@ -1,56 +1,291 @@
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from .models import ResponseData, Survey, Response
-from .serializers import ResponseDataSerializer, SurveySerializer, ResponseSerializer
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.response import Response as APIResponse
+from . import document_cache, documents, export, ingestion, partitioning, respondents
+from .analytics import aggregates, crosstab, numeric
+from .analytics.aggregates import AggregateDelta
+from .filters import ResponseDataFilter, ResponseFilter
+from .models import Field, ResponseData, Survey, Response
+from .pagination import CreatedAtCursorPagination
+from .serializers import (
+    AnswerUpsertSerializer,
+    CrosstabQuerySerializer,
+    NumericStatisticsQuerySerializer,
+    ResponseDataSerializer,
+    SurveyListQuerySerializer,
+    SurveyListSerializer,
+    SurveySerializer,
+    ResponseSerializer,
+    SubmissionSerializer,
+)
 
 
-class SurveyListCreateView(generics.ListCreateAPIView):
-    queryset = Survey.objects.all().prefetch_related("sections__fields")
+# ``query_budget`` is the most queries a request to a view may run per method, with cold caches, counting its on_commit
+# callbacks and not counting authentication. surveys/tests/test_query_budgets.py holds every view to it, on datasets
+# of different sizes.
+
+
+class CachedDocumentMixin:
+    """Serve GET requests from the versioned survey document cache, honouring ``If-None-Match``.
+
+    With ``encoded``, ``render`` returns JSON bytes that are sent as they are, or ``None`` for a 404.
+    """
+
+    def cached_response(self, etag, render, encoded=False):
+        if etag in parse_etags(self.request.headers.get("If-None-Match", "")):
+            return APIResponse(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        data = document_cache.get_document(etag)
+        if data is None:
+            data = render()
+            if data is None:
+                raise Http404
+            document_cache.set_document(etag, data)
+        if encoded:
+            return HttpResponse(data, content_type="application/json", headers={"ETag": etag})
+        return APIResponse(data, headers={"ETag": etag})
+
+
+class SurveyListCreateView(CachedDocumentMixin, generics.ListCreateAPIView):
+    """List surveys, trimmed with ``?fields=`` and ``?expand=`` (see ``SurveyListQuerySerializer``), or create one."""
+
+    queryset = Survey.objects.all()
     serializer_class = SurveySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"GET": 4, "POST": 18}
+
+    def list(self, request, *args, **kwargs):
+        params = SurveyListQuerySerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        self.list_query = params.validated_data
+
+        etag = document_cache.make_etag("list", document_cache.get_list_version(), request.get_full_path())
+        render = super().list
+        return self.cached_response(etag, lambda: render(request, *args, **kwargs).data)
+
+    def get_queryset(self):
+        # Unrequested columns, counts and relations are never loaded; newest first, with a stable order for paging
+        query = self.list_query
+        queryset = super().get_queryset().order_by("-created_at", "-id")
+        return SurveyListSerializer.setup_queryset(queryset, query["fields"], query["expand"])
 
+    def get_serializer_class(self):
+        return SurveyListSerializer if self.request.method == "GET" else SurveySerializer
 
-class SurveyDetailView(generics.RetrieveUpdateDestroyAPIView):
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == "GET":
+            context.update(self.list_query)
+        return context
+
+
+class SurveyDetailView(CachedDocumentMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Survey.objects.all().prefetch_related("sections__fields")
     serializer_class = SurveySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"GET": 8, "PUT": 30, "PATCH": 22, "DELETE": 16}
+
+    def retrieve(self, request, *args, **kwargs):
+        survey_id = self.kwargs["pk"]
+        user_responses = self.get_user_responses()
+        # Anonymous reads (and respondents without answers) share one document per survey version
+        etag = document_cache.make_etag(
+            survey_id, document_cache.get_version(survey_id), sorted(user_responses.items())
+        )
+        # The stored document, encoded once per survey write, rather than a serializer run per read
+        return self.cached_response(etag, lambda: documents.render(survey_id, user_responses), encoded=True)
+
+    def get_user_responses(self):
+        """The user's previous responses for the current survey, typed and keyed by field id."""
+        if not hasattr(self, "_user_responses"):
+            user = self.request.user
+
+            # Responses are tracked by the email of the logged-in user
+            self._user_responses = {}
+            if user.is_authenticated:
+                self._user_responses = respondents.get_answers(self.kwargs["pk"], user.email)
+        return self._user_responses
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
+        context["user_responses"] = self.get_user_responses()
+        return context
+
+    def perform_destroy(self, instance):
+        # One transaction with the deletion of the survey, like the one ``Model.delete`` opens
+        with transaction.atomic(savepoint=False):
+            # Drops the survey's partitions when the response tables are partitioned, see ``surveys.partitioning``
+            partitioning.delete_responses(instance.pk)
+            instance.delete()
+
+
+class SurveyResponseExportView(generics.GenericAPIView):
+    """Stream every response of a survey as CSV or NDJSON (``?export_format=csv|ndjson``)."""
+
+    queryset = Survey.objects.all().only("id")
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format not in export.EXPORT_FORMATS:
+            raise ValidationError({"export_format": f"Choose one of: {', '.join(export.EXPORT_FORMATS)}."})
 
-        # Retrieve the user's previous responses for the current survey
         survey = self.get_object()
-        user = self.request.user
+        response = StreamingHttpResponse(
+            export.stream_export(survey.id, export_format), content_type=export.EXPORT_FORMATS[export_format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="survey-{survey.id}-responses.{export_format}"'
+        return response
 
-        # Assuming responses are tracked by user (or anonymous email if user is not logged in)
-        user_responses = {}
-        if user.is_authenticated:
-            responses = ResponseData.objects.filter(response__survey=survey, response__email=user.email)
-            user_responses = {resp.field.id: resp.value for resp in responses}
 
-        context["user_responses"] = user_responses
-        return context
+class SurveyAnalyticsView(generics.GenericAPIView):
+    """Per-field answer aggregates and response counts of a survey, read from the aggregate tables."""
+
+    queryset = Survey.objects.all().only("id")
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 5}
+
+    def get(self, request, *args, **kwargs):
+        return APIResponse(aggregates.survey_report(self.get_object()))
+
+
+class FieldNumericStatisticsView(generics.GenericAPIView):
+    """Mean, standard deviation, percentiles and a histogram of the answers to a number field."""
+
+    queryset = Field.objects.all().only("id", "field_type")
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 2}
+
+    def get(self, request, pk, field_id):
+        field = get_object_or_404(self.get_queryset(), pk=field_id, section__survey_id=pk)
+        if field.field_type != "number":
+            raise ValidationError({"field": "Statistics are only available for number fields."})
+
+        params = NumericStatisticsQuerySerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        values = numeric.load_values(field.id, query.get("segment_field"), query.get("segment_value"))
+        value_range = (query["range_min"], query["range_max"]) if "range_min" in query else None
+        statistics = numeric.describe(
+            values, query.get("percentiles", numeric.DEFAULT_PERCENTILES), query["bins"], value_range
+        )
+        return APIResponse({"field": field.id, **statistics})
+
+
+class SurveyCrosstabView(generics.GenericAPIView):
+    """Contingency table of the answers to two choice fields of a survey."""
+
+    queryset = Field.objects.all().only("id", "field_type", "choices")
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 2}
+
+    def get(self, request, pk):
+        params = CrosstabQuerySerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        fields = self.get_queryset().filter(section__survey_id=pk).in_bulk([query["row_field"], query["column_field"]])
+        errors = {}
+        for name in ("row_field", "column_field"):
+            field = fields.get(query[name])
+            if field is None:
+                errors[name] = "Field does not belong to this survey."
+            elif field.field_type not in aggregates.CHOICE_FIELD_TYPES:
+                errors[name] = "Cross-tabulation is only available for dropdown, radio and checkbox fields."
+        if errors:
+            raise ValidationError(errors)
+
+        table = crosstab.crosstab(fields[query["row_field"]], fields[query["column_field"]], query.get("completed"))
+        return APIResponse(table)
 
 
 class ResponseListCreateView(generics.ListCreateAPIView):
     queryset = Response.objects.all().select_related("survey")
     serializer_class = ResponseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"GET": 1, "POST": 14}
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ResponseFilter]
 
 
 class ResponseDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Response.objects.all().select_related("survey")
     serializer_class = ResponseSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"GET": 1, "PATCH": 6, "DELETE": 18}
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        delta = AggregateDelta()
+        delta.remove_response(instance.survey_id, instance.completed)
+        for field_id, value in instance.response_data.values_list("field_id", "value"):
+            delta.remove_answer(instance.survey_id, field_id, value)
+        instance.delete()
+        delta.apply()
+        respondents.answers_changed(instance.survey_id, instance.email)
+
+
+class ResponseAnswerView(generics.GenericAPIView):
+    """Autosave one answer of a response with ``PUT``, returning the fields whose visibility it changed."""
+
+    queryset = Response.objects.all()
+    serializer_class = AnswerUpsertSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"PUT": 13}
+
+    def put(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        code = status.HTTP_201_CREATED if serializer.data["created"] else status.HTTP_200_OK
+        return APIResponse(serializer.data, status=code)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(response=self.get_object(), field_id=self.kwargs["field_id"])
+        return context
+
+
+class SubmissionCreateView(generics.GenericAPIView):
+    """Accept a complete response for write-behind ingestion; it is written to the database by a worker."""
+
+    serializer_class = SubmissionSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"POST": 15}
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        submission_id = ingestion.submit(serializer.validated_data)
+        return APIResponse({"submission_id": submission_id, "status": "queued"}, status=status.HTTP_202_ACCEPTED)
 
 
 class ResponseDataListCreateView(generics.ListCreateAPIView):
     queryset = ResponseData.objects.all().select_related("response", "field")
     serializer_class = ResponseDataSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"GET": 1, "POST": 9}
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ResponseDataFilter]
 
 
 class ResponseDataDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = ResponseData.objects.all().select_related("response", "field")
     serializer_class = ResponseDataSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = {"GET": 1, "PUT": 15, "DELETE": 7}
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        delta = AggregateDelta()
+        delta.remove_answer(instance.response.survey_id, instance.field_id, instance.value)
+        instance.delete()
+        delta.apply()
+        respondents.answers_changed(instance.response.survey_id, instance.response.email)
@@ -0,0 +1,157 @@
+"""Compiled visibility rules for survey fields.
+
+``Field.conditional_logic`` and ``Field.dependencies`` are stored as raw JSON. Interpreting that JSON for
+every field on every request is expensive on large surveys, so the rules are compiled once into
+``Predicate`` objects and kept in a per-survey ``VisibilityEngine``. Engines are cached per process, for the
+``SURVEY_PROCESS_CACHE_SIZE`` most recently used surveys, and dropped through ``invalidate`` whenever the survey,
+one of its sections or one of its fields is written.
+"""
+
+import operator
+
+from django.conf import settings
+
+from survey_platform.common.lru import LRUCache
+
+
+def _ordered(compare):
+    """Wrap an ordering comparison so that missing or incomparable answers hide the field."""
+
+    def test(actual, expected):
+        try:
+            return compare(actual, expected)
+        except TypeError:
+            return False
+
+    return test
+
+
+CONDITIONAL_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": _ordered(operator.gt),
+    "<": _ordered(operator.lt),
+    ">=": _ordered(operator.ge),
+    "<=": _ordered(operator.le),
+}
+
+DEPENDENCY_OPERATORS = {
+    "in": lambda actual, expected_values: actual in expected_values,
+    "not_in": lambda actual, expected_values: actual not in expected_values,
+    "contains": lambda actual, expected_value: expected_value in actual if isinstance(actual, list) else False,
+}
+
+
+class Predicate:
+    """A single compiled rule: ``test(answers[depends_on_field], expected)``."""
+
+    __slots__ = ("depends_on_field", "operator", "expected", "_test")
+
+    def __init__(self, depends_on_field, operator_name, expected, test):
+        self.depends_on_field = depends_on_field
+        self.operator = operator_name
+        self.expected = expected
+        self._test = test
+
+    def __call__(self, user_responses):
+        return self._test(user_responses.get(self.depends_on_field), self.expected)
+
+    def __repr__(self):
+        return f"Predicate({self.depends_on_field!r} {self.operator} {self.expected!r})"
+
+
+def compile_conditional_logic(logic):
+    """Compile a ``conditional_logic`` rule. Raises ``ValueError`` for unsupported operators."""
+    operator_name = logic.get("operator")
+    if operator_name not in CONDITIONAL_OPERATORS:
+        raise ValueError(f"Unsupported operator: {operator_name}")
+    return Predicate(
+        logic.get("depends_on_field"), operator_name, logic.get("value"), CONDITIONAL_OPERATORS[operator_name]
+    )
+
+
+def compile_dependencies(dependencies):
+    """Compile a ``dependencies`` rule. Raises ``ValueError`` for unsupported operators."""
+    operator_name = dependencies.get("operator")
+    if operator_name not in DEPENDENCY_OPERATORS:
+        raise ValueError(f"Unsupported operator: {operator_name}")
+    # Expected values should be a list
+    return Predicate(
+        dependencies.get("depends_on_field"),
+        operator_name,
+        dependencies.get("values"),
+        DEPENDENCY_OPERATORS[operator_name],
+    )
+
+
+class FieldRules:
+    """The compiled conditional logic and dependency predicates of one field."""
+
+    __slots__ = ("field_id", "conditional_logic", "dependencies")
+
+    def __init__(self, field_id, conditional_logic=None, dependencies=None):
+        self.field_id = field_id
+        self.conditional_logic = conditional_logic
+        self.dependencies = dependencies
+
+    @classmethod
+    def compile(cls, field):
+        return cls(
+            field.id,
+            compile_conditional_logic(field.conditional_logic) if field.conditional_logic else None,
+            compile_dependencies(field.dependencies) if field.dependencies else None,
+        )
+
+    def is_visible(self, user_responses):
+        if self.conditional_logic is not None and not self.conditional_logic(user_responses):
+            return False
+        if self.dependencies is not None and not self.dependencies(user_responses):
+            return False
+        return True
+
+
+class VisibilityEngine:
+    """Compiled rules of a single survey, keyed by field id.
+
+    Fields are compiled lazily the first time they are evaluated, so a malformed rule only fails the
+    field that carries it. Each entry remembers the ``updated_at`` of the field it was compiled from and is
+    recompiled when handed a newer copy, so a process that missed an invalidation never serves stale rules.
+    """
+
+    def __init__(self, survey_id):
+        self.survey_id = survey_id
+        self._rules = {}
+
+    def rules_for(self, field):
+        entry = self._rules.get(field.id)
+        if entry is None or entry[0] != field.updated_at:
+            entry = (field.updated_at, FieldRules.compile(field))
+            self._rules[field.id] = entry
+        return entry[1]
+
+    def is_visible(self, field, user_responses):
+        return self.rules_for(field).is_visible(user_responses)
+
+    def check_conditional_logic(self, field, user_responses):
+        predicate = self.rules_for(field).conditional_logic
+        return predicate is None or predicate(user_responses)
+
+    def check_dependencies(self, field, user_responses):
+        predicate = self.rules_for(field).dependencies
+        return predicate is None or predicate(user_responses)
+
+
+_engines = LRUCache(settings.SURVEY_PROCESS_CACHE_SIZE)
+
+
+def get_engine(survey_id):
+    """Return the cached engine for ``survey_id``, creating an empty one on first use."""
+    engine = _engines.get(survey_id)
+    if engine is None:
+        engine = _engines.setdefault(survey_id, VisibilityEngine(survey_id))
+    return engine
+
+
+def invalidate(survey_id):
+    """Drop the compiled rules of ``survey_id``; they are recompiled on next use."""
+    _engines.pop(survey_id)
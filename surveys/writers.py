@@ -0,0 +1,187 @@
+"""Bulk write paths for the survey definition tree (sections and their fields)."""
+
+from django.utils import timezone
+
+from . import document_cache
+from .analytics import aggregates
+from .coercion import typed_columns
+from .dependency_graph import RULE_ATTRIBUTES, RuleGraph
+from .models import Field, ResponseData, Section, Survey
+
+SECTION_ATTRIBUTES = ["title", "order"]
+FIELD_ATTRIBUTES = ["label", "field_type", "required", "order", "conditional_logic", "dependencies", "choices"]
+TYPED_COLUMNS = ["value_number", "value_date", "value_json"]
+# Answers rewritten per query when a field changes type
+ANSWER_BATCH_SIZE = 2000
+
+
+def create_sections(survey: Survey, sections_data):
+    """Create ``sections_data`` and their nested fields under ``survey``.
+
+    The whole tree is written with one ``bulk_create`` per table regardless of its size. Field ids in
+    ``sections_data`` are provisional: rules that reference them are rewritten to the ids of the created fields.
+    Returns the created sections and fields. Callers are expected to run this inside a transaction.
+    """
+    sections = []
+    fields_data_per_section = []
+    for section_data in sections_data:
+        section_data = dict(section_data)
+        section_data.pop("id", None)
+        section_data.pop("survey", None)
+        fields_data_per_section.append(section_data.pop("fields", []))
+        sections.append(Section(survey=survey, **section_data))
+
+    Section.objects.bulk_create(sections)
+
+    fields, provisional_ids = [], []
+    for section, fields_data in zip(sections, fields_data_per_section):
+        for field_data in fields_data:
+            fields.append(Field(section=section, **{key: value for key, value in field_data.items() if key != "id"}))
+            provisional_ids.append(field_data.get("id"))
+    Field.objects.bulk_create(fields)
+
+    created = {
+        provisional_id: field for provisional_id, field in zip(provisional_ids, fields) if provisional_id is not None
+    }
+    if created:
+        remapped = [field for field in fields if _remap_rules(field, created)]
+        Field.objects.bulk_update(remapped, list(RULE_ATTRIBUTES))
+
+    return sections, fields
+
+
+def _remap_rules(field, created):
+    """Point the rules of ``field`` at the created fields instead of their provisional ids."""
+    changed = False
+    for attribute in RULE_ATTRIBUTES:
+        rule = getattr(field, attribute)
+        if isinstance(rule, dict) and rule.get("depends_on_field") in created:
+            setattr(field, attribute, {**rule, "depends_on_field": created[rule["depends_on_field"]].id})
+            changed = True
+    return changed
+
+
+def store_rule_graph(survey: Survey, fields):
+    """Store the evaluation order of the rules of ``fields``, all of ``survey``'s fields."""
+    survey.rule_graph = RuleGraph.from_fields(fields).as_json()
+    Survey.objects.filter(pk=survey.pk).update(rule_graph=survey.rule_graph)
+
+
+def _apply_changes(instance, data, attributes):
+    """Copy ``attributes`` from ``data`` onto ``instance`` and return whether anything changed."""
+    changed = False
+    for attribute in attributes:
+        if attribute in data and getattr(instance, attribute) != data[attribute]:
+            setattr(instance, attribute, data[attribute])
+            changed = True
+    return changed
+
+
+def _retype_answers(field_types):
+    """Recompute the typed columns of the answers to fields whose type changed, ``field_types`` by field id.
+
+    Answers are paged by id and rewritten with one ``bulk_update`` per ``ANSWER_BATCH_SIZE`` answers.
+    """
+    if not field_types:
+        return
+    answers = (
+        ResponseData.objects.filter(field_id__in=field_types).order_by("id").values_list("id", "field_id", "value")
+    )
+
+    last_id = 0
+    while True:
+        batch = list(answers.filter(id__gt=last_id)[:ANSWER_BATCH_SIZE])
+        if not batch:
+            break
+        ResponseData.objects.bulk_update(
+            [
+                ResponseData(id=answer_id, **typed_columns(field_types[field_id], value))
+                for answer_id, field_id, value in batch
+            ],
+            TYPED_COLUMNS,
+        )
+        last_id = batch[-1][0]
+
+
+def sync_sections(survey: Survey, sections_data):
+    """Make the sections and fields of ``survey`` match ``sections_data``.
+
+    Sections and fields carrying an ``id`` are matched against the existing rows of the survey; rows without
+    an ``id`` are created and existing rows missing from ``sections_data`` are deleted. Only rows whose
+    attributes actually changed are updated, so unchanged fields keep their answers and timestamps; the answers
+    of fields whose type changed have their typed columns recomputed, and the aggregates of fields whose type or
+    choices changed are rebuilt. Ids must already have been validated as belonging to ``survey``. Callers are
+    expected to run this inside a transaction.
+    """
+    existing_sections = {section.id: section for section in Section.objects.filter(survey=survey)}
+    existing_fields = {field.id: field for field in Field.objects.filter(section__survey=survey)}
+
+    new_sections, changed_sections, kept_section_ids = [], [], set()
+    plan = []
+    for section_data in sections_data:
+        section_data = dict(section_data)
+        section_data.pop("survey", None)
+        fields_data = section_data.pop("fields", [])
+        section_id = section_data.pop("id", None)
+
+        if section_id is None:
+            section = Section(survey=survey, **section_data)
+            new_sections.append(section)
+        else:
+            section = existing_sections[section_id]
+            kept_section_ids.add(section_id)
+            if _apply_changes(section, section_data, SECTION_ATTRIBUTES):
+                changed_sections.append(section)
+        plan.append((section, fields_data))
+
+    now = timezone.now()
+    Section.objects.bulk_create(new_sections)
+    for section in changed_sections:
+        section.updated_at = now
+    Section.objects.bulk_update(changed_sections, SECTION_ATTRIBUTES + ["updated_at"])
+
+    new_fields, changed_fields, kept_field_ids, retyped_fields = [], [], set(), {}
+    fields, reaggregated_fields = [], []
+    for section, fields_data in plan:
+        for field_data in fields_data:
+            field_data = dict(field_data)
+            field_id = field_data.pop("id", None)
+
+            if field_id is None:
+                field = Field(section=section, **field_data)
+                new_fields.append(field)
+                fields.append(field)
+                continue
+
+            field = existing_fields[field_id]
+            fields.append(field)
+            kept_field_ids.add(field_id)
+            field_type, choices = field.field_type, field.choices
+            changed = _apply_changes(field, field_data, FIELD_ATTRIBUTES)
+            if field.field_type != field_type:
+                retyped_fields[field.id] = field.field_type
+            if field.field_type != field_type or field.choices != choices:
+                reaggregated_fields.append(field)
+            if field.section_id != section.id:
+                field.section = section
+                changed = True
+            if changed:
+                field.updated_at = now
+                changed_fields.append(field)
+
+    Field.objects.bulk_create(new_fields)
+    Field.objects.bulk_update(changed_fields, FIELD_ATTRIBUTES + ["section", "updated_at"])
+    _retype_answers(retyped_fields)
+    if reaggregated_fields:
+        aggregates.rebuild_fields(survey.id, reaggregated_fields)
+
+    # Fields are moved out of removed sections above, before the sections (and what is left in them) go
+    removed_field_ids = existing_fields.keys() - kept_field_ids
+    if removed_field_ids:
+        Field.objects.filter(id__in=removed_field_ids).delete()
+    removed_section_ids = existing_sections.keys() - kept_section_ids
+    if removed_section_ids:
+        Section.objects.filter(id__in=removed_section_ids).delete()
+
+    store_rule_graph(survey, fields)
+    document_cache.survey_changed(survey.id)